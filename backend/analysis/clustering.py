@@ -19,10 +19,14 @@ import warnings
 # P4: Suppress numerical warnings from sparse matrix operations
 warnings.filterwarnings('ignore', category=RuntimeWarning, module='sklearn')
 
-from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer, ENGLISH_STOP_WORDS
+from sklearn import clone, config_context
 from sklearn.metrics import silhouette_score
 from typing import List, Dict, Tuple, Optional, Any
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 import re
 import numpy as np
 
@@ -34,9 +38,49 @@ except ImportError:
     HDBSCAN_AVAILABLE = False
     print("HDBSCAN not available, falling back to KMeans")
 
+# HDBSCAN internals used to cluster collapsed duplicates with their multiplicities
+try:
+    from hdbscan._hdbscan_linkage import mst_linkage_core, label as single_linkage_tree
+    from hdbscan.hdbscan_ import _tree_to_labels
+    WEIGHTED_HDBSCAN_AVAILABLE = HDBSCAN_AVAILABLE
+except ImportError:
+    WEIGHTED_HDBSCAN_AVAILABLE = False
+
+from scipy.spatial.distance import cdist
+
 from sklearn.cluster import MiniBatchKMeans
 from sklearn.decomposition import TruncatedSVD
 
+# Below this many failures the process pool start-up (spawned workers import sklearn / hdbscan,
+# ~1.5 s each) costs more than it saves
+PARALLEL_MIN_FAILURES = 10000
+
+# Duplicates are collapsed when at most this share of a group's failures is distinct (below, the
+# unique x unique distances of the weighted clustering cost more than HDBSCAN's tree search saves)
+# and at most MAX_WEIGHTED_UNIQUE failure shapes remain
+DEDUP_MAX_UNIQUE_RATIO = 0.5
+MAX_WEIGHTED_UNIQUE = 5000
+
+# Bytes per unique pair held by the weighted clustering (distances, their order, running counts)
+WEIGHTED_BYTES_PER_PAIR = 24
+# Randomized SVD keeps a few (rows x (components + oversampling)) float arrays
+SVD_WORK_ARRAYS = 4
+SVD_OVERSAMPLES = 10
+# Points sampled for the silhouette score of a memory-bounded clusterer
+SILHOUETTE_MAX_SAMPLES = 10000
+
+# Clusterer of a pool worker process (set once by _init_group_worker)
+_group_clusterer = None
+
+
+def _init_group_worker(clusterer):
+    global _group_clusterer
+    _group_clusterer = clusterer
+
+
+def _cluster_groups_in_worker(groups):
+    return [_group_clusterer._cluster_group(g) for g in groups]
+
 
 class ImprovedFailureClusterer:
     """
@@ -82,7 +126,11 @@ class ImprovedFailureClusterer:
         use_hdbscan: bool = True,
         min_samples: int = 1,
         max_features: int = 2000,
-        svd_components: int = 100  # PRD Phase 2: Dimensionality reduction
+        svd_components: int = 100,  # PRD Phase 2: Dimensionality reduction
+        n_jobs: int = 1,
+        dedup: bool = True,
+        max_memory_mb: Optional[float] = None,
+        featurizer: Optional[TfidfVectorizer] = None
     ):
         """
         Initialize the improved clusterer.
@@ -93,11 +141,21 @@ class ImprovedFailureClusterer:
             min_samples: HDBSCAN min_samples parameter
             max_features: Maximum features for TF-IDF vectorizer
             svd_components: Number of SVD components for dimensionality reduction (0 to disable)
+            n_jobs: Processes clustering module groups in parallel (1 = sequential, -1 = one per CPU core)
+            dedup: Cluster identical failures once, weighted by their count
+            max_memory_mb: Ceiling for a module group's feature and distance matrices (None = unbounded).
+                Groups whose dense TF-IDF matrix would not fit are clustered on an SVD reduction that does.
+            featurizer: Fitted corpus-level TF-IDF vectorizer (see FeaturizerService) that module groups
+                are only transformed with; None fits a vectorizer per group
         """
         self.min_cluster_size = min_cluster_size
         self.use_hdbscan = use_hdbscan and HDBSCAN_AVAILABLE
         self.min_samples = min_samples
         self.svd_components = svd_components
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs == -1 else max(1, n_jobs)
+        self.dedup = dedup
+        self.max_memory_mb = max_memory_mb
+        self.featurizer = featurizer
         # P2: Combine English stop words with domain-specific stop words
         combined_stop_words = list(set(ENGLISH_STOP_WORDS) | set(self.DOMAIN_STOP_WORDS))
         
@@ -339,23 +397,10 @@ class ImprovedFailureClusterer:
         
         detailed_metrics = {}
         
-        # 2. Process each module group independently
-        for module, group_failures in module_groups.items():
-            n_samples = len(group_failures)
-            
-            # Dynamic SVD: Disable if samples are too few to support it
-            # We need at least n_components + 1 samples.
-            # Also, for small N, SVD hurts more than it helps.
-            use_svd = self.svd is not None and n_samples >= 50 and n_samples > self.svd_components
-            
-            # Run core clustering on this group
-            local_labels, local_metrics = self._cluster_core(group_failures, use_svd_override=use_svd)
-            
-            # Post-processing per module (Outliers & Merging)
-            # We handle outliers locally to keep them within the module
-            local_labels = self.handle_outliers(group_failures, local_labels)
-            local_labels = self.merge_small_clusters(group_failures, local_labels)
-            
+        # 2. Process each module group independently (in a process pool with n_jobs > 1)
+        group_results = self._cluster_groups(list(module_groups.values()))
+        
+        for module, (local_labels, local_metrics) in zip(module_groups, group_results):
             # Map local labels to global unique IDs
             # Local labels are 0, 1, 2...
             # We shift them by global_cluster_offset
@@ -398,6 +443,61 @@ class ImprovedFailureClusterer:
         
         return final_labels, self._last_metrics
 
+    def _cluster_group(self, group_failures: List[Dict]) -> Tuple[List[int], Dict[str, Any]]:
+        """Cluster one module group: core clustering, then outliers and small clusters handled locally."""
+        n_samples = len(group_failures)
+        
+        # Dynamic SVD: Disable if samples are too few to support it
+        # We need at least n_components + 1 samples.
+        # Also, for small N, SVD hurts more than it helps.
+        use_svd = self.svd is not None and n_samples >= 50 and n_samples > self.svd_components
+        
+        # Run core clustering on this group
+        local_labels, local_metrics = self._cluster_core(group_failures, use_svd_override=use_svd)
+        
+        # Post-processing per module (Outliers & Merging)
+        # We handle outliers locally to keep them within the module
+        local_labels = self.handle_outliers(group_failures, local_labels)
+        local_labels = self.merge_small_clusters(group_failures, local_labels)
+        return local_labels, local_metrics
+
+    def _cluster_groups(self, groups: List[List[Dict]]) -> List[Tuple[List[int], Dict[str, Any]]]:
+        """
+        (labels, metrics) of each module group, in the order given.
+        
+        Groups are independent (every step refits on the group alone), so the pool
+        returns exactly what the sequential loop does. Biggest groups are submitted
+        first so one large module does not end up running alone at the end; small
+        groups share a task to keep the per-task overhead down.
+        """
+        n_failures = sum(len(g) for g in groups)
+        if self.n_jobs <= 1 or len(groups) < 2 or n_failures < PARALLEL_MIN_FAILURES:
+            return [self._cluster_group(g) for g in groups]
+        
+        workers = min(self.n_jobs, len(groups))
+        task_failures = max(1, n_failures // (workers * 8))
+        tasks, task, size = [], [], 0
+        for i in sorted(range(len(groups)), key=lambda i: -len(groups[i])):
+            task.append(i)
+            size += len(groups[i])
+            if size >= task_failures:
+                tasks.append(task)
+                task, size = [], 0
+        if task:
+            tasks.append(task)
+        
+        results = [None] * len(groups)
+        # Spawned, not forked: callers (API, worker) are multithreaded, and a fork can copy a lock another thread holds
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_group_worker, initargs=(self,)
+        ) as pool:
+            futures = [(task, pool.submit(_cluster_groups_in_worker, [groups[i] for i in task])) for task in tasks]
+            for task, future in futures:
+                for i, result in zip(task, future.result()):
+                    results[i] = result
+        return results
+
     def _cluster_core(
         self, 
         failures: List[Dict],
@@ -424,27 +524,58 @@ class ImprovedFailureClusterer:
             labels = [0] * len(failures)
             return labels, {'n_clusters': 1, 'method': 'tiny_group_heuristic'}
 
+        # Identical failures (a device-level issue hitting a whole module) are clustered
+        # once, weighted by their count, and their labels expanded back afterwards
+        unique_texts, weights, inverse = self.collapse_duplicates(valid_texts)
+        collapse = self.dedup and len(unique_texts) <= min(len(valid_texts) * DEDUP_MAX_UNIQUE_RATIO, self._max_weighted_unique()) and (
+            WEIGHTED_HDBSCAN_AVAILABLE or not self.use_hdbscan
+        )
+        if not collapse:
+            unique_texts, weights, inverse = valid_texts, None, None
+
         try:
             # Vectorize
-            tfidf_matrix = self.vectorizer.fit_transform(valid_texts)
+            if self.featurizer is not None:
+                # Corpus idf: identical texts get identical rows, duplicates need no weighting
+                tfidf_matrix = self.featurizer.transform(unique_texts)
+            elif weights is None:
+                tfidf_matrix = self.vectorizer.fit_transform(valid_texts)
+            else:
+                tfidf_matrix = self._weighted_tfidf(unique_texts, weights)
             
             # SVD (Dimensionality Reduction) - Conditional
             if use_svd_override and self.svd is not None and tfidf_matrix.shape[1] > self.svd_components:
                 # Ensure n_components logic
                 n_avail = min(self.svd_components, tfidf_matrix.shape[1] - 1, len(valid_texts) - 1)
+                n_avail = min(n_avail, self._max_components(tfidf_matrix.shape[0]))
                 if n_avail > 2: # Only if SVD is meaningful
                     self.svd.n_components = n_avail
-                    feature_matrix = self.svd.fit_transform(tfidf_matrix)
+                    feature_matrix = self._svd_features(self.svd, tfidf_matrix, weights)
                 else:
                     feature_matrix = tfidf_matrix
             else:
                 feature_matrix = tfidf_matrix
             
+            # Memory ceiling: a group whose dense TF-IDF matrix would not fit is reduced to one that does
+            bounded_components = None
+            if hasattr(feature_matrix, 'toarray') and self.max_memory_mb is not None:
+                rows, cols = feature_matrix.shape
+                if rows * cols * 8 > self.max_memory_mb * 1024 * 1024:
+                    bounded_components = max(3, min(cols - 1, rows - 1, self.svd_components or 100, self._max_components(rows)))
+                    print(f"Group of {rows} x {cols} TF-IDF exceeds {self.max_memory_mb} MB dense: reducing to {bounded_components} SVD components")
+                    svd = TruncatedSVD(n_components=bounded_components, random_state=42)
+                    feature_matrix = self._svd_features(svd, feature_matrix, weights)
+            
             # Clustering Algo
             if self.use_hdbscan:
-                labels, metrics = self._cluster_hdbscan(feature_matrix, valid_texts)
+                labels, metrics = self._cluster_hdbscan(feature_matrix, unique_texts, weights)
             else:
-                labels, metrics = self._cluster_kmeans(feature_matrix, valid_texts)
+                labels, metrics = self._cluster_kmeans(feature_matrix, unique_texts, weights)
+            if weights is not None:
+                labels = np.asarray(labels)[inverse]
+                metrics['n_unique'] = len(unique_texts)
+            if bounded_components is not None:
+                metrics['bounded_components'] = bounded_components
             
             # Map back to full length
             full_labels = []
@@ -462,17 +593,163 @@ class ImprovedFailureClusterer:
             print(f"Core clustering failed for group: {e}")
             return [0] * len(failures), {'method': 'error', 'error': str(e)}
 
-    # _cluster_hdbscan remains unchanged below...
+    def _memory_budget(self) -> Optional[float]:
+        return None if self.max_memory_mb is None else self.max_memory_mb * 1024 * 1024
+
+    def _max_weighted_unique(self) -> int:
+        """Most unique failures clustered weighted (pairwise arrays) within the memory ceiling."""
+        budget = self._memory_budget()
+        if budget is None:
+            return MAX_WEIGHTED_UNIQUE
+        return min(MAX_WEIGHTED_UNIQUE, int(np.sqrt(budget / WEIGHTED_BYTES_PER_PAIR)))
+
+    def _max_components(self, n_rows: int) -> int:
+        """Most SVD components whose working arrays for n_rows fit the memory ceiling."""
+        budget = self._memory_budget()
+        if budget is None:
+            return n_rows
+        return int(budget // (n_rows * 8 * SVD_WORK_ARRAYS)) - SVD_OVERSAMPLES
+
+    @staticmethod
+    def _svd_features(svd: TruncatedSVD, tfidf_matrix, weights: Optional[np.ndarray]) -> np.ndarray:
+        """Dense SVD reduction of the (sparse) TF-IDF rows."""
+        if weights is None:
+            return svd.fit_transform(tfidf_matrix)
+        # Rows scaled by sqrt(count) have the covariance of the duplicated rows
+        svd.fit(tfidf_matrix.multiply(np.sqrt(weights)[:, None]).tocsr())
+        return svd.transform(tfidf_matrix)
+
+    def _silhouette(self, feature_matrix, labels: np.ndarray) -> float:
+        """Silhouette score; within the memory ceiling on a sample, with sklearn's pairwise chunks capped."""
+        if self.max_memory_mb is None:
+            return float(silhouette_score(feature_matrix, labels))
+        with config_context(working_memory=self.max_memory_mb):
+            return float(silhouette_score(
+                feature_matrix, labels, sample_size=min(len(labels), SILHOUETTE_MAX_SAMPLES), random_state=42
+            ))
+
+    def fit_featurizer(self, texts: List[str], max_features: Optional[int] = None) -> Tuple[List[str], np.ndarray, Any]:
+        """
+        Fit a TF-IDF featurizer like the clustering's on texts (enriched features),
+        optionally with a larger vocabulary (corpus-level featurizer).
+        
+        Returns (vocabulary in column order, idf, TF-IDF rows of the texts).
+        """
+        vectorizer = clone(self.vectorizer)
+        if max_features is not None:
+            vectorizer.set_params(max_features=max_features)
+        matrix = vectorizer.fit_transform(texts)
+        return vectorizer.get_feature_names_out().tolist(), vectorizer.idf_, matrix
+
+    def load_featurizer(self, vocabulary: List[str], idf: np.ndarray) -> TfidfVectorizer:
+        """A fitted TF-IDF vectorizer from a vocabulary and idf returned by fit_featurizer."""
+        params = dict(self.vectorizer.get_params(), vocabulary=vocabulary, max_features=None)
+        vectorizer = TfidfVectorizer(**params)
+        vectorizer.idf_ = np.asarray(idf, dtype=np.float64)
+        return vectorizer
+
+    @staticmethod
+    def collapse_duplicates(texts: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Collapse texts that vectorize identically (same text up to case and whitespace).
+        
+        Returns (unique texts in order of first appearance, count of each,
+        index into the unique texts for every input text).
+        """
+        index: Dict[str, int] = {}
+        unique_texts = []
+        inverse = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            key = ' '.join(text.lower().split())
+            j = index.get(key)
+            if j is None:
+                j = index[key] = len(unique_texts)
+                unique_texts.append(text)
+            inverse[i] = j
+        weights = np.bincount(inverse, minlength=len(unique_texts)).astype(np.float64)
+        return unique_texts, weights, inverse
+
+    def _weighted_tfidf(self, unique_texts: List[str], weights: np.ndarray):
+        """
+        TF-IDF rows of the unique texts as self.vectorizer would compute them on the
+        texts with each repeated `weights` times (vocabulary limit and idf use the
+        weighted term / document frequencies).
+        """
+        params = self.vectorizer.get_params()
+        for key in ('norm', 'use_idf', 'smooth_idf', 'sublinear_tf'):
+            params.pop(key)
+        max_features = params.pop('max_features')
+        counts = CountVectorizer(**params).fit_transform(unique_texts).tocsr()
+        
+        # Same selection as CountVectorizer: the max_features most frequent terms, kept in vocabulary order
+        if max_features is not None and counts.shape[1] > max_features:
+            term_freqs = counts.T @ weights
+            keep = np.zeros(counts.shape[1], dtype=bool)
+            keep[(-term_freqs).argsort()[:max_features]] = True
+            counts = counts[:, np.where(keep)[0]]
+        
+        transformer = TfidfTransformer(
+            norm=self.vectorizer.norm, use_idf=True,
+            smooth_idf=self.vectorizer.smooth_idf, sublinear_tf=self.vectorizer.sublinear_tf
+        ).fit(counts)
+        # Same arithmetic as TfidfTransformer.fit, on weighted document frequencies
+        doc_freqs = (counts > 0).astype(np.float64).T @ weights + float(self.vectorizer.smooth_idf)
+        idf = np.full_like(doc_freqs, fill_value=int(weights.sum()) + int(self.vectorizer.smooth_idf))
+        idf /= doc_freqs
+        np.log(idf, out=idf)
+        idf += 1.0
+        transformer.idf_ = idf
+        return transformer.transform(counts)
+
+    def _weighted_hdbscan_labels(self, dense_matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        HDBSCAN labels of the unique points as if each were repeated `weights` times.
+        
+        Copies of a point are at distance 0 from each other, so the expanded
+        problem's minimum spanning tree is the unique points' tree (mutual
+        reachability with core distances counted over the copies) plus a chain of
+        each point's copies at its core distance. Only that tree, which is linear
+        in the number of failures, is built at full size.
+        """
+        counts = weights.astype(np.intp)
+        n_samples = int(counts.sum())
+        min_samples = max(1, min(n_samples - 1, self.min_samples))
+        
+        distances = cdist(dense_matrix, dense_matrix)
+        # Core distance: distance to the (min_samples + 1)-th nearest point, the point itself included
+        order = np.argsort(distances, axis=1, kind='stable')
+        reached = np.cumsum(counts[order], axis=1) >= min_samples + 1
+        core = distances[np.arange(len(counts)), order[np.arange(len(counts)), reached.argmax(axis=1)]]
+        mutual = np.maximum(distances, np.maximum.outer(core, core))
+        
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        edges = [np.asarray(mst_linkage_core(mutual)).reshape(-1, 3)]
+        edges[0][:, 0] = starts[edges[0][:, 0].astype(np.intp)]
+        edges[0][:, 1] = starts[edges[0][:, 1].astype(np.intp)]
+        copies = np.flatnonzero(counts > 1)
+        if len(copies):
+            point = np.repeat(starts[copies], counts[copies] - 1) + np.concatenate([np.arange(c - 1) for c in counts[copies]])
+            edges.append(np.column_stack([point, point + 1, np.repeat(core[copies], counts[copies] - 1)]))
+        edges = np.concatenate(edges).astype(np.float64)
+        edges = edges[np.argsort(edges[:, 2], kind='stable')]
+        
+        labels = _tree_to_labels(
+            None, single_linkage_tree(edges), self.min_cluster_size, cluster_selection_method='eom'
+        )[0]
+        return labels[starts]
+
     def _cluster_hdbscan(
         self, 
         feature_matrix, 
-        texts: List[str]
+        texts: List[str],
+        weights: Optional[np.ndarray] = None
     ) -> Tuple[List[int], Dict[str, Any]]:
         """
         Perform HDBSCAN clustering.
         
         HDBSCAN automatically determines the optimal number of clusters
         and can identify outliers (noise points with label=-1).
+        With `weights`, each row stands for that many identical failures.
         """
         # Convert sparse matrix to dense for HDBSCAN (SVD output is already dense)
         # Check if sparse
@@ -481,20 +758,24 @@ class ImprovedFailureClusterer:
         else:
             dense_matrix = np.asarray(feature_matrix)
         
-        clusterer = HDBSCAN(
-            min_cluster_size=self.min_cluster_size,
-            min_samples=self.min_samples,
-            metric='euclidean',
-            cluster_selection_method='eom',  # Excess of Mass
-            prediction_data=False
-        )
-        
-        labels = clusterer.fit_predict(dense_matrix)
+        if weights is None:
+            clusterer = HDBSCAN(
+                min_cluster_size=self.min_cluster_size,
+                min_samples=self.min_samples,
+                metric='euclidean',
+                cluster_selection_method='eom',  # Excess of Mass
+                prediction_data=False
+            )
+            
+            labels = clusterer.fit_predict(dense_matrix)
+            weights = np.ones(len(labels))
+        else:
+            labels = self._weighted_hdbscan_labels(dense_matrix, weights)
         
         # Calculate metrics
         n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
-        n_outliers = int(np.sum(labels == -1))
-        n_samples = len(labels)
+        n_outliers = int(weights[labels == -1].sum())
+        n_samples = int(weights.sum())
         
         # Calculate silhouette score if we have valid clusters
         silhouette = -1.0
@@ -503,10 +784,7 @@ class ImprovedFailureClusterer:
                 # Only use non-outlier points for silhouette
                 valid_mask = labels != -1
                 if np.sum(valid_mask) >= 2:
-                    silhouette = float(silhouette_score(
-                        dense_matrix[valid_mask], 
-                        labels[valid_mask]
-                    ))
+                    silhouette = self._silhouette(dense_matrix[valid_mask], labels[valid_mask])
             except:
                 pass
         
@@ -524,35 +802,39 @@ class ImprovedFailureClusterer:
     def _cluster_kmeans(
         self, 
         tfidf_matrix, 
-        texts: List[str]
+        texts: List[str],
+        weights: Optional[np.ndarray] = None
     ) -> Tuple[List[int], Dict[str, Any]]:
         """
         Fallback KMeans clustering when HDBSCAN is not available.
         
         Uses a heuristic to determine cluster count.
+        With `weights`, each row stands for that many identical failures.
         """
-        n_samples = tfidf_matrix.shape[0]
+        n_samples = int(weights.sum()) if weights is not None else tfidf_matrix.shape[0]
         
         # Heuristic: sqrt(n/2) clusters, bounded
         n_clusters = max(2, min(20, int(np.sqrt(n_samples / 2)) + 1))
         
         if n_samples < n_clusters:
             n_clusters = max(1, n_samples // 2)
+        # No more clusters than distinct rows
+        n_clusters = min(n_clusters, tfidf_matrix.shape[0])
         
         kmeans = MiniBatchKMeans(
             n_clusters=n_clusters,
             random_state=42,
-            batch_size=min(100, n_samples),
+            batch_size=min(100, tfidf_matrix.shape[0]),
             n_init=3
         )
         
-        labels = kmeans.fit_predict(tfidf_matrix)
+        labels = kmeans.fit_predict(tfidf_matrix, sample_weight=weights)
         
         # Calculate silhouette score
         silhouette = -1.0
         if n_clusters >= 2 and n_samples >= 2:
             try:
-                silhouette = float(silhouette_score(tfidf_matrix, labels))
+                silhouette = self._silhouette(tfidf_matrix, labels)
             except:
                 pass
         
@@ -1,20 +1,88 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
-from sqlalchemy.pool import NullPool
+import time
+from sqlalchemy.pool import NullPool, QueuePool
 
 # Resolve absolute path to project root
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DB_PATH = os.path.join(BASE_DIR, "gms_analysis.db")
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
-print(f"DATABASE PATH: {SQLALCHEMY_DATABASE_URL}") # Debug print for uvicorn logs
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    poolclass=NullPool
+# SQLite performance profile:
+#   tuned  - WAL journal (readers are not blocked by an ingest commit), synchronous=NORMAL,
+#            mmap / page cache / in-memory temp tables, busy timeout, pooled connections
+#   legacy - rollback journal and a new connection per session (e.g. DB on a network
+#            filesystem, where WAL's shared memory does not work)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "tuned")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(16 * 1024))) # per connection
+# Per process: with PostgreSQL, (API + worker processes) x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# must stay below the server's max_connections (100 by default)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+TUNED_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+    "PRAGMA temp_store=MEMORY",
+    # Truncate the WAL back to 64 MB after checkpoints instead of keeping its peak size
+    "PRAGMA journal_size_limit=67108864",
 )
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in TUNED_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def normalize_url(url: str) -> str:
+    """postgres:// and postgresql:// select psycopg 3, the driver bulk loading (COPY) is written for."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def create_db_engine(url: str, profile: str = SQLITE_PROFILE):
+    url = normalize_url(url)
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            # Drop connections the server or a proxy closed (restarts, idle timeouts) before use
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args={"application_name": "gms-helper"} if url.startswith("postgresql") else {}
+        )
+
+    # timeout = busy timeout: wait for another connection's write lock instead of failing at once
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if profile != "tuned" or ":memory:" in url or "mode=memory" in url:
+        return create_engine(url, connect_args=connect_args, poolclass=NullPool)
+
+    db_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW
+    )
+    event.listen(db_engine, "connect", _apply_pragmas)
+    return db_engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+print(f"DATABASE PATH: {engine.url.render_as_string(hide_password=True)}") # Debug print for uvicorn logs
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -25,3 +93,23 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def is_locked_error(exc: BaseException) -> bool:
+    return isinstance(exc, OperationalError) and "database is locked" in str(exc)
+
+
+def retry_on_locked(db, operation, attempts: int = 3, delay: float = 0.5):
+    """
+    Run `operation()` (a short unit of work that commits on `db`), retrying with
+    backoff when SQLite stays locked beyond the busy timeout.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except OperationalError as e:
+            db.rollback()
+            if not is_locked_error(e) or attempt == attempts:
+                raise
+            print(f"Database locked, retrying ({attempt}/{attempts - 1})...")
+            time.sleep(delay * attempt)
@@ -0,0 +1,56 @@
+"""
+Shared helpers for content-addressed ("interned") lookup tables such as
+text_blobs and test_identities: rows are keyed by a unique `hash` column,
+inserted once and afterwards referenced by integer id.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List
+from sqlalchemy import Table, text
+from sqlalchemy.orm import Session
+
+
+def content_hash(value: str) -> str:
+    """128-bit BLAKE2b of the UTF-8 value, hex (32 chars)."""
+    return hashlib.blake2b(value.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def intern_rows(db: Session, table: Table, rows: Dict[str, Dict[str, Any]], cache: Dict[str, int]) -> Dict[str, int]:
+    """
+    Ensure every row (hash -> column values incl. "hash") exists in `table` and
+    add hash -> id for all of them to `cache`.
+    Rows stored earlier are looked up first (the common case for identities of a
+    re-run suite); the rest are insert-or-ignored (plain executemany) and read back
+    in one statement. Conflicts there are rows inserted concurrently by another ingestion.
+    """
+    missing = [h for h in rows if h not in cache]
+    if missing:
+        cache.update(lookup_ids(db, table, missing))
+        new_rows = [rows[h] for h in missing if h not in cache]
+        if new_rows:
+            db.execute(_insert_ignore(db, table), new_rows)
+            cache.update(lookup_ids(db, table, [row["hash"] for row in new_rows]))
+    return cache
+
+
+def lookup_ids(db: Session, table: Table, hashes: List[str]) -> Dict[str, int]:
+    """hash -> id for the given hashes (unknown hashes are left out)."""
+    if not hashes:
+        return {}
+    # One bound array parameter instead of one parameter per hash
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(text(f"SELECT hash, id FROM {table.name} WHERE hash = ANY(:hashes)"), {"hashes": hashes})
+    else:
+        rows = db.execute(
+            text(f"SELECT hash, id FROM {table.name} WHERE hash IN (SELECT value FROM json_each(:hashes))"),
+            {"hashes": json.dumps(hashes)}
+        )
+    return {h: row_id for h, row_id in rows}
+
+
+def _insert_ignore(db: Session, table: Table):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing(index_elements=["hash"])
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Enum, Float, Index, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, Text, ForeignKey, DateTime, Enum, Float, Index, Boolean, LargeBinary, event, func, select
+from sqlalchemy.orm import relationship, column_property
 from datetime import datetime
 import enum
 from backend.database.database import Base
@@ -16,7 +16,7 @@ class Submission(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True) # e.g., "Submission for fingerpint X"
-    status = Column(String, default="draft") # draft, analyzing, ready, published
+    status = Column(String, default="draft") # draft, analyzing, ready, published, deleting
     gms_version = Column(String, nullable=True) # e.g., "14_r3"
     lab_name = Column(String, nullable=True)
     target_fingerprint = Column(String, index=True, nullable=True) # Auto-grouping Key
@@ -29,6 +29,47 @@ class Submission(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     test_runs = relationship("TestRun", back_populates="submission", cascade="all, delete-orphan")
+    suite_summaries = relationship("SuiteSummary", cascade="all, delete-orphan")
+    merge_suites = relationship("MergeSuiteState", cascade="all, delete-orphan")
+    merge_states = relationship("MergeState", cascade="all, delete-orphan")
+
+class SuiteSummary(Base):
+    """Cached merged result of a submission's runs for one configured suite (see SuiteSummaryService)."""
+    __tablename__ = "suite_summaries"
+
+    submission_id = Column(Integer, ForeignKey("submissions.id"), primary_key=True)
+    suite_name = Column(String, primary_key=True)
+    run_ids = Column(Text, default="[]") # JSON list of matching runs, oldest first; empty = suite missing
+    total_tests = Column(Integer, default=0)
+    initial_failed = Column(Integer, default=0)
+    recovered = Column(Integer, default=0)
+    remaining = Column(Integer, default=0)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class MergeSuiteState(Base):
+    """Runs covered by a suite's merge_states rows, in history (bit) order."""
+    __tablename__ = "merge_suite_states"
+
+    submission_id = Column(Integer, ForeignKey("submissions.id"), primary_key=True)
+    suite_name = Column(String, primary_key=True) # Merge report suite group, e.g. CTS, CTSonGSI, GTS
+    run_ids = Column(Text, default="[]") # JSON list, oldest first: run_ids[i] is history bit i
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class MergeState(Base):
+    """Merged result of one test across the runs of a submission's suite (tests that failed at least once)."""
+    __tablename__ = "merge_states"
+
+    submission_id = Column(Integer, ForeignKey("submissions.id"), primary_key=True)
+    suite_name = Column(String, primary_key=True)
+    test_identity_id = Column(Integer, ForeignKey("test_identities.id"), primary_key=True)
+    fail_mask = Column(BigInteger, default=0) # bit i set: failed in run i
+    pass_mask = Column(BigInteger, default=0) # bit i set: passed in run i
+    other_statuses = Column(Text, nullable=True) # JSON {bit: status} of other results (e.g. IGNORED); NULL if none
+    latest_status = Column(String) # Status in the newest run: fail, pass, another stored status or not_executed
+    first_case_id = Column(Integer) # First stored row of the test in the group (merge report item order)
+    first_fail_run_id = Column(Integer)
+    last_fail_case_id = Column(Integer) # Representative failure (newest run it failed in)
+    recovered = Column(Boolean, default=False) # Failed in the first run and passed in a later one
 
 class TestRun(Base):
     __tablename__ = "test_runs"
@@ -64,7 +105,7 @@ class TestRun(Base):
     failed_modules = Column(Integer, default=0)
     xml_modules_done = Column(Integer, default=0)   # From XML <Summary modules_done>
     xml_modules_total = Column(Integer, default=0)  # From XML <Summary modules_total>
-    status = Column(String, default="pending") # pending, processing, completed, failed
+    status = Column(String, default="pending") # pending, processing, completed, failed, deleting
     analysis_status = Column(String, default="pending") # pending, analyzing, completed, failed
     
     submission_id = Column(Integer, ForeignKey("submissions.id"), nullable=True)
@@ -72,6 +113,7 @@ class TestRun(Base):
     
     test_cases = relationship("TestCase", back_populates="test_run", cascade="all, delete-orphan")
     executed_modules = relationship("TestRunModule", back_populates="test_run", cascade="all, delete-orphan")
+    pass_set = relationship("RunPassSet", uselist=False, back_populates="test_run", cascade="all, delete-orphan")
 
 class TestRunModule(Base):
     """Stores the list of modules that were actually executed in a Test Run."""
@@ -81,33 +123,102 @@ class TestRunModule(Base):
     test_run_id = Column(Integer, ForeignKey("test_runs.id"), index=True)
     module_name = Column(String, index=True)
     module_abi = Column(String)
+    # Per-module results, materialized at ingest (NULL for runs ingested before they existed)
+    passed_tests = Column(Integer)
+    failed_tests = Column(Integer)
+    ignored_tests = Column(Integer)
+    done = Column(Boolean) # Module "done" attribute; NULL when the report does not say
+    runtime_ms = Column(Integer)
     
     test_run = relationship("TestRun", back_populates="executed_modules")
 
+class RunPassSet(Base):
+    """The complete set of tests that passed in a Test Run, as test identity ids (see PassSetService)."""
+    __tablename__ = "run_pass_sets"
+
+    test_run_id = Column(Integer, ForeignKey("test_runs.id"), primary_key=True)
+    test_count = Column(Integer, default=0)
+    data = Column(LargeBinary, nullable=False) # zlib(sorted uint32 id deltas)
+
+    test_run = relationship("TestRun", back_populates="pass_set")
+
 class TestCase(Base):
     # NOTE: This table ONLY stores failed test cases to save space and improve performance.
-    # Passing test cases are counted in TestRun stats but not stored individually.
+    # Passing test cases are counted in TestRun stats and kept as a compact RunPassSet, not stored individually.
     __tablename__ = "test_cases"
 
     id = Column(Integer, primary_key=True, index=True)
-    test_run_id = Column(Integer, ForeignKey("test_runs.id"))
+    test_run_id = Column(Integer, ForeignKey("test_runs.id"), index=True)
     module_name = Column(String, index=True)
     module_abi = Column(String)
     class_name = Column(String, index=True)
     method_name = Column(String, index=True)
     status = Column(String) # stored as string to be flexible, but logically TestResultStatus
-    stack_trace = Column(Text, nullable=True)
-    error_message = Column(Text, nullable=True)
+    # Interned (module, abi, class, method): cross-run comparisons are integer joins (see TestIdentityService)
+    test_identity_id = Column(Integer, ForeignKey("test_identities.id"), nullable=True, index=True)
+    # Failure text lives deduplicated in text_blobs (see TextBlobService)
+    stack_trace_id = Column(Integer, ForeignKey("text_blobs.id"), nullable=True, index=True)
+    error_message_id = Column(Integer, ForeignKey("text_blobs.id"), nullable=True, index=True)
+    # Legacy inline text; migrate_db moves it into text_blobs. Read via stack_trace / error_message below.
+    stack_trace_inline = Column("stack_trace", Text, nullable=True)
+    error_message_inline = Column("error_message", Text, nullable=True)
     
     test_run = relationship("TestRun", back_populates="test_cases")
     failure_analysis = relationship("FailureAnalysis", uselist=False, back_populates="test_case", cascade="all, delete-orphan")
 
+class TestIdentity(Base):
+    # One row per distinct test (module, abi, class, method) ever stored.
+    # Identities are immutable and never deleted, so their ids are safe to cache.
+    __tablename__ = "test_identities"
+
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(32), unique=True, index=True, nullable=False) # TestIdentityService.identity_hash
+    module_name = Column(String, nullable=False)
+    module_abi = Column(String, nullable=False) # '' when the result has no ABI
+    class_name = Column(String, nullable=False)
+    method_name = Column(String, nullable=False)
+
+class TextBlob(Base):
+    # Content-addressed failure text: thousands of failures in a run often share
+    # byte-identical stack traces / messages, so each distinct text is stored once.
+    __tablename__ = "text_blobs"
+
+    id = Column(Integer, primary_key=True)
+    hash = Column(String(32), unique=True, index=True, nullable=False) # TextBlobService.text_hash of the content
+    content = Column(Text, nullable=False)
+
+# Read-only text attributes, loaded with the row (PK lookups into text_blobs)
+TestCase.stack_trace = column_property(
+    func.coalesce(
+        select(TextBlob.content).where(TextBlob.id == TestCase.stack_trace_id).scalar_subquery(),
+        TestCase.stack_trace_inline
+    )
+)
+TestCase.error_message = column_property(
+    func.coalesce(
+        select(TextBlob.content).where(TextBlob.id == TestCase.error_message_id).scalar_subquery(),
+        TestCase.error_message_inline
+    )
+)
+
+
+def _read_only_text(target, value, oldvalue, initiator):
+    # A write to the select above would be silently dropped at flush
+    raise AttributeError(
+        f"TestCase.{initiator.key} is read-only: set {initiator.key}_id "
+        f"(TextBlobService.resolve_ids) or {initiator.key}_inline"
+    )
+
+
+for _attribute in (TestCase.stack_trace, TestCase.error_message):
+    event.listen(_attribute, "set", _read_only_text)
+
 class FailureAnalysis(Base):
     __tablename__ = "failure_analysis"
 
     id = Column(Integer, primary_key=True, index=True)
-    test_case_id = Column(Integer, ForeignKey("test_cases.id"))
-    cluster_id = Column(Integer, ForeignKey("failure_clusters.id"), nullable=True)
+    test_case_id = Column(Integer, ForeignKey("test_cases.id"), index=True)
+    cluster_id = Column(Integer, ForeignKey("failure_clusters.id"), nullable=True, index=True)
     root_cause = Column(Text, nullable=True)
     suggested_solution = Column(Text, nullable=True)
     ai_analysis_timestamp = Column(DateTime, default=datetime.utcnow)
@@ -134,6 +245,40 @@ class FailureCluster(Base):
     suggested_assignment = Column(String, nullable=True) # e.g., Audio Team
     redmine_issue_id = Column(Integer, nullable=True) # Linked Redmine Issue ID
 
+class ClusterFeaturizer(Base):
+    """TF-IDF state (vocabulary, idf) that cluster centroids were computed with: a module group's or the corpus'."""
+    __tablename__ = "cluster_featurizers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    module_name = Column(String, index=True) # NULL for a corpus featurizer
+    version = Column(Integer, nullable=True, index=True) # Corpus featurizer version (FeaturizerService)
+    data = Column(LargeBinary, nullable=False) # zlib(JSON {"vocabulary": [...], "idf": [...]})
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class FeaturizerVersion(Base):
+    """Version of the corpus TF-IDF featurizer (FeaturizerService); the newest is the current one."""
+    __tablename__ = "featurizer_versions"
+
+    version = Column(Integer, primary_key=True)
+    data = Column(LargeBinary, nullable=False) # zlib(JSON {"vocabulary": [...], "idf": [...]})
+    checksum = Column(String(64), nullable=False) # sha256 of data; names the version's on-disk cache
+    n_docs = Column(Integer) # Failures fitted on
+    max_case_id = Column(Integer) # Newest failure fitted on: later ones count towards the next refit
+    max_features = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ClusterCentroid(Base):
+    """Mean TF-IDF row of an analyzed cluster's failures in one module, for assigning new failures to it."""
+    __tablename__ = "cluster_centroids"
+
+    cluster_id = Column(Integer, ForeignKey("failure_clusters.id"), primary_key=True)
+    # A cluster (found by signature) can span modules: one centroid per module it has failures in
+    module_name = Column(String, primary_key=True, index=True)
+    featurizer_id = Column(Integer, ForeignKey("cluster_featurizers.id"), index=True)
+    n_members = Column(Integer, default=0)
+    centroid = Column(LargeBinary, nullable=False) # float32, in the featurizer's columns
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Settings(Base):
     """Store application settings with encrypted values."""
     __tablename__ = "settings"
@@ -166,3 +311,39 @@ class TestSuiteConfig(Base):
     sort_order = Column(Integer, default=0)
     description = Column(String, nullable=True)
 
+
+class Job(Base):
+    """Durable background work (ingestion, analysis) claimed by worker processes with leases (see JobQueue)."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False) # ingest, analysis, delete
+    payload = Column(Text, default="{}") # JSON keyword arguments for the handler
+    test_run_id = Column(Integer, nullable=True, index=True) # Run the job works on (progress events, filtering)
+    status = Column(String, default="queued") # queued, running, succeeded, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow) # Retry backoff: not claimable before this
+    lease_owner = Column(String, nullable=True) # "host:pid:slot" of the claiming worker
+    lease_expires_at = Column(DateTime, nullable=True) # Extended by heartbeats; expired leases are reclaimed
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    progress = Column(Text, nullable=True) # Latest progress event (JSON), persisted by the worker's heartbeat
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "job_type", "run_after"),
+    )
+
+class OrphanCandidate(Base):
+    """
+    Failure cluster / text blob whose referencing rows a delete job removed, recorded in the same
+    transaction so that garbage collection (DeletionService.collect_garbage) survives a retried job.
+    """
+    __tablename__ = "orphan_candidates"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False) # "cluster" or "blob"
+    ref_id = Column(Integer, nullable=False) # failure_clusters.id / text_blobs.id
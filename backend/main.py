@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from backend.routers import upload, reports, analysis, system, settings, integrations, import_json, submissions, config, export
+from backend.routers import upload, reports, analysis, system, settings, integrations, import_json, submissions, config, export, jobs
 from backend.database.database import engine, Base
 import os
 
@@ -57,6 +57,22 @@ app.include_router(import_json.router, prefix="/api/import", tags=["Import"])
 app.include_router(submissions.router, prefix="/api/submissions", tags=["Submissions"])
 app.include_router(config.router, prefix="/api/config", tags=["Config"])
 app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
+
+# Background jobs (ingestion, analysis) run in backend/worker.py processes;
+# EMBEDDED_WORKER=1 also runs a worker inside the API process (single-container setups)
+from backend.worker import EMBEDDED_WORKER, WORKER_CONCURRENCY, Worker, parse_concurrency
+embedded_worker = Worker(parse_concurrency(WORKER_CONCURRENCY)) if EMBEDDED_WORKER else None
+
+@app.on_event("startup")
+def start_embedded_worker():
+    if embedded_worker:
+        embedded_worker.start()
+
+@app.on_event("shutdown")
+def stop_embedded_worker():
+    if embedded_worker:
+        embedded_worker.stop(timeout=5)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="backend/static"), name="static")
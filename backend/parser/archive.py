@@ -0,0 +1,141 @@
+"""
+Stream access to compressed test results.
+
+Labs ship results as gzipped test_result.xml files or as zip/tar archives of
+whole tradefed `results/<timestamp>/` folders. These helpers locate the
+result XMLs inside such files and open them as decompressing streams, so
+the parser can consume them directly without a decompressed copy on disk.
+"""
+import gzip
+import os
+import struct
+import tarfile
+import zipfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, IO, Tuple
+
+# Order matters: longest suffix first
+SUPPORTED_EXTENSIONS = (".xml.gz", ".tar.gz", ".tgz", ".tar", ".zip", ".gz", ".xml")
+
+RESULT_XML_NAME = "test_result.xml"
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Return 'xml', 'gzip', 'zip' or 'tar' for a supported filename, else None."""
+    name = filename.lower()
+    if name.endswith((".tar.gz", ".tgz", ".tar")):
+        return "tar"
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith(".gz"):
+        return "gzip"
+    if name.endswith(".xml"):
+        return "xml"
+    return None
+
+
+def is_supported(filename: str) -> bool:
+    return detect_format(filename) is not None
+
+
+def _pick_result_members(names: List[str]) -> List[str]:
+    """Prefer tradefed's test_result.xml files, fall back to any XML in the archive."""
+    candidates = [
+        n for n in names
+        if not n.endswith("/") and "__MACOSX/" not in n and not os.path.basename(n).startswith("._")
+    ]
+    results = [n for n in candidates if os.path.basename(n).lower() == RESULT_XML_NAME]
+    if not results:
+        results = [n for n in candidates if n.lower().endswith(".xml")]
+    return sorted(results)
+
+
+def result_members(path: str) -> List[Tuple[Optional[str], int]]:
+    """
+    (member, uncompressed size) of each result XML contained in a file, from a
+    single pass over the archive: pass both on (open_result_stream, result_size
+    of a tar member each decompress the archive again).
+    Plain and gzipped XML files contain a single (unnamed) result: [(None, size)].
+    """
+    fmt = detect_format(path)
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as zf:
+            sizes = {info.filename: info.file_size for info in zf.infolist()}
+    elif fmt == "tar":
+        with tarfile.open(path, "r:*") as tf:
+            sizes = {m.name: m.size for m in tf.getmembers() if m.isfile()}
+    else:
+        return [(None, result_size(path))]
+    return [(name, sizes[name]) for name in _pick_result_members(list(sizes))]
+
+
+def list_result_members(path: str) -> List[Optional[str]]:
+    """
+    List the result XMLs contained in a file.
+    Plain and gzipped XML files contain a single (unnamed) result: [None].
+    """
+    return [name for name, _ in result_members(path)]
+
+
+@contextmanager
+def open_result_stream(path: str, member: Optional[str] = None) -> Iterator[IO[bytes]]:
+    """Open a result XML (optionally an archive member) as a binary, decompressing stream."""
+    fmt = detect_format(path) or "xml"
+
+    if fmt == "xml":
+        with open(path, "rb") as f:
+            yield f
+    elif fmt == "gzip":
+        with gzip.open(path, "rb") as f:
+            yield f
+    elif fmt == "zip":
+        with zipfile.ZipFile(path) as zf:
+            name = member or _first_member(zf.namelist(), path)
+            with zf.open(name) as f:
+                yield f
+    elif member is None:
+        # Random access mode: the first result is only known once all members are listed
+        with tarfile.open(path, "r:*") as tf:
+            name = _first_member([m.name for m in tf.getmembers() if m.isfile()], path)
+            with tf.extractfile(name) as f:
+                yield f
+    else:
+        # Stream mode: decompress up to the member only, instead of indexing the whole archive first
+        with tarfile.open(path, "r|*") as tf:
+            for info in tf:
+                if info.name == member:
+                    f = tf.extractfile(info)
+                    if f is None:
+                        raise ValueError(f"Archive member {member} is not a regular file")
+                    with f:
+                        yield f
+                    return
+        raise KeyError(f"Archive member {member} not found in {os.path.basename(path)}")
+
+
+def _first_member(names: List[str], path: str) -> str:
+    members = _pick_result_members(names)
+    if not members:
+        raise ValueError(f"No result XML found in archive {os.path.basename(path)}")
+    return members[0]
+
+
+def result_size(path: str, member: Optional[str] = None) -> int:
+    """Best-effort uncompressed size of a result XML (used for throughput reporting)."""
+    fmt = detect_format(path) or "xml"
+    try:
+        if fmt == "zip":
+            with zipfile.ZipFile(path) as zf:
+                return zf.getinfo(member or _first_member(zf.namelist(), path)).file_size
+        if fmt == "tar":
+            with tarfile.open(path, "r:*") as tf:
+                return tf.getmember(member or _first_member([m.name for m in tf.getmembers() if m.isfile()], path)).size
+        if fmt == "gzip":
+            # ISIZE trailer: uncompressed size modulo 2^32
+            with open(path, "rb") as f:
+                f.seek(-4, os.SEEK_END)
+                isize = struct.unpack("<I", f.read(4))[0]
+            return max(isize, os.path.getsize(path))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, tarfile.TarError):
+        pass
+    return os.path.getsize(path)
@@ -1,9 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Generator, Dict, Any
+from typing import Generator, Dict, Any, Optional
 
 class BaseParser(ABC):
     @abstractmethod
-    def parse(self, file_path: str) -> Generator[Dict[str, Any], None, None]:
+    def parse(self, file_path: str, member: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
         """
         Parses the test result file and yields test case data.
         Should yield a dictionary with keys matching the TestCase model.
@@ -11,7 +11,7 @@ class BaseParser(ABC):
         pass
 
     @abstractmethod
-    def get_metadata(self, file_path: str) -> Dict[str, Any]:
+    def get_metadata(self, file_path: str, member: Optional[str] = None) -> Dict[str, Any]:
         """
         Extracts metadata about the test run (suite name, device info, etc.)
         """
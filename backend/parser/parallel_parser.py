@@ -0,0 +1,177 @@
+"""
+Module-sharded parallel parsing of large tradefed result XMLs.
+
+A full CTS result holds ~1,000 <Module> elements and millions of <Test>
+elements. Modules never nest and markup characters inside attribute values
+and text are always escaped, so a byte scan for "<Module" ... "</Module>"
+finds every module's byte range without building a tree. Ranges are
+grouped into shards, parsed in a process pool with the regular XMLParser
+logic, and the results are merged back in file order. The output is
+identical to XMLParser.parse.
+"""
+import io
+import mmap
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from backend.parser.archive import detect_format
+from backend.parser.xml_parser import XMLParser
+
+# Parser processes for large plain-XML uploads (0 = one per CPU core)
+PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Below this size the process pool start-up costs more than it saves
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# Target shard size; many shards keep all workers busy, large ones keep IPC overhead low
+SHARD_BYTES = 4 * 1024 * 1024
+
+# Start tag with its attributes; quoted values may legally contain a raw ">"
+_MODULE_OPEN = re.compile(rb"""<Module(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|'[^']*'))*\s*(/?)>""")
+_MODULE_CLOSE = b"</Module>"
+_XML_DECL = re.compile(rb"<\?xml[^>]*\?>")
+
+# Compact wire format for items crossing the process boundary (tuples pickle much faster than dicts)
+_MODULE_FIELDS = ("module_name", "module_abi", "done", "runtime_ms")
+_TEST_FIELDS = ("module_name", "module_abi", "class_name", "method_name", "status", "stack_trace", "error_message")
+
+
+def scan_module_ranges(buf) -> Optional[List[Tuple[int, int]]]:
+    """
+    Return the (start, end) byte range of every <Module> element in file order,
+    or None when the layout is not one the sharded parser can reproduce exactly
+    (no modules, or Test elements outside of any module).
+    """
+    ranges = []
+    pos = 0
+    gaps = []
+    while True:
+        m = _MODULE_OPEN.search(buf, pos)
+        if not m:
+            break
+        start = m.start()
+        if m.group(1):
+            end = m.end()  # <Module ... />
+        else:
+            close = buf.find(_MODULE_CLOSE, m.end())
+            if close == -1:
+                return None
+            end = close + len(_MODULE_CLOSE)
+        gaps.append((pos, start))
+        ranges.append((start, end))
+        pos = end
+    gaps.append((pos, len(buf)))
+
+    if not ranges:
+        return None
+    for gap_start, gap_end in gaps:
+        if buf.find(b"<Test", gap_start, gap_end) != -1:
+            return None
+    return ranges
+
+
+def _group_shards(ranges: List[Tuple[int, int]], shard_bytes: int) -> List[List[Tuple[int, int]]]:
+    shards = []
+    current = []
+    size = 0
+    for r in ranges:
+        current.append(r)
+        size += r[1] - r[0]
+        if size >= shard_bytes:
+            shards.append(current)
+            current = []
+            size = 0
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _parse_shard(file_path: str, decl: bytes, ranges: List[Tuple[int, int]]) -> List[tuple]:
+    """Worker: parse a run of module ranges and return items in the compact wire format."""
+    parser = XMLParser()
+    out = []
+    with open(file_path, "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            fragment = f.read(end - start)
+            # Keep the document's XML declaration so a non-UTF-8 encoding is honoured
+            for item in parser.parse(io.BytesIO(decl + fragment)):
+                if item.get("type") == "module_info":
+                    out.append(tuple(item[k] for k in _MODULE_FIELDS))
+                else:
+                    out.append(tuple(item[k] for k in _TEST_FIELDS))
+    return out
+
+
+def _decode(packed: tuple) -> Dict[str, Any]:
+    if len(packed) == 4:
+        return dict(zip(_MODULE_FIELDS, packed), type="module_info")
+    return dict(zip(_TEST_FIELDS, packed))
+
+
+class ParallelXMLParser(XMLParser):
+    """
+    Drop-in XMLParser that parses plain result XMLs across `workers` processes.
+    Anything it cannot shard exactly (archives, gzip, unusual layouts) is parsed sequentially.
+    """
+
+    def __init__(self, workers: Optional[int] = None, shard_bytes: int = SHARD_BYTES):
+        self.workers = workers or PARSER_WORKERS
+        self.shard_bytes = shard_bytes
+
+    def parse(self, file_path: str, member: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+        if self.workers <= 1 or member is not None or detect_format(str(file_path)) != "xml":
+            yield from super().parse(file_path, member)
+            return
+
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield from super().parse(file_path, member)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                ranges = scan_module_ranges(buf)
+                decl_match = _XML_DECL.match(buf, 0, 1024)
+                decl = decl_match.group(0) if decl_match else b""
+
+        if ranges is None:
+            yield from super().parse(file_path, member)
+            return
+
+        shards = _group_shards(ranges, self.shard_bytes)
+        print(f"[Parser] {len(ranges)} modules in {len(shards)} shards across {self.workers} workers")
+
+        # Keep a bounded window of shards in flight and yield results in file order
+        self.bytes_read = 0
+        # Spawned, not forked: this runs next to the ingestion writer and heartbeat threads (and the API's)
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pending = deque()
+            shard_iter = iter(shards)
+            for shard in shard_iter:
+                pending.append((pool.submit(_parse_shard, file_path, decl, shard), shard[-1][1]))
+                if len(pending) >= self.workers * 2:
+                    break
+            while pending:
+                future, shard_end = pending.popleft()
+                packed_items = future.result()
+                next_shard = next(shard_iter, None)
+                if next_shard is not None:
+                    pending.append((pool.submit(_parse_shard, file_path, decl, next_shard), next_shard[-1][1]))
+                for packed in packed_items:
+                    yield _decode(packed)
+                self.bytes_read = shard_end
+
+
+def make_parser(file_path: str, member: Optional[str] = None) -> XMLParser:
+    """Pick the parallel parser for large plain XMLs when more than one core is available."""
+    if (
+        PARSER_WORKERS > 1
+        and member is None
+        and detect_format(file_path) == "xml"
+        and os.path.getsize(file_path) >= PARALLEL_MIN_BYTES
+    ):
+        return ParallelXMLParser()
+    return XMLParser()
@@ -1,12 +1,43 @@
 from backend.parser.base_parser import BaseParser
+from backend.parser.archive import open_result_stream
 from lxml import etree
-from typing import Generator, Dict, Any
+from typing import Generator, Dict, Any, List, Optional
+from contextlib import nullcontext
 import os
 
+
+class _CountingReader:
+    """Binary stream wrapper that adds the (decompressed) bytes read to `parser.bytes_read`."""
+
+    def __init__(self, source, parser: "XMLParser"):
+        self._source = source
+        self._parser = parser
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._source.read(size)
+        self._parser.bytes_read += len(data)
+        return data
+
+
 class XMLParser(BaseParser):
-    def get_metadata(self, file_path: str) -> Dict[str, Any]:
-        context = etree.iterparse(file_path, events=('start',))
-        metadata = {
+    """
+    Streaming parser for tradefed result XML.
+    `file_path` may be a plain .xml, a gzipped XML or a zip/tar archive (pick the
+    result with `member`), or an already-open binary stream.
+    `bytes_read` tracks how far `parse` got (for progress reporting).
+    """
+
+    bytes_read = 0
+
+    @staticmethod
+    def _open(file_path, member: Optional[str] = None):
+        if not isinstance(file_path, (str, os.PathLike)):
+            return nullcontext(file_path)
+        return open_result_stream(os.fspath(file_path), member)
+
+    @staticmethod
+    def _empty_metadata() -> Dict[str, Any]:
+        return {
             "test_suite_name": "Unknown",
             "device_fingerprint": "Unknown",
             "build_id": "Unknown",
@@ -24,63 +55,72 @@ class XMLParser(BaseParser):
             "modules_done": 0,
             "modules_total": 0
         }
-        
+
+    @staticmethod
+    def _update_metadata(metadata: Dict[str, Any], elem) -> None:
+        """Fill metadata from a Result / Build / Summary element (attributes are available on 'start')."""
+        # Use endswith to handle namespaces (e.g. {http://...}Result)
+        if elem.tag.endswith('Result'):
+            metadata["test_suite_name"] = elem.get('suite_name', 'Unknown')
+            metadata["start_time"] = elem.get('start')
+            metadata["end_time"] = elem.get('end')
+            metadata["start_display"] = elem.get('start_display')
+            metadata["end_display"] = elem.get('end_display')
+            metadata["host_name"] = elem.get('host_name', 'Unknown')
+            metadata["suite_version"] = elem.get('suite_version', 'Unknown')
+            metadata["suite_plan"] = elem.get('suite_plan', 'Unknown')
+            metadata["suite_build_number"] = elem.get('suite_build_number', 'Unknown')
+        elif elem.tag.endswith('Build'):
+            # Tradefed uses build_fingerprint (e.g. build_fingerprint="Trimble/T70/thorpe:15/...")
+            metadata["device_fingerprint"] = elem.get('build_fingerprint', 'Unknown')
+            metadata["build_id"] = elem.get('build_id', 'Unknown')
+            metadata["build_product"] = elem.get('build_product', 'Unknown')
+            metadata["build_model"] = elem.get('build_model', 'Unknown')
+            metadata["build_type"] = elem.get('build_type', 'Unknown')
+            metadata["security_patch"] = elem.get('build_version_security_patch', 'Unknown')
+            metadata["android_version"] = elem.get('build_version_release', 'Unknown')
+            metadata["build_version_sdk"] = elem.get('build_version_sdk', 'Unknown')
+            metadata["build_version_incremental"] = elem.get('build_version_incremental', 'Unknown')
+        elif elem.tag.endswith('Summary'):
+            try:
+                metadata["modules_done"] = int(elem.get('modules_done', 0))
+                metadata["modules_total"] = int(elem.get('modules_total', 0))
+            except (ValueError, TypeError):
+                pass
+
+    def get_metadata(self, file_path: str, member: Optional[str] = None) -> Dict[str, Any]:
+        with self._open(file_path, member) as source:
+            return self._read_metadata(source)
+
+    def _read_metadata(self, source) -> Dict[str, Any]:
+        context = etree.iterparse(source, events=('start',))
+        metadata = self._empty_metadata()
+
         try:
             for event, elem in context:
-                # Use endswith to handle namespaces (e.g. {http://...}Result)
-                if elem.tag.endswith('Result'):
-                    metadata["test_suite_name"] = elem.get('suite_name', 'Unknown')
-                    metadata["start_time"] = elem.get('start')
-                    metadata["end_time"] = elem.get('end')
-                    metadata["start_display"] = elem.get('start_display')
-                    metadata["end_display"] = elem.get('end_display')
-                    metadata["host_name"] = elem.get('host_name', 'Unknown')
-                    metadata["suite_version"] = elem.get('suite_version', 'Unknown')
-                    metadata["suite_plan"] = elem.get('suite_plan', 'Unknown')
-                    metadata["suite_build_number"] = elem.get('suite_build_number', 'Unknown')
-                elif elem.tag.endswith('Build'):
-                    metadata["device_fingerprint"] = elem.get('build_fingerprint', 'Unknown') # Note: XML uses build_fingerprint usually, checking sample
-                    # Re-checking sample_cts.xml for attribute names
-                    # sample_cts.xml: <Build ... build_fingerprint="..." build_id="..." build_product="..." ... />
-                    # Wait, line 3 says: build_fingerprint="Trimble/T70/thorpe:15/..."
-                    # The original code used elem.get('fingerprint', 'Unknown'). 
-                    # Let's check if 'fingerprint' exists or if it should be 'build_fingerprint'.
-                    # Looking at sample_cts.xml line 3: build_fingerprint="..."
-                    # So original code might be wrong or generic. I will use build_fingerprint.
-                    if metadata["device_fingerprint"] == 'Unknown':
-                         metadata["device_fingerprint"] = elem.get('build_fingerprint', 'Unknown')
-                    
-                    metadata["build_id"] = elem.get('build_id', 'Unknown')
-                    metadata["build_product"] = elem.get('build_product', 'Unknown')
-                    metadata["build_model"] = elem.get('build_model', 'Unknown')
-                    metadata["build_type"] = elem.get('build_type', 'Unknown')
-                    metadata["security_patch"] = elem.get('build_version_security_patch', 'Unknown')
-                    metadata["android_version"] = elem.get('build_version_release', 'Unknown')
-                    metadata["build_version_sdk"] = elem.get('build_version_sdk', 'Unknown')
-                    metadata["build_version_incremental"] = elem.get('build_version_incremental', 'Unknown')
-                elif elem.tag.endswith('Summary'):
-                    try:
-                        metadata["modules_done"] = int(elem.get('modules_done', 0))
-                        metadata["modules_total"] = int(elem.get('modules_total', 0))
-                    except (ValueError, TypeError):
-                        pass
-                
+                self._update_metadata(metadata, elem)
+
                 # We only need the top-level info, so we can stop early if we have everything
                 # Summary comes after Build, so check for it too
-                if (metadata["test_suite_name"] != "Unknown" and 
+                if (metadata["test_suite_name"] != "Unknown" and
                     metadata["device_fingerprint"] != "Unknown" and
                     metadata["modules_total"] > 0):
                     break
-                
+
                 # Clear element to save memory
                 elem.clear()
         except Exception as e:
             print(f"Error parsing metadata: {e}")
-            
+
         del context
         return metadata
 
-    def parse(self, file_path: str) -> Generator[Dict[str, Any], None, None]:
+    def parse(self, file_path: str, member: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+        self.bytes_read = 0
+        with self._open(file_path, member) as source:
+            yield from self._iter_results(_CountingReader(source, self))
+
+    def _iter_results(self, source) -> Generator[Dict[str, Any], None, None]:
         # CTS/VTS XML structure usually:
         # <Result>
         #   <Module name="...">
@@ -92,77 +132,127 @@ class XMLParser(BaseParser):
         #   </Module>
         # </Result>
 
-        context = etree.iterparse(file_path, events=('end',))
-        
-        current_module = None
-        current_class = None
+        context = etree.iterparse(source, events=('end',))
 
         for event, elem in context:
-            if elem.tag.endswith('Module'):
-                # Handle Module (End event)
-                current_module = elem.get('name')
-                
-                yield {
-                    "type": "module_info",
-                    "module_name": elem.get('name'),
-                    "module_abi": elem.get('abi')
-                }
-                pass
-            
-            elif elem.tag.endswith('Test'):
-                # This is a test case result
-                # This is a test case result
-                test_name = elem.get('name')
-                result_status = elem.get('result')
-                
-                # Get parent info
-                test_case_elem = elem.getparent()
-                class_name = test_case_elem.get('name') if test_case_elem is not None else "Unknown"
-                
-                module_elem = test_case_elem.getparent() if test_case_elem is not None else None
-                module_name = module_elem.get('name') or module_elem.get('appPackageName') if module_elem is not None else "Unknown"
-                module_abi = module_elem.get('abi') or module_elem.get('digests') if module_elem is not None else "Unknown"
-                
-                # Extract failure info if any
-                failure_msg = None
-                stack_trace = None
-                
-                # Find Failure child
-                # Since we are at 'end' of Test, children are processed. 
-                # Find Failure/TestResult elements in the current Test element
-                if not result_status:
-                    # Find Failure/TestResult elements in the current Test element
-                    pass # logic moved to loop below
-
-                # Find Failure/TestResult elements in the current Test element
-                for child in elem:
-                    if child.tag.endswith('Failure'):
-                        failure_msg = child.get('message')
-                        # Stacktrace is text of child or child's child
-                        stack_trace = child.text
-                        for sub in child:
-                            if sub.tag.endswith('StackTrace'):
-                                stack_trace = sub.text
-                    elif child.tag.endswith('TestResult'):
-                         if not result_status: result_status = child.get('result') # Fallback result
-
-                # Only yield if we found a module context (or at least a test name)
-                if test_name: 
-                     yield {
-                        "module_name": module_name,
-                        "module_abi": module_abi,
-                        "class_name": class_name,
-                        "method_name": test_name,
-                        "status": result_status,
-                        "stack_trace": stack_trace,
-                        "error_message": failure_msg
-                    }
-                
-                # Important: clear the element to save memory
-                elem.clear()
-                # Also clear predecessors to keep memory low
-                while elem.getprevious() is not None:
-                    del elem.getparent()[0]
-            
-                
+            item = self._handle_end(elem)
+            if item is not None:
+                yield item
+
         del context
+
+    def _handle_end(self, elem) -> Optional[Dict[str, Any]]:
+        """Turn the 'end' event of a Module or Test element into a parsed item."""
+        if elem.tag.endswith('Module'):
+            return self._module_item(elem)
+        if elem.tag.endswith('Test'):
+            item = self._test_item(elem)
+
+            # Important: clear the element to save memory
+            elem.clear()
+            # Also clear predecessors to keep memory low
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            return item
+        return None
+
+    @staticmethod
+    def _module_item(elem) -> Dict[str, Any]:
+        done = elem.get('done')
+        runtime = elem.get('runtime')
+        return {
+            "type": "module_info",
+            "module_name": elem.get('name'),
+            "module_abi": elem.get('abi'),
+            "done": done == 'true' if done is not None else None,
+            "runtime_ms": int(runtime) if runtime and runtime.isdigit() else None
+        }
+
+    @staticmethod
+    def _test_item(elem) -> Optional[Dict[str, Any]]:
+        test_name = elem.get('name')
+        result_status = elem.get('result')
+
+        # Get parent info
+        test_case_elem = elem.getparent()
+        class_name = test_case_elem.get('name') if test_case_elem is not None else "Unknown"
+
+        module_elem = test_case_elem.getparent() if test_case_elem is not None else None
+        module_name = module_elem.get('name') or module_elem.get('appPackageName') if module_elem is not None else "Unknown"
+        module_abi = module_elem.get('abi') or module_elem.get('digests') if module_elem is not None else "Unknown"
+
+        # Extract failure info if any
+        failure_msg = None
+        stack_trace = None
+
+        # Since we are at 'end' of Test, children are processed.
+        # Find Failure/TestResult elements in the current Test element
+        for child in elem:
+            if child.tag.endswith('Failure'):
+                failure_msg = child.get('message')
+                # Stacktrace is text of child or child's child
+                stack_trace = child.text
+                for sub in child:
+                    if sub.tag.endswith('StackTrace'):
+                        stack_trace = sub.text
+            elif child.tag.endswith('TestResult'):
+                if not result_status: result_status = child.get('result') # Fallback result
+
+        # Only yield if we found a module context (or at least a test name)
+        if not test_name:
+            return None
+        return {
+            "module_name": module_name,
+            "module_abi": module_abi,
+            "class_name": class_name,
+            "method_name": test_name,
+            "status": result_status,
+            "stack_trace": stack_trace,
+            "error_message": failure_msg
+        }
+
+
+class XMLStreamParser(XMLParser):
+    """
+    Incremental variant fed with raw bytes as they arrive (e.g. from a request body).
+
+        stream = XMLStreamParser()
+        for chunk in body: items = stream.feed(chunk)
+        items = stream.close()
+
+    `metadata` is complete (`metadata_ready`) once Summary, the last header element,
+    or else the first Module starts, so the run can be created before the first
+    test result is emitted. Other header elements (e.g. RunHistory between Build
+    and Summary in newer results) are skipped.
+    """
+
+    HEADER_TAGS = ('Result', 'Build', 'Summary')
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(events=('start', 'end'))
+        self.metadata = self._empty_metadata()
+        self.metadata_ready = False
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._parser.close()
+        items = self._drain()
+        self.metadata_ready = True
+        return items
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        items = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if not self.metadata_ready:
+                    if elem.tag.endswith(self.HEADER_TAGS):
+                        self._update_metadata(self.metadata, elem)
+                    self.metadata_ready = elem.tag.endswith(('Summary', 'Module'))
+                continue
+            item = self._handle_end(elem)
+            if item is not None:
+                items.append(item)
+        return items
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from backend.database.database import get_db, SessionLocal
+from backend.database.database import get_db
 from backend.database import models
 from backend.analysis.clustering import ImprovedFailureClusterer
 from backend.analysis.llm_client import get_llm_client
@@ -10,19 +10,12 @@ import traceback
 router = APIRouter()
 
 from backend.services.analysis_service import AnalysisService
-
-def run_analysis_task(run_id: int):
-    # Wrapper for background task
-    db = SessionLocal()
-    try:
-        AnalysisService.run_analysis_task(run_id, db)
-    finally:
-        db.close()
-
+from backend.services.job_queue import JobQueue
+from backend.services.featurizer_service import FeaturizerService
 
 
 @router.post("/run/{run_id}")
-async def trigger_analysis(run_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def trigger_analysis(run_id: int, db: Session = Depends(get_db)):
     # Check if run exists
     run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
     if not run:
@@ -32,11 +25,28 @@ async def trigger_analysis(run_id: int, background_tasks: BackgroundTasks, db: S
     run.analysis_status = "analyzing"
     db.commit()
     
-    # Run analysis in background
-    print(f"Triggering analysis for run {run_id} in background")
-    background_tasks.add_task(run_analysis_task, run_id)
+    # Run analysis in a worker (backend/worker.py)
+    print(f"Queueing analysis for run {run_id}")
+    # One attempt: a retry would repeat every LLM call (the run records the failure)
+    job = JobQueue.enqueue(db, "analysis", {"run_id": run_id}, max_attempts=1, test_run_id=run_id)
     
-    return {"message": "Analysis started in background"}
+    return {"message": "Analysis queued", "job_id": job.id}
+
+@router.get("/featurizer")
+def get_featurizer(db: Session = Depends(get_db)):
+    """The corpus TF-IDF featurizer analyses currently use (version and fit metadata)."""
+    current = FeaturizerService.current(db)
+    if not current:
+        return {"version": None, "versions": FeaturizerService.versions(db)}
+    meta, vectorizer = FeaturizerService.load(db, current[0])
+    return dict(meta, n_terms=len(vectorizer.vocabulary), versions=FeaturizerService.versions(db))
+
+@router.post("/featurizer/refit")
+def refit_featurizer(db: Session = Depends(get_db)):
+    job = FeaturizerService.schedule_refit(db, force=True)
+    if not job:
+        raise HTTPException(status_code=409, detail="A featurizer refit is already queued")
+    return {"message": "Featurizer refit queued", "job_id": job.id}
 
 @router.get("/run/{run_id}/status")
 def get_analysis_status(run_id: int, db: Session = Depends(get_db)):
@@ -118,8 +118,8 @@ def export_submission_excel(submission_id: int, db: Session = Depends(get_db)):
             f_obj = item.get('failure_details')
             ai_cause = ""
             bug_id = ""
-            if f_obj and f_obj.failure_analysis:
-                ai_cause = f_obj.failure_analysis.root_cause or ""
+            if f_obj:
+                ai_cause = f_obj.root_cause or ""
             
             web_link = f"{base_url}/submissions/{submission_id}/runs/{item['final_run_id']}?case={f_obj.id}" if f_obj else ""
             
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from backend.database.database import get_db, SessionLocal
+from backend.database import models
+from backend.services.job_queue import JobQueue, QUEUED, RUNNING
+from backend.services.progress_service import ProgressBroker
+import asyncio
+import json
+
+router = APIRouter()
+
+# Idle interval of a progress stream: checks the run's jobs (progress written by
+# workers in other processes, end of stream) and keeps proxies from timing out
+PROGRESS_POLL_SECONDS = 2.0
+
+
+@router.get("")
+def list_jobs(
+    status: Optional[str] = Query(None, description="queued, running, succeeded or failed"),
+    job_type: Optional[str] = Query(None, description="ingest, analysis, delete or featurizer"),
+    test_run_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Most recent jobs first."""
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    if job_type:
+        query = query.filter(models.Job.job_type == job_type)
+    if test_run_id:
+        query = query.filter(models.Job.test_run_id == test_run_id)
+    return [JobQueue.to_dict(job) for job in query.order_by(models.Job.id.desc()).limit(limit)]
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.Job).filter(models.Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobQueue.to_dict(job)
+
+
+@router.get("/runs/{run_id}/events")
+async def run_progress_events(run_id: int):
+    """
+    Server-sent events with the ingestion / analysis progress of a run.
+    Each `data:` line is a progress event (see ProgressBroker); a final
+    `event: done` is sent once no job for the run is queued or running.
+    """
+    return StreamingResponse(
+        progress_stream(run_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _active_job_progress(run_id: int, session_factory=SessionLocal) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(whether a job for the run is queued or running, latest progress persisted by a worker)."""
+    db = session_factory()
+    try:
+        jobs = db.query(models.Job.status, models.Job.progress).filter(
+            models.Job.test_run_id == run_id, models.Job.status.in_([QUEUED, RUNNING])
+        ).all()
+    finally:
+        db.close()
+    progress = [json.loads(p) for status, p in jobs if status == RUNNING and p]
+    return bool(jobs), max(progress, key=lambda event: event["ts"], default=None)
+
+
+async def progress_stream(
+    run_id: int, session_factory=SessionLocal, poll_seconds: Optional[float] = None
+) -> AsyncIterator[str]:
+    # Events come from the in-process broker when the job runs here (embedded worker),
+    # otherwise from the job row the worker process keeps updating
+    events = ProgressBroker.subscribe(run_id)
+    last_ts = 0.0
+    try:
+        event = ProgressBroker.latest(run_id)
+        while True:
+            if event is not None and event["ts"] > last_ts:
+                last_ts = event["ts"]
+                yield f"data: {json.dumps(event)}\n\n"
+            try:
+                event = await asyncio.wait_for(events.get(), poll_seconds or PROGRESS_POLL_SECONDS)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            active, event = await run_in_threadpool(_active_job_progress, run_id, session_factory)
+            if not active:
+                yield f"event: done\ndata: {json.dumps({'run_id': run_id})}\n\n"
+                return
+            if event is None or event["ts"] <= last_ts:
+                yield ": keep-alive\n\n"
+    finally:
+        ProgressBroker.unsubscribe(run_id, events)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_
 from sqlalchemy.orm import Session, joinedload
 from backend.database.database import get_db
 from backend.database import models
@@ -10,6 +11,8 @@ router = APIRouter()
 
 
 from backend.services.merge_service import MergeService
+from backend.services.deletion_service import DeletionService, DELETING
+from backend.services.module_stats_service import ModuleStatsService
 
 def _aggregate_submission_failures(db: Session, submission_id: int) -> List[dict]:
     """
@@ -48,7 +51,7 @@ def _aggregate_submission_failures(db: Session, submission_id: int) -> List[dict
 
 
 @router.post("/submissions/{submission_id}/analyze")
-def analyze_submission(submission_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def analyze_submission(submission_id: int, db: Session = Depends(get_db)):
     """
     Trigger AI analysis for the entire submission.
     Aggregates persistent failures and asks LLM for a high-level report.
@@ -59,22 +62,13 @@ def analyze_submission(submission_id: int, background_tasks: BackgroundTasks, db
     if not sub:
         raise HTTPException(status_code=404, detail="Submission not found")
 
-    # Trigger Clustering for all runs in background to ensure 'Clusters' tab is populated
-    # Use Service directly with a wrapper for Session management
-    from backend.database.database import SessionLocal
-    from backend.services.analysis_service import AnalysisService
-    
-    def _run_analysis_bg(rid: int):
-        session = SessionLocal()
-        try:
-            AnalysisService.run_analysis_task(rid, session)
-        finally:
-            session.close()
+    # Queue clustering for all runs to ensure 'Clusters' tab is populated (run by backend/worker.py)
+    from backend.services.job_queue import JobQueue
 
     runs = db.query(models.TestRun).filter(models.TestRun.submission_id == submission_id).all()
     for run in runs:
-        # We re-run analysis to ensure clusters are up to date with new logic
-        background_tasks.add_task(_run_analysis_bg, run.id)
+        # Failures already analyzed are assigned back to their clusters (no LLM call); new ones are clustered
+        JobQueue.enqueue(db, "analysis", {"run_id": run.id}, max_attempts=1, test_run_id=run.id)
         
     # 2. Aggregate Failures
     failures = _aggregate_submission_failures(db, submission_id)
@@ -155,7 +149,9 @@ def get_submission_analysis(submission_id: int, db: Session = Depends(get_db)):
 
 @router.get("/runs")
 def get_test_runs(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    runs = db.query(models.TestRun).options(joinedload(models.TestRun.submission)).order_by(models.TestRun.start_time.desc()).offset(skip).limit(limit).all()
+    runs = db.query(models.TestRun).options(joinedload(models.TestRun.submission)).filter(
+        or_(models.TestRun.status.is_(None), models.TestRun.status != DELETING)
+    ).order_by(models.TestRun.start_time.desc()).offset(skip).limit(limit).all()
     
     # Enhance runs with cluster count
     enhanced_runs = []
@@ -212,6 +208,23 @@ def get_test_run_details(run_id: int, db: Session = Depends(get_db)):
     
     return run_dict
 
+@router.get("/runs/{run_id}/modules")
+def get_run_modules(run_id: int, failed_only: bool = False, db: Session = Depends(get_db)):
+    """Per-module pass / fail / ignored counts, done flag and runtime of a test run."""
+    if not db.query(models.TestRun.id).filter(models.TestRun.id == run_id).first():
+        raise HTTPException(status_code=404, detail="Test run not found")
+    return [ModuleStatsService.to_dict(m) for m in ModuleStatsService.get_modules(db, run_id, failed_only)]
+
+
+@router.get("/runs/{run_id}/modules/diff")
+def get_run_module_diff(run_id: int, base_run_id: int, changed_only: bool = True, db: Session = Depends(get_db)):
+    """Module-level changes of a test run against an earlier (base) run."""
+    found = {r.id for r in db.query(models.TestRun.id).filter(models.TestRun.id.in_([run_id, base_run_id]))}
+    if run_id not in found or base_run_id not in found:
+        raise HTTPException(status_code=404, detail="Test run not found")
+    return ModuleStatsService.diff(db, base_run_id, run_id, changed_only)
+
+
 @router.get("/runs/{run_id}/failures")
 def get_run_failures(run_id: int, db: Session = Depends(get_db)):
     failures = db.query(models.TestCase).options(
@@ -236,31 +249,12 @@ def get_test_case_details(test_case_id: int, db: Session = Depends(get_db)):
 
 @router.delete("/runs/{run_id}")
 def delete_test_run(run_id: int, db: Session = Depends(get_db)):
-    """Delete a test run and all associated test cases."""
+    """Delete a test run and all associated test cases (in the background, see DeletionService)."""
     run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
     if not run:
         raise HTTPException(status_code=404, detail="Test run not found")
     
-    # Delete the run (cascade will delete associated test cases)
-    db.delete(run)
-    db.commit()
-    
-    # Ensure session is refreshed before checking for orphans
-    db.expunge_all()
-    
-    # Cleanup orphaned clusters (clusters with no analysis records)
-    # Since we added cascade delete to TestCase -> FailureAnalysis, 
-    # deleting the run deletes test cases, which deletes failure analyses.
-    # Now we check for clusters that have no analyses left.
-    orphaned_clusters = db.query(models.FailureCluster).filter(~models.FailureCluster.analyses.any()).all()
-    
-    if orphaned_clusters:
-        print(f"Deleting {len(orphaned_clusters)} orphaned clusters")
-        for cluster in orphaned_clusters:
-            print(f"  - Deleting cluster ID {cluster.id} (Redmine: {cluster.redmine_issue_id})")
-            db.delete(cluster)
-        db.commit()
-    
+    job = DeletionService.request_run_deletion(db, run)
     
-    return {"message": "Test run deleted successfully", "run_id": run_id}
+    return {"message": "Test run deletion queued", "run_id": run_id, "job_id": job.id}
 
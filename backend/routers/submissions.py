@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, func, or_
 from typing import List, Optional
 from datetime import datetime
 import json
 from backend.database.database import get_db
 from backend.database import models
 from backend.services.suite_service import SuiteService
-from backend.services.merge_service import MergeService
-from backend.services.analysis_service import AnalysisService
+from backend.services.suite_summary_service import SuiteSummaryService
+from backend.services.deletion_service import DeletionService, DELETING
 
 from pydantic import BaseModel
 
@@ -71,10 +71,12 @@ def move_runs(req: MoveRunsRequest, db: Session = Depends(get_db)):
         db.flush()
         
     # Move runs
+    source_sub_ids = {r.submission_id for r in runs}
     for r in runs:
         r.submission_id = target_sub.id
         
     db.commit()
+    SuiteSummaryService.refresh_submissions(db, source_sub_ids | {target_sub.id})
     
     return {"message": f"Moved {len(runs)} runs to Submission {target_sub.id}", "target_submission_id": target_sub.id}
 
@@ -91,7 +93,9 @@ def get_products(db: Session = Depends(get_db)):
 @router.get("/")
 def get_submissions(skip: int = 0, limit: int = 20, product_filter: Optional[str] = None, db: Session = Depends(get_db)):
     """List all submissions with suite status summary."""
-    query = db.query(models.Submission).order_by(desc(models.Submission.updated_at))
+    query = db.query(models.Submission).filter(
+        or_(models.Submission.status.is_(None), models.Submission.status != DELETING)
+    ).order_by(desc(models.Submission.updated_at))
     
     if product_filter and product_filter != "All Products":
         query = query.filter(models.Submission.product == product_filter)
@@ -101,39 +105,20 @@ def get_submissions(skip: int = 0, limit: int = 20, product_filter: Optional[str
     # Fetch configured suites
     suites_config = db.query(models.TestSuiteConfig).order_by(asc(models.TestSuiteConfig.sort_order)).all()
     
+    # Suite status summaries come from the suite_summaries cache (refreshed when runs change)
+    summaries = SuiteSummaryService.get_summaries(db, [sub.id for sub in submissions], suites_config)
+    run_counts = dict(
+        db.query(models.TestRun.submission_id, func.count(models.TestRun.id))
+        .filter(models.TestRun.submission_id.in_([sub.id for sub in submissions]))
+        .group_by(models.TestRun.submission_id)
+        .all()
+    )
+    
     results = []
     for sub in submissions:
         # Basic stats
-        run_count = len(sub.test_runs)
-        
-        # Calculate suite status summary
-        suite_summary = {}
-        
-        for suite_cfg in suites_config:
-            # Find runs matching this suite type
-            matching_runs = [r for r in sub.test_runs if SuiteService.match_suite(r, suite_cfg, sub.target_fingerprint)]
-            
-            if not matching_runs:
-                suite_summary[suite_cfg.name] = {"status": "missing", "failed": 0, "passed": 0}
-            else:
-                summary_data = MergeService.calculate_suite_summary(db, matching_runs)
-                
-                # Robust Pass Rate Calculation (Backend side)
-                total = summary_data["total_tests"]
-                failed = summary_data["remaining"]
-                passed = total - failed
-                
-                suite_summary[suite_cfg.name] = {
-                    "status": "fail" if failed > 0 else "pass",
-                    "failed": failed,
-                    "passed": passed,
-                    "initial_failed": summary_data["initial"],
-                    "recovered": summary_data["recovered"],
-                    "run_count": len(matching_runs),
-                    "is_merged": len(matching_runs) > 1,
-                    "latest_run_id": matching_runs[-1].id,
-                    "run_ids": [r.id for r in matching_runs]
-                }
+        run_count = run_counts.get(sub.id, 0)
+        suite_summary = summaries[sub.id]
 
         results.append({
             "id": sub.id,
@@ -204,28 +189,8 @@ def get_submission_details(submission_id: int, db: Session = Depends(get_db)):
              ]
          })
     
-    # --- Calculate Suite Summary (Optimistic Merge) ---
-    suite_summary = {}
-
-    for suite_cfg in suites_config:
-        matching_runs = [r for r in runs if SuiteService.match_suite(r, suite_cfg, sub.target_fingerprint)]
-        
-        if not matching_runs:
-            suite_summary[suite_cfg.name] = {"status": "missing", "failed": 0, "passed": 0}
-        else:
-            summary_data = MergeService.calculate_suite_summary(db, matching_runs)
-            
-            suite_summary[suite_cfg.name] = {
-                "status": "fail" if summary_data["remaining"] > 0 else "pass",
-                "failed": summary_data["remaining"],
-                "passed": summary_data["total_tests"] - summary_data["remaining"],
-                "initial_failed": summary_data["initial"],
-                "recovered": summary_data["recovered"],
-                "run_count": len(matching_runs),
-                "is_merged": len(matching_runs) > 1,
-                "latest_run_id": matching_runs[-1].id,
-                "run_ids": [r.id for r in matching_runs]
-            }
+    # --- Suite Summary (Optimistic Merge), cached per suite ---
+    suite_summary = SuiteSummaryService.get_summaries(db, [sub.id], suites_config)[sub.id]
 
     # --- Phase 3: Intelligence Warnings ---
     warnings = []
@@ -294,18 +259,14 @@ def get_submission_details(submission_id: int, db: Session = Depends(get_db)):
 
 @router.delete("/{submission_id}")
 def delete_submission(submission_id: int, db: Session = Depends(get_db)):
-    """Delete a submission and all associated runs."""
+    """Delete a submission and all associated runs (in the background, see DeletionService)."""
     sub = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
     if not sub:
         raise HTTPException(status_code=404, detail="Submission not found")
     
-    db.delete(sub)
-    db.commit()
-    
-    # Auto-cleanup orphan failure clusters
-    AnalysisService.cleanup_orphan_clusters(db)
+    job = DeletionService.request_submission_deletion(db, sub)
     
-    return {"message": "Submission deleted successfully"}
+    return {"message": "Submission deletion queued", "job_id": job.id}
 
 @router.patch("/{submission_id}")
 def update_submission(submission_id: int, update: SubmissionUpdate, db: Session = Depends(get_db)):
@@ -341,15 +302,18 @@ def move_runs(request: MoveRunsRequest, db: Session = Depends(get_db)):
     
     # Update runs
     moved_count = 0
+    source_sub_ids = set()
     for run_id in request.run_ids:
         run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
         if run:
+            source_sub_ids.add(run.submission_id)
             run.submission_id = target_sub.id
             moved_count += 1
             
     # Update timestamps
     target_sub.updated_at = datetime.utcnow()
     db.commit()
+    SuiteSummaryService.refresh_submissions(db, source_sub_ids | {target_sub.id})
     
 
 
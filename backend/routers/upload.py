@@ -1,12 +1,28 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Query, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import insert, desc
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from lxml import etree
 from backend.database.database import get_db, SessionLocal
 from backend.database import models
-from backend.parser.xml_parser import XMLParser
+from backend.parser.xml_parser import XMLStreamParser
+from backend.parser.parallel_parser import make_parser
+from backend.parser.archive import detect_format, is_supported, result_members, result_size
+from backend.services.ingestion_service import IngestionPipeline
+from backend.services.progress_service import ProgressBroker
+from backend.services.job_queue import JobQueue, JobCancelled
+from typing import Any, Dict, Optional
+import hashlib
+import json
 import shutil
 import os
+import time
 import uuid
+import tarfile
+import threading
+import zipfile
+import zlib
 from datetime import datetime
 
 router = APIRouter()
@@ -14,7 +30,76 @@ router = APIRouter()
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def process_upload_background(file_path: str, test_run_id: int):
+def _apply_metadata(db: Session, test_run: models.TestRun, metadata: Dict[str, Any]):
+    """Copy parsed XML header metadata onto the run and auto-group it into a Submission."""
+    test_run.test_suite_name = metadata.get("test_suite_name")
+    test_run.device_fingerprint = metadata.get("device_fingerprint")
+    test_run.build_id = metadata.get("build_id")
+    test_run.build_product = metadata.get("build_product")
+    test_run.build_model = metadata.get("build_model")
+    test_run.build_type = metadata.get("build_type")
+    test_run.security_patch = metadata.get("security_patch")
+    test_run.android_version = metadata.get("android_version")
+    test_run.build_version_sdk = metadata.get("build_version_sdk")
+    test_run.build_version_incremental = metadata.get("build_version_incremental")
+    test_run.suite_version = metadata.get("suite_version")
+    test_run.suite_plan = metadata.get("suite_plan")
+    test_run.suite_build_number = metadata.get("suite_build_number")
+    test_run.host_name = metadata.get("host_name")
+    test_run.start_display = metadata.get("start_display")
+    test_run.end_display = metadata.get("end_display")
+    
+    # Parse start and end times (integers in milliseconds)
+    if metadata.get("start_time"):
+        try:
+            ts = int(metadata.get("start_time")) / 1000.0
+            test_run.start_time = datetime.fromtimestamp(ts)
+        except Exception as e:
+            print(f"Failed to parse start_time: {e}")
+
+    if metadata.get("end_time"):
+        try:
+            ts = int(metadata.get("end_time")) / 1000.0
+            test_run.end_time = datetime.fromtimestamp(ts)
+        except Exception as e:
+            print(f"Failed to parse end_time: {e}")
+    
+    # Save XML Summary values
+    test_run.xml_modules_done = metadata.get("modules_done", 0)
+    test_run.xml_modules_total = metadata.get("modules_total", 0)
+
+    # --- Submission Auto-Grouping Logic ---
+    from backend.services.submission_service import SubmissionService
+
+    fingerprint = test_run.device_fingerprint
+    if fingerprint and fingerprint != "Pending...":
+        submission = SubmissionService.get_or_create_submission(
+            db=db,
+            fingerprint=fingerprint,
+            suite_name=test_run.test_suite_name,
+            suite_plan=test_run.suite_plan,
+            android_version=test_run.android_version,
+            build_product=test_run.build_product,
+            build_brand=test_run.build_brand,
+            build_model=test_run.build_model,
+            build_device=test_run.build_device,
+            security_patch=test_run.security_patch
+        )
+
+        if submission:
+            test_run.submission_id = submission.id
+    # --------------------------------------
+    db.commit()
+
+def process_upload_background(
+    file_path: str, test_run_id: int, member: Optional[str] = None, size: Optional[int] = None,
+    cancelled: Optional[threading.Event] = None
+):
+    """
+    Parse an uploaded result (plain XML, or one result XML inside an archive) into a TestRun.
+    `size`: uncompressed size of the result as listed when the upload was scheduled.
+    Stops with JobCancelled once `cancelled` is set (the worker lost the ingest job's lease).
+    """
     db = SessionLocal()
     try:
         # Update status to processing
@@ -23,205 +108,32 @@ def process_upload_background(file_path: str, test_run_id: int):
             return
         
         test_run.status = "processing"
+        # A retried job starts over: drop rows written by an earlier, interrupted attempt
+        db.query(models.TestCase).filter(models.TestCase.test_run_id == test_run_id).delete(synchronize_session=False)
+        db.query(models.TestRunModule).filter(models.TestRunModule.test_run_id == test_run_id).delete(synchronize_session=False)
+        db.query(models.RunPassSet).filter(models.RunPassSet.test_run_id == test_run_id).delete(synchronize_session=False)
         db.commit()
 
-        # 2. Parse Metadata
-        parser = XMLParser()
+        # 2. Parse Metadata (large plain XMLs are parsed module-sharded across cores)
+        parser = make_parser(file_path, member)
         try:
-            metadata = parser.get_metadata(file_path)
-            test_run.test_suite_name = metadata.get("test_suite_name")
-            test_run.device_fingerprint = metadata.get("device_fingerprint")
-            test_run.build_id = metadata.get("build_id")
-            test_run.build_product = metadata.get("build_product")
-            test_run.build_model = metadata.get("build_model")
-            test_run.build_type = metadata.get("build_type")
-            test_run.security_patch = metadata.get("security_patch")
-            test_run.android_version = metadata.get("android_version")
-            test_run.build_version_sdk = metadata.get("build_version_sdk")
-            test_run.build_version_incremental = metadata.get("build_version_incremental")
-            test_run.suite_version = metadata.get("suite_version")
-            test_run.suite_plan = metadata.get("suite_plan")
-            test_run.suite_build_number = metadata.get("suite_build_number")
-            test_run.host_name = metadata.get("host_name")
-            test_run.start_display = metadata.get("start_display")
-            test_run.end_display = metadata.get("end_display")
-            
-            # Parse start and end times (integers in milliseconds)
-            if metadata.get("start_time"):
-                try:
-                    ts = int(metadata.get("start_time")) / 1000.0
-                    test_run.start_time = datetime.fromtimestamp(ts)
-                except Exception as e:
-                    print(f"Failed to parse start_time: {e}")
-
-            if metadata.get("end_time"):
-                try:
-                    ts = int(metadata.get("end_time")) / 1000.0
-                    test_run.end_time = datetime.fromtimestamp(ts)
-                except Exception as e:
-                    print(f"Failed to parse end_time: {e}")
-            
-            # Save XML Summary values
-            test_run.xml_modules_done = metadata.get("modules_done", 0)
-            test_run.xml_modules_total = metadata.get("modules_total", 0)
-
-            # --- Submission Auto-Grouping Logic ---
-            from backend.services.submission_service import SubmissionService
-                
-            fingerprint = test_run.device_fingerprint
-            if fingerprint and fingerprint != "Pending...":
-                submission = SubmissionService.get_or_create_submission(
-                    db=db,
-                    fingerprint=fingerprint,
-                    suite_name=test_run.test_suite_name,
-                    suite_plan=test_run.suite_plan,
-                    android_version=test_run.android_version,
-                    build_product=test_run.build_product,
-                    build_brand=test_run.build_brand,
-                    build_model=test_run.build_model,
-                    build_device=test_run.build_device,
-                    security_patch=test_run.security_patch
-                )
-                    
-                test_run.submission_id = submission.id
-            # --------------------------------------
-            db.commit()
+            metadata = parser.get_metadata(file_path, member)
+            _apply_metadata(db, test_run, metadata)
         except Exception as e:
             print(f"Metadata parsing failed: {e}")
             
-        # 4. Parse Test Cases and Stream to DB
-        batch_size = 10000
-        batch = []
-        
-        total = 0
-        passed = 0
-        failed = 0
-        ignored = 0
-        
-        all_modules = set()       # Set of "module_name:abi" pairs
-        failed_modules_set = set()
-        
-        for test_case_data in parser.parse(file_path):
-            total += 1
-            status = test_case_data.get("status")
-            module_name = test_case_data.get("module_name")
-            module_abi = test_case_data.get("module_abi", "")
-            
-            # Use module:abi as unique key to properly count ABI variants
-        batch_modules = []
-        executed_modules_set = set() # To prevent duplicates (though parser yields once per module start/end, iterparse behavior)
-        
-        for item in parser.parse(file_path):
-            # Check for new event types
-            if "type" in item and item["type"] == "module_info":
-                mod_name = item.get("module_name")
-                mod_abi = item.get("module_abi")
-                mod_key = f"{mod_name}:{mod_abi}"
-                
-                if mod_key and mod_key not in executed_modules_set:
-                    executed_modules_set.add(mod_key)
-                    batch_modules.append({
-                        "test_run_id": test_run_id,
-                        "module_name": mod_name,
-                        "module_abi": mod_abi
-                    })
-                continue
-            
-            # Default is test case result
-            test_case_data = item
-            module_name = test_case_data.get("module_name")
-            module_abi = test_case_data.get("module_abi")
-            status = test_case_data.get("status")
-            
-            total += 1
-            
-            module_key = f"{module_name}:{module_abi}" if module_name else None
-            
-            # Update stats
-            if module_key:
-                all_modules.add(module_key)
-            
-            if status == "pass":
-                passed += 1
-            elif status == "fail":
-                failed += 1
-                if module_key:
-                    failed_modules_set.add(module_key)
-            else:
-                ignored += 1
-                
-            # ONLY store failures in DB
-            if status == "fail":
-                # Add test_run_id to data for Core Insert
-                test_case_data["test_run_id"] = test_run.id
-                batch.append(test_case_data)
-            
-            if len(batch) >= batch_size:
-                db.execute(models.TestCase.__table__.insert(), batch)
-                db.commit()
-                batch = []
-                
-        # Insert remaining test cases
-        if batch:
-            db.execute(models.TestCase.__table__.insert(), batch)
-            db.commit()
-            
-        # Fallback: If no explicit module_info (Module headers) were found, infer from test cases
-        if not batch_modules and all_modules:
-            try:
-                with open("upload_debug.log", "a") as f:
-                    f.write(f"Warning: No explicit module_info found. Inferring {len(all_modules)} modules from test cases for Run {test_run_id}.\n")
-            except: pass
-            
-            for mod_key in all_modules:
-                parts = mod_key.split(":")
-                if len(parts) == 2:
-                    name, abi = parts
-                    batch_modules.append({
-                        "test_run_id": test_run_id,
-                        "module_name": name,
-                        "module_abi": abi
-                    })
-
-        # Insert all executed modules
-        if batch_modules:
-            # Batch Insert modules
-            # SQLite handles limits reasonably well, but for huge sets maybe batch?
-            # Modules are ~200-1000, so single batch is usually fine.
-            try:
-                with open("upload_debug.log", "a") as f:
-                    f.write(f"Inserting {len(batch_modules)} modules for Run {test_run_id}\n")
-                    import json
-                    f.write(json.dumps(batch_modules[0]) + "\n")
-
-                db.execute(models.TestRunModule.__table__.insert(), batch_modules)
-                db.commit()
-                with open("upload_debug.log", "a") as f:
-                     f.write("Insert Committed.\n")
-            except Exception as e:
-                with open("upload_debug.log", "a") as f:
-                    f.write(f"Failed to store modules: {e}\n")
-        
-        # Calculate module statistics from in-memory sets
-        total_modules = len(all_modules)
-        failed_modules_count = len(failed_modules_set)
-        passed_modules_count = total_modules - failed_modules_count
-            
-        # Update TestRun stats and status
-        # total_tests is now used as "Executed Tests" (Pass + Fail)
-        test_run.total_tests = passed + failed
-        test_run.passed_tests = passed
-        test_run.failed_tests = failed
-        test_run.ignored_tests = ignored
-        test_run.total_modules = total_modules
-        test_run.passed_modules = passed_modules_count
-        test_run.failed_modules = failed_modules_count
-        test_run.status = "completed"
-        db.commit()
-        
+        # 4. Parse Test Cases and Stream to DB (single pass: parser -> bounded queue -> batched writer)
+        pipeline = IngestionPipeline(test_run_id, bytes_read=lambda: parser.bytes_read, cancelled=cancelled)
+        total_bytes = size if size is not None else result_size(file_path, member)
+        pipeline.run(parser.parse(file_path, member), total_bytes=total_bytes)
 
+    except JobCancelled:
+        # Another worker owns the job now: leave the run to it
+        print(f"Ingestion of run {test_run_id} cancelled")
+        raise
     except Exception as e:
         print(f"Background processing failed: {e}")
+        ProgressBroker.publish(test_run_id, "ingest", "failed", error=str(e))
         try:
             test_run = db.query(models.TestRun).filter(models.TestRun.id == test_run_id).first()
             if test_run:
@@ -229,63 +141,440 @@ def process_upload_background(file_path: str, test_run_id: int):
                 db.commit()
         except:
             pass
+        raise  # Let the ingest job be retried
     finally:
         db.close()
 
 @router.post("")
-async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
     # 1. Validation
-    ALLOWED_EXTENSIONS = {".xml"}
-    ALLOWED_MIME_TYPES = {"text/xml", "application/xml"}
+    # Plain XML, gzipped XML, or zip/tar archives of tradefed result folders
+    ALLOWED_MIME_TYPES = {
+        "text/xml", "application/xml",
+        "application/gzip", "application/x-gzip", "application/zip", "application/x-zip-compressed",
+        "application/x-tar", "application/x-gtar", "application/x-compressed-tar"
+    }
     
-    filename = file.filename
-    ext = os.path.splitext(filename)[1].lower()
+    filename = os.path.basename(file.filename or "")
     
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="Invalid file extension. Only .xml files are allowed.")
+    if not is_supported(filename):
+        raise HTTPException(status_code=400, detail="Invalid file extension. Allowed: .xml, .xml.gz, .zip, .tar, .tar.gz, .tgz")
         
     if file.content_type not in ALLOWED_MIME_TYPES:
-        # Strict MIME check can be flaky with some browsers/clients. 
-        # We assume the client is honest or we check the header. 
-        # For a helper tool, checking extension is 90% of defense, checking content_type is extra.
-        # Let's be lenient or log warning? No, requested security. Enforce it.
-        # But commonly uploaded XMLs might have generic types.
-        # Let's stick to extension check as primary, and trusted MIME types.
+        # Strict MIME check can be flaky with some browsers/clients
+        # (e.g. text/plain or application/octet-stream); the extension check is the primary defense.
         print(f"Warning: Uploaded file content_type is {file.content_type}")
-        # Allow generic text/plain if extension is xml?
-        if file.content_type != "text/plain": 
-             pass # Strict? 
-             # Let's just enforce XML types + text/plain for compatibility
     
-    # 2. Save the file
+    # 2. Save the file as uploaded (archives stay compressed; they are stream-decompressed at parse time)
     file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    
-    print(f"Starting upload for file: {file.filename}")
+    file_path = os.path.join(UPLOAD_DIR, f"{file_id}_{filename}")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    print(f"Starting upload for file: {filename}")
     
-    file_size = os.path.getsize(file_path)
+    def save():
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        return os.path.getsize(file_path)
+
+    file_size = await run_in_threadpool(save)
     print(f"File saved: {file_path}, Size: {file_size} bytes")
+
+    # Listing an archive decompresses it: keep it off the event loop
+    return await run_in_threadpool(_schedule_ingestion, file_path, db)
+
+
+def _schedule_ingestion(file_path: str, db: Session) -> Dict[str, Any]:
+    """Create a pending TestRun per result XML in `file_path` and enqueue an ingest job for it."""
+    # Locate result XMLs (an archive may hold several results -> several TestRuns), listed once:
+    # each ingest job gets its member and size instead of scanning the archive again
+    try:
+        members = result_members(file_path)
+    except (zipfile.BadZipFile, tarfile.TarError, OSError) as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"Unreadable archive: {e}")
+
+    if not members:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail="No test_result.xml found in archive.")
         
-    # 2. Create Initial TestRun Record
+    # Create Initial TestRun Records and enqueue their ingest jobs (run by backend/worker.py)
+    run_ids = []
+    job_ids = []
+    for member, size in members:
+        test_run = models.TestRun(
+            test_suite_name="Pending...",
+            device_fingerprint="Pending...",
+            start_time=datetime.utcnow(),
+            status="pending"
+        )
+        db.add(test_run)
+        db.commit()
+        db.refresh(test_run)
+        run_ids.append(test_run.id)
+        
+        job = JobQueue.enqueue(
+            db, "ingest", {"file_path": file_path, "test_run_id": test_run.id, "member": member, "size": size},
+            test_run_id=test_run.id
+        )
+        job_ids.append(job.id)
+
+    return {
+        "message": "File uploaded. Processing queued.",
+        "test_run_id": run_ids[0],
+        "test_run_ids": run_ids,
+        "job_ids": job_ids,
+        "submission_id": None,
+        "status": "pending"
+    }
+
+
+# --- Pre-flight ---
+# Clients send only the head of a result file; the Result/Build/Summary header
+# tells whether the upload would be a duplicate and where it would be grouped.
+
+PREFLIGHT_HEAD_SIZE = 64 * 1024
+PREFLIGHT_MAX_SIZE = 1024 * 1024
+
+
+@router.post("/preflight")
+async def preflight_upload(request: Request, filename: str = Query("test_result.xml"), db: Session = Depends(get_db)):
+    """Check a result file's header (first ~64 KB of .xml / .xml.gz) before uploading it."""
+    fmt = detect_format(os.path.basename(filename))
+    if fmt not in ("xml", "gzip"):
+        raise HTTPException(
+            status_code=400,
+            detail="Pre-flight accepts the head of an .xml or .xml.gz file. Extract the result XML from archives first."
+        )
+
+    head = await request.body()
+    if len(head) > PREFLIGHT_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Send at most {PREFLIGHT_MAX_SIZE} bytes (the file head only)")
+
+    stream = XMLStreamParser()
+    try:
+        if fmt == "gzip":
+            # Truncated gzip stream: decompress as much as the head allows
+            head = zlib.decompressobj(wbits=47).decompress(head)
+        stream.feed(head)
+    except (etree.XMLSyntaxError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed result file: {e}")
+
+    if not stream.metadata_ready:
+        raise HTTPException(status_code=422, detail="Result header not found in the first bytes of the file")
+
+    metadata = stream.metadata
+    fingerprint = metadata.get("device_fingerprint")
+
+    from backend.services.submission_service import SubmissionService
+
+    duplicate = SubmissionService.find_duplicate_run(db, fingerprint, metadata.get("start_display"))
+
+    submission_preview = None
+    if fingerprint and fingerprint != "Unknown":
+        submission = SubmissionService.find_submission(
+            db, fingerprint, metadata.get("test_suite_name"), metadata.get("suite_plan")
+        )
+        if submission:
+            submission_preview = {"action": "match", "id": submission.id, "name": submission.name}
+        else:
+            name, _, _ = SubmissionService.build_submission_name(
+                fingerprint, build_model=metadata.get("build_model"), build_product=metadata.get("build_product")
+            )
+            submission_preview = {"action": "create", "id": None, "name": name}
+
+    return {
+        "metadata": metadata,
+        "duplicate": duplicate is not None,
+        "duplicate_run_id": duplicate.id if duplicate else None,
+        "submission": submission_preview
+    }
+
+
+# --- Parse-while-uploading ---
+# The request body is fed to an incremental parser as it arrives, so failures
+# land in the DB while the upload is still running. Raw bytes are teed to disk.
+
+STREAM_FEED_SIZE = 1024 * 1024  # Bytes buffered per parser feed (parsing runs in the threadpool)
+
+
+@router.post("/stream")
+async def upload_stream(request: Request, filename: str = Query(...), db: Session = Depends(get_db)):
+    """Ingest a raw .xml / .xml.gz request body while it is being uploaded."""
+    filename = os.path.basename(filename)
+    fmt = detect_format(filename)
+    if fmt not in ("xml", "gzip"):
+        raise HTTPException(
+            status_code=400,
+            detail="Streaming upload accepts .xml and .xml.gz only. Upload archives via POST /api/upload."
+        )
+
+    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{filename}")
     test_run = models.TestRun(
         test_suite_name="Pending...",
         device_fingerprint="Pending...",
         start_time=datetime.utcnow(),
-        status="pending"
+        status="processing"
     )
     db.add(test_run)
     db.commit()
     db.refresh(test_run)
-    
-    # 3. Trigger Background Task
-    background_tasks.add_task(process_upload_background, file_path, test_run.id)
+    test_run_id = test_run.id
+    print(f"Starting streaming upload for file: {filename} (run {test_run_id})")
 
+    stream = XMLStreamParser()
+    # wbits=47: accept a gzip (or zlib) header
+    inflater = zlib.decompressobj(wbits=47) if fmt == "gzip" else None
+    state = {"pipeline": None, "xml_bytes": 0}
+
+    def ingest(out, data: bytes, final: bool = False):
+        out.write(data)
+        if inflater is not None:
+            data = inflater.decompress(data)
+            if final:
+                data += inflater.flush()
+        state["xml_bytes"] += len(data)
+
+        items = stream.feed(data) if data else []
+        if final:
+            items += stream.close()
+
+        # The header is parsed before the first Module starts: create the run, then stream items
+        if state["pipeline"] is None and stream.metadata_ready:
+            _apply_metadata(db, test_run, stream.metadata)
+            state["pipeline"] = IngestionPipeline(test_run_id, bytes_read=lambda: state["xml_bytes"])
+            state["pipeline"].start()
+        for item in items:
+            state["pipeline"].put(item)
+
+    try:
+        with open(file_path, "wb") as out:
+            buffer = bytearray()
+            async for chunk in request.stream():
+                buffer += chunk
+                if len(buffer) >= STREAM_FEED_SIZE:
+                    await run_in_threadpool(ingest, out, bytes(buffer))
+                    buffer.clear()
+            await run_in_threadpool(ingest, out, bytes(buffer), True)
+
+        result = await run_in_threadpool(state["pipeline"].finish, state["xml_bytes"])
+    except Exception as e:
+        print(f"Streaming upload failed: {e}")
+        if state["pipeline"] is not None:
+            await run_in_threadpool(state["pipeline"].abort)
+        db.rollback()
+        db.query(models.TestRun).filter(models.TestRun.id == test_run_id).update({"status": "failed"})
+        db.commit()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if isinstance(e, (etree.XMLSyntaxError, zlib.error)):
+            raise HTTPException(status_code=400, detail=f"Malformed result file: {e}")
+        raise
+
+    print(f"Streaming upload saved: {file_path}, Size: {os.path.getsize(file_path)} bytes")
+    db.refresh(test_run)
     return {
-        "message": "File uploaded. Processing started in background.",
-        "test_run_id": test_run.id,
+        "message": "File uploaded and processed.",
+        "test_run_id": test_run_id,
+        "test_run_ids": [test_run_id],
         "submission_id": test_run.submission_id,
-        "status": "pending"
+        "status": test_run.status,
+        "stats": result
     }
+
+
+# --- Resumable Chunked Upload ---
+# Protocol: POST /sessions -> PUT /sessions/{id}?offset=N (raw chunk, X-Chunk-SHA256)
+#           -> GET /sessions/{id} (resume point) -> POST /sessions/{id}/finalize
+# Session state lives next to the partial file, so uploads survive server restarts.
+# Sessions without a chunk for CHUNKED_UPLOAD_TTL_HOURS are removed when a new one starts.
+
+CHUNK_DIR = os.path.join(UPLOAD_DIR, "chunked")
+os.makedirs(CHUNK_DIR, exist_ok=True)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+CHUNKED_UPLOAD_TTL_HOURS = float(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+
+# upload id -> lock serializing the check-offset-then-append of its chunks (and finalize)
+_session_locks: Dict[str, threading.Lock] = {}
+_session_locks_guard = threading.Lock()
+
+
+def _session_lock(upload_id: str) -> threading.Lock:
+    with _session_locks_guard:
+        return _session_locks.setdefault(upload_id, threading.Lock())
+
+
+def _drop_session_lock(upload_id: str):
+    with _session_locks_guard:
+        _session_locks.pop(upload_id, None)
+
+
+class ChunkedUploadStart(BaseModel):
+    filename: str
+    total_size: int
+    sha256: Optional[str] = None  # Whole-file checksum, verified on finalize
+    chunk_size: Optional[int] = None
+
+
+def _session_paths(upload_id: str):
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return os.path.join(CHUNK_DIR, f"{upload_id}.json"), os.path.join(CHUNK_DIR, f"{upload_id}.part")
+
+
+def _load_session(upload_id: str) -> Dict[str, Any]:
+    meta_path, part_path = _session_paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    with open(meta_path) as f:
+        session = json.load(f)
+    session["received_bytes"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return session
+
+
+def _expire_sessions(max_age_hours: float = CHUNKED_UPLOAD_TTL_HOURS) -> int:
+    """Remove upload sessions that received nothing for `max_age_hours` (abandoned uploads)."""
+    # Epoch seconds, like the mtimes it is compared with
+    cutoff = time.time() - max_age_hours * 3600
+    expired = 0
+    for name in os.listdir(CHUNK_DIR):
+        if not name.endswith(".json"):
+            continue
+        upload_id = name[:-len(".json")]
+        meta_path, part_path = os.path.join(CHUNK_DIR, name), os.path.join(CHUNK_DIR, f"{upload_id}.part")
+        with _session_lock(upload_id):
+            try:
+                # The partial file changes with every chunk: its mtime is the last activity
+                last_activity = max(os.path.getmtime(p) for p in (meta_path, part_path) if os.path.exists(p))
+                if last_activity >= cutoff:
+                    continue
+                for path in (meta_path, part_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            except (OSError, ValueError):
+                continue
+        _drop_session_lock(upload_id)
+        expired += 1
+    if expired:
+        print(f"Removed {expired} expired chunked upload sessions.")
+    return expired
+
+
+def _session_status(session: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "upload_id": session["upload_id"],
+        "filename": session["filename"],
+        "total_size": session["total_size"],
+        "received_bytes": session["received_bytes"],
+        "chunk_size": session["chunk_size"],
+        "complete": session["received_bytes"] >= session["total_size"]
+    }
+
+
+@router.post("/sessions")
+def start_chunked_upload(req: ChunkedUploadStart):
+    """Open a resumable upload session for a large result file."""
+    filename = os.path.basename(req.filename)
+    if not is_supported(filename):
+        raise HTTPException(status_code=400, detail="Invalid file extension. Allowed: .xml, .xml.gz, .zip, .tar, .tar.gz, .tgz")
+    if req.total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive")
+    _expire_sessions()
+
+    upload_id = uuid.uuid4().hex
+    session = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "total_size": req.total_size,
+        "sha256": req.sha256.lower() if req.sha256 else None,
+        "chunk_size": min(req.chunk_size or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE),
+        "created_at": datetime.utcnow().isoformat()
+    }
+    meta_path, part_path = _session_paths(upload_id)
+    open(part_path, "wb").close()
+    with open(meta_path, "w") as f:
+        json.dump(session, f)
+
+    print(f"Started chunked upload {upload_id} for {filename} ({req.total_size} bytes)")
+    session["received_bytes"] = 0
+    return _session_status(session)
+
+
+@router.get("/sessions/{upload_id}")
+def get_chunked_upload(upload_id: str):
+    """Report how many bytes the server holds, i.e. where the client should resume."""
+    return _session_status(_load_session(upload_id))
+
+
+@router.put("/sessions/{upload_id}")
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    x_chunk_sha256: str = Header(...)
+):
+    """Append one chunk at `offset`. The chunk is rejected if its SHA-256 does not match."""
+    data = await request.body()
+    if len(data) > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    # Hashing and the fsync'ed write stay off the event loop
+    return await run_in_threadpool(_append_chunk, upload_id, offset, data, x_chunk_sha256)
+
+
+def _append_chunk(upload_id: str, offset: int, data: bytes, sha256: str) -> Dict[str, Any]:
+    if hashlib.sha256(data).hexdigest() != sha256.lower():
+        raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+
+    with _session_lock(upload_id):
+        session = _load_session(upload_id)
+        _, part_path = _session_paths(upload_id)
+
+        received = session["received_bytes"]
+        if offset + len(data) <= received:
+            # Retransmission of a chunk we already hold (e.g. the response was lost)
+            return _session_status(session)
+        if offset != received:
+            raise HTTPException(status_code=409, detail=f"Offset mismatch: server has {received} bytes")
+        if received + len(data) > session["total_size"]:
+            raise HTTPException(status_code=400, detail="Chunk exceeds declared total_size")
+
+        with open(part_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    session["received_bytes"] = received + len(data)
+    return _session_status(session)
+
+
+@router.post("/sessions/{upload_id}/finalize")
+def finalize_chunked_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Verify the assembled file and hand it to background ingestion."""
+    with _session_lock(upload_id):
+        session = _load_session(upload_id)
+        meta_path, part_path = _session_paths(upload_id)
+
+        if session["received_bytes"] != session["total_size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete: {session['received_bytes']}/{session['total_size']} bytes"
+            )
+
+        if session.get("sha256"):
+            digest = hashlib.sha256()
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            if digest.hexdigest() != session["sha256"]:
+                raise HTTPException(status_code=422, detail="File checksum mismatch")
+
+        file_path = os.path.join(UPLOAD_DIR, f"{upload_id}_{session['filename']}")
+        os.replace(part_path, file_path)
+        os.remove(meta_path)
+    _drop_session_lock(upload_id)
+    print(f"Chunked upload {upload_id} assembled: {file_path}, Size: {session['total_size']} bytes")
+
+    return _schedule_ingestion(file_path, db)
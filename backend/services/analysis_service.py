@@ -1,22 +1,50 @@
 from sqlalchemy.orm import Session
 from backend.database import models
+from backend.database.bulk import bulk_insert
+from backend.services.test_identity_service import TestIdentityService
+from backend.services.pass_set_service import PassSetService
+from backend.services.progress_service import ProgressBroker
+from backend.services.cluster_centroid_service import ClusterCentroidService
+from backend.services.featurizer_service import FeaturizerService
+from backend.services.job_queue import JobCancelled
 from backend.analysis.clustering import ImprovedFailureClusterer
 from backend.analysis.llm_client import get_llm_client
 from typing import List, Dict, Any, Optional
+import os
+import threading
 import traceback
 
+# Processes clustering module groups in parallel (0 = one per CPU core)
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", "0")) or (os.cpu_count() or 1)
+# Memory ceiling (MB) per module group being clustered (0 = unbounded)
+CLUSTER_MEMORY_MB = int(os.getenv("CLUSTER_MEMORY_MB", "1024")) or None
+
 class AnalysisService:
     @staticmethod
-    def run_analysis_task(run_id: int, db: Session):
+    def run_analysis_task(run_id: int, db: Session, cancelled: Optional[threading.Event] = None):
         """
         Executes the full analysis pipeline for a single test run:
         1. Identifies persistent failures (skipping recovered ones).
-        2. Clusters failures using ImprovedFailureClusterer.
+        2. Assigns failures close to an analyzed cluster's stored centroid to that cluster
+           (ClusterCentroidService) and clusters the rest using ImprovedFailureClusterer.
         3. Sends representative clusters to LLM for root cause analysis.
-        4. Updates database with results.
+        4. Updates database with results and stores the new clusters' centroids.
+        Progress is published to ProgressBroker (phase "analysis") along the way.
+        Once `cancelled` is set (the worker lost the analysis job's lease) the task stops
+        with JobCancelled before the LLM calls and before saving their results, leaving
+        the run to the worker that took the job over.
         """
         print(f"--- Starting Analysis Task for Run {run_id} ---")
+
+        def progress(stage: str, **fields):
+            ProgressBroker.publish(run_id, "analysis", stage, **fields)
+
+        def check_cancelled():
+            if cancelled is not None and cancelled.is_set():
+                raise JobCancelled(f"Analysis of run {run_id} cancelled")
+
         try:
+            progress("loading")
             # Set analysis status to 'analyzing'
             run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
             if run:
@@ -25,6 +53,7 @@ class AnalysisService:
                 print(f"Run {run_id} status set to analyzing")
 
             # 1. Fetch all failures for the run
+            TestIdentityService.ensure_identities(db, [run_id])
             failures = db.query(models.TestCase).filter(
                 models.TestCase.test_run_id == run_id,
                 models.TestCase.status == "fail"
@@ -82,45 +111,39 @@ class AnalysisService:
                     
                     latest_run = newer_runs[0] # Ordered by desc
                     
-                    # 1. Get failures in latest run
-                    latest_failures = db.query(models.TestCase).filter(
-                        models.TestCase.test_run_id == latest_run.id,
-                        models.TestCase.status == "fail"
-                    ).all()
-                    
-                    latest_fail_keys = set(
-                        (f.module_name, f.class_name, f.method_name, f.module_abi or '') 
-                        for f in latest_failures
+                    TestIdentityService.ensure_identities(db, [latest_run.id])
+
+                    # 1. Get failures in latest run (test identity ids)
+                    latest_fail_ids = set(
+                        identity_id for (identity_id,) in db.query(models.TestCase.test_identity_id).filter(
+                            models.TestCase.test_run_id == latest_run.id,
+                            models.TestCase.status == "fail"
+                        )
                     )
-                    
+
                     # 2. Get executed tests in latest run (OPTIMIZATION: Only for relevant modules)
                     # We can't assume "Not in Failures => Recovered" because the latest run might be partial 
                     # and might not have executed the test at all.
                     relevant_modules = set(f.module_name for f in failures)
-                    executed_in_latest = db.query(
-                        models.TestCase.module_name,
-                        models.TestCase.class_name,
-                        models.TestCase.method_name,
-                        models.TestCase.module_abi
-                    ).filter(
-                        models.TestCase.test_run_id == latest_run.id,
-                        models.TestCase.module_name.in_(relevant_modules)
-                    ).all()
-                    
-                    latest_executed_keys = set(
-                        (m, c, meth, abi or '') 
-                        for m, c, meth, abi in executed_in_latest
+                    latest_executed_ids = set(
+                        identity_id for (identity_id,) in db.query(models.TestCase.test_identity_id).filter(
+                            models.TestCase.test_run_id == latest_run.id,
+                            models.TestCase.module_name.in_(relevant_modules)
+                        )
+                    )
+                    # Passes are kept in the run's pass set rather than as rows
+                    failure_ids = set(f.test_identity_id for f in failures)
+                    latest_executed_ids.update(
+                        PassSetService.passed_among(db, [latest_run.id], failure_ids).get(latest_run.id, ())
                     )
                     
-                    print(f"Latest run executed {len(executed_in_latest)} tests in relevant modules.")
+                    print(f"Latest run executed {len(latest_executed_ids)} tests in relevant modules.")
                     
                     for f in failures:
-                        key = (f.module_name, f.class_name, f.method_name, f.module_abi or '')
-                        
-                        if key in latest_fail_keys:
+                        if f.test_identity_id in latest_fail_ids:
                             # Still failing in latest run
                             failures_to_analyze.append(f)
-                        elif key in latest_executed_keys:
+                        elif f.test_identity_id in latest_executed_ids:
                             # Executed in latest run AND not in failures => Recovered!
                             recovered_failures.append(f)
                         else:
@@ -154,18 +177,10 @@ class AnalysisService:
                     db.commit()
                     db.refresh(rec_cluster)
                 
-                # Link failures
-                for f in recovered_failures:
-                    # Check if analysis exists
-                    exists = db.query(models.FailureAnalysis).filter(models.FailureAnalysis.test_case_id == f.id).first()
-                    if not exists:
-                        analysis = models.FailureAnalysis(
-                            test_case_id=f.id,
-                            cluster_id=rec_cluster.id,
-                            root_cause="Recovered",
-                            suggested_solution="Fixed in retry"
-                        )
-                        db.add(analysis)
+                # Link failures (keep analyses they already have)
+                AnalysisService.link_failures(
+                    db, [f.id for f in recovered_failures], rec_cluster.id, "Recovered", "Fixed in retry", overwrite=False
+                )
                 db.commit()
                 
             # Continue with only persistent failures
@@ -205,9 +220,57 @@ class AnalysisService:
                     db.commit()
                 return
 
-            # 3. Cluster using improved algorithm with HDBSCAN
+            progress("assigning", failures=len(valid_failure_dicts))
+            # Module groups are transformed with the corpus featurizer once one is fitted
+            featurizer_version, featurizer = FeaturizerService.current(db) or (None, None)
             # PRD Phase 1.2: min_cluster_size=3 to reduce fragmentation while maintaining granularity
-            clusterer = ImprovedFailureClusterer(min_cluster_size=3)
+            clusterer = ImprovedFailureClusterer(
+                min_cluster_size=3, n_jobs=CLUSTER_WORKERS, max_memory_mb=CLUSTER_MEMORY_MB, featurizer=featurizer
+            )
+
+            # Failures close to an analyzed cluster's centroid join it (no reclustering, no LLM call);
+            # those of a re-analyzed run that are already in the cluster do not move its centroid
+            fa = models.FailureAnalysis
+            valid_case_ids = [failures[i].id for i in valid_indices]
+            linked = {}
+            for i in range(0, len(valid_case_ids), 5000):
+                linked.update(db.query(fa.test_case_id, fa.cluster_id).filter(
+                    fa.test_case_id.in_(valid_case_ids[i:i + 5000]), fa.cluster_id.isnot(None)
+                ).all())
+            try:
+                assigned = ClusterCentroidService.assign(
+                    db, clusterer, valid_failure_dicts, featurizer_version=featurizer_version,
+                    linked_cluster_ids=[linked.get(case_id) for case_id in valid_case_ids]
+                )
+            except Exception as e:
+                print(f"Centroid assignment failed, clustering all failures: {e}")
+                db.rollback()
+                assigned = [None] * len(valid_failure_dicts)
+            assigned_failures: Dict[int, List] = {}
+            for idx, cluster_id in enumerate(assigned):
+                if cluster_id is not None:
+                    assigned_failures.setdefault(cluster_id, []).append(failures[valid_indices[idx]])
+            for cluster in db.query(models.FailureCluster).filter(models.FailureCluster.id.in_(list(assigned_failures))):
+                AnalysisService.link_failures(
+                    db, [f.id for f in assigned_failures[cluster.id]], cluster.id,
+                    cluster.common_root_cause, cluster.common_solution
+                )
+            db.commit()
+            n_assigned = sum(len(v) for v in assigned_failures.values())
+            print(f"[Run {run_id}] {n_assigned} failures assigned to {len(assigned_failures)} existing clusters")
+
+            # Only the rest is clustered
+            valid_indices = [i for i, cluster_id in zip(valid_indices, assigned) if cluster_id is None]
+            valid_failure_dicts = [failure_dicts[i] for i in valid_indices]
+            if not valid_failure_dicts:
+                if run:
+                    run.analysis_status = "completed"
+                    db.commit()
+                return
+
+            progress("clustering", failures=len(valid_failure_dicts), assigned=n_assigned)
+
+            # 3. Cluster using improved algorithm with HDBSCAN
             labels, metrics = clusterer.cluster_failures(valid_failure_dicts)
             
             # Handle outliers by grouping them by module
@@ -218,7 +281,7 @@ class AnalysisService:
             
             # Log clustering metrics
             n_clusters_after_merge = len(set(labels))
-            print(f"[Run {run_id}] Clustering completed: {metrics}")
+            print(f"[Run {run_id}] Clustering completed (featurizer v{featurizer_version or '-'}): {metrics}")
             print(f"[Run {run_id}] After merge: {n_clusters_after_merge} clusters (from {metrics.get('n_clusters', 0)})")
             
             # Get cluster summary for debugging
@@ -233,7 +296,9 @@ class AnalysisService:
                 if label not in clusters:
                     clusters[label] = []
                 clusters[label].append(failures[valid_indices[idx]])
-                
+            label_cluster_ids: Dict[int, int] = {}
+
+            check_cancelled()
             llm_client = get_llm_client()
             
             # Prepare for parallel execution
@@ -258,6 +323,7 @@ class AnalysisService:
                     db.refresh(db_cluster)
                 
                 cluster_map[db_cluster.id] = db_cluster
+                label_cluster_ids[label] = db_cluster.id
                 
                 # Build comprehensive failure context
                 representative_failure = cluster_failures[0]
@@ -277,6 +343,8 @@ Test Failure Details:
                 })
 
             print(f"Prepared {len(analysis_tasks)} analysis tasks")
+            llm_total = len(analysis_tasks)
+            progress("analyzing", failures=len(valid_failure_dicts), clusters=len(clusters), llm_done=0, llm_total=llm_total)
 
             # 3.2 Execute Analysis in Parallel (Worker Threads)
             from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -299,8 +367,14 @@ Test Failure Details:
                     future_to_cluster = {executor.submit(analyze_single_cluster, task): task for task in analysis_tasks}
                     for future in as_completed(future_to_cluster):
                         results.append(future.result())
+                        progress(
+                            "analyzing", failures=len(valid_failure_dicts), clusters=len(clusters),
+                            llm_done=len(results), llm_total=llm_total
+                        )
             
             print(f"Analysis complete. Processing {len(results)} results")
+            check_cancelled()
+            progress("saving", clusters=len(clusters), llm_done=len(results), llm_total=llm_total)
 
             # 3.3 Save Results (Main Thread)
             for res in results:
@@ -352,30 +426,33 @@ Test Failure Details:
                 db.commit()
                 
                 # Link all failures in this cluster to the analysis
-                for failure in res["failures"]:
-                    # Check if analysis already exists
-                    existing_analysis = db.query(models.FailureAnalysis).filter(models.FailureAnalysis.test_case_id == failure.id).first()
-                    
-                    if existing_analysis:
-                        existing_analysis.cluster_id = db_cluster.id
-                        existing_analysis.root_cause = root_cause
-                        existing_analysis.suggested_solution = solution
-                    else:
-                        analysis_record = models.FailureAnalysis(
-                            test_case_id=failure.id,
-                            cluster_id=db_cluster.id,
-                            root_cause=root_cause,
-                            suggested_solution=solution
-                        )
-                        db.add(analysis_record)
-                    db.commit()
+                AnalysisService.link_failures(db, [failure.id for failure in res["failures"]], db_cluster.id, root_cause, solution)
+                db.commit()
             
+            # Centroids of the analyzed clusters, for assigning later failures to them
+            analyzed = {res["cluster_id"] for res in results if "error" not in res}
+            stored = [i for i, label in enumerate(labels) if label_cluster_ids[label] in analyzed]
+            if stored:
+                ClusterCentroidService.store(
+                    db, clusterer, [valid_failure_dicts[i] for i in stored], [label_cluster_ids[labels[i]] for i in stored],
+                    featurizer_version=featurizer_version
+                )
+                db.commit()
+            try:
+                if FeaturizerService.schedule_refit(db):
+                    print("Queued a featurizer refit")
+            except Exception as e:
+                print(f"Failed to schedule a featurizer refit: {e}")
+
             # Mark analysis as completed
             if run:
                 run.analysis_status = "completed"
                 db.commit()
                 print(f"Run {run_id} analysis marked as completed")
                 
+        except JobCancelled:
+            print(f"Analysis of run {run_id} cancelled: the job's lease was lost")
+            raise
         except Exception as e:
             print(f"Analysis task failed: {e}")
             traceback.print_exc()
@@ -388,8 +465,38 @@ Test Failure Details:
             except:
                 pass
         finally:
+            try:
+                status = db.query(models.TestRun.analysis_status).filter(models.TestRun.id == run_id).scalar()
+            except Exception:
+                status = "failed"
+            if not (cancelled is not None and cancelled.is_set()):
+                progress("completed" if status == "completed" else "failed")
             print(f"--- Analysis Task for Run {run_id} Finished ---")
 
+    @staticmethod
+    def link_failures(
+        db: Session, test_case_ids: List[int], cluster_id: int, root_cause: str, solution: str, overwrite: bool = True
+    ):
+        """
+        Point the FailureAnalysis of each test case at a cluster: existing analyses are
+        updated (unless overwrite=False), missing ones bulk-inserted. The caller commits.
+        """
+        fa = models.FailureAnalysis
+        existing = {}
+        for i in range(0, len(test_case_ids), 5000):
+            chunk = test_case_ids[i:i + 5000]
+            existing.update(db.query(fa.test_case_id, fa.id).filter(fa.test_case_id.in_(chunk)).all())
+
+        if overwrite and existing:
+            db.bulk_update_mappings(fa, [
+                {"id": analysis_id, "cluster_id": cluster_id, "root_cause": root_cause, "suggested_solution": solution}
+                for analysis_id in existing.values()
+            ])
+        bulk_insert(db, fa.__table__, [
+            {"test_case_id": case_id, "cluster_id": cluster_id, "root_cause": root_cause, "suggested_solution": solution}
+            for case_id in dict.fromkeys(test_case_ids) if case_id not in existing
+        ])
+
     @staticmethod
     def cleanup_orphan_clusters(db: Session):
         """
@@ -410,7 +517,11 @@ Test Failure Details:
             # 1. Get IDs of used clusters
             used_cluster_ids = db.query(models.FailureAnalysis.cluster_id).filter(models.FailureAnalysis.cluster_id != None).distinct()
             
-            # 2. Delete clusters not in that list
+            # 2. Delete clusters not in that list (and their centroids first)
+            db.query(models.ClusterCentroid).filter(
+                not_(models.ClusterCentroid.cluster_id.in_(used_cluster_ids))
+            ).delete(synchronize_session=False)
+            ClusterCentroidService.prune_featurizers(db)
             deleted_count = db.query(models.FailureCluster).filter(
                 not_(models.FailureCluster.id.in_(used_cluster_ids))
             ).delete(synchronize_session=False)
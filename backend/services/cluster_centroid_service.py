@@ -0,0 +1,180 @@
+"""
+Persisted cluster centroids: online assignment of new failures to analyzed clusters.
+
+Once a run's clusters are analyzed, each gets a centroid, the mean TF-IDF row of
+its failures, stored with the featurizer (vocabulary and idf) it was computed
+with: the corpus featurizer version (FeaturizerService) the analysis used, or
+else one fitted per module group. The next analysis first assigns every failure
+whose cosine distance to the nearest centroid of its module is within
+CLUSTER_ASSIGN_DISTANCE to that cluster, reusing the cluster's root cause
+analysis, and only clusters (and sends to the LLM) the failures left over.
+Assigned failures move their cluster's centroid as a running mean.
+"""
+import json
+import os
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.analysis.clustering import ImprovedFailureClusterer
+
+# Largest cosine distance (0..1 for TF-IDF rows) at which a failure joins an existing cluster
+ASSIGN_MAX_DISTANCE = float(os.getenv("CLUSTER_ASSIGN_DISTANCE", "0.3"))
+
+
+class ClusterCentroidService:
+
+    @staticmethod
+    def encode_featurizer(vocabulary: List[str], idf: np.ndarray) -> bytes:
+        return zlib.compress(json.dumps({"vocabulary": vocabulary, "idf": [float(x) for x in idf]}).encode(), 6)
+
+    @staticmethod
+    def decode_featurizer(data: bytes) -> Tuple[List[str], np.ndarray]:
+        state = json.loads(zlib.decompress(data))
+        return state["vocabulary"], np.asarray(state["idf"], dtype=np.float64)
+
+    @staticmethod
+    def _module_positions(failures: List[Dict]) -> Dict[str, List[int]]:
+        positions = defaultdict(list)
+        for i, f in enumerate(failures):
+            positions[f.get('module_name') or 'Unknown'].append(i)
+        return positions
+
+    @staticmethod
+    def assign(
+        db: Session, clusterer: ImprovedFailureClusterer, failures: List[Dict],
+        max_distance: float = ASSIGN_MAX_DISTANCE, featurizer_version: Optional[int] = None,
+        linked_cluster_ids: Optional[List[Optional[int]]] = None
+    ) -> List[Optional[int]]:
+        """
+        Cluster id of the nearest stored centroid of each failure's module, or None when
+        none is within max_distance. Updates the centroids that got failures (caller commits),
+        except with failures already linked to that cluster (`linked_cluster_ids`, per failure):
+        re-analyzing a run must not count its failures again.
+        Centroids of corpus featurizer `featurizer_version` use clusterer.featurizer.
+        """
+        assigned: List[Optional[int]] = [None] * len(failures)
+        positions = ClusterCentroidService._module_positions(failures)
+        cc = models.ClusterCentroid
+        centroids = db.query(cc).filter(cc.module_name.in_(list(positions))).order_by(cc.cluster_id).all()
+        if not centroids:
+            return assigned
+
+        by_featurizer = defaultdict(lambda: defaultdict(list))
+        for centroid in centroids:
+            by_featurizer[centroid.featurizer_id][centroid.module_name].append(centroid)
+        featurizers = {
+            f.id: f for f in
+            db.query(models.ClusterFeaturizer).filter(models.ClusterFeaturizer.id.in_(list(by_featurizer)))
+        }
+        texts = clusterer.create_enriched_features(failures)
+        best = np.full(len(failures), np.inf)
+        matches = [None] * len(failures)
+        matrices = {}
+
+        # A module can have centroids from several analyses: the nearest over all of them wins
+        for featurizer_id, modules in by_featurizer.items():
+            featurizer = featurizers[featurizer_id]
+            if featurizer.version is not None and featurizer.version == featurizer_version and clusterer.featurizer is not None:
+                vectorizer = clusterer.featurizer
+            else:
+                vectorizer = clusterer.load_featurizer(*ClusterCentroidService.decode_featurizer(featurizer.data))
+            idx = [i for module in modules for i in positions[module]]
+            matrix = matrices[featurizer_id] = vectorizer.transform([texts[i] for i in idx])
+            start = 0
+            for module, group in modules.items():
+                rows = np.arange(start, start + len(positions[module]))
+                start += len(rows)
+                means = np.stack([np.frombuffer(c.centroid, dtype=np.float32) for c in group])
+                norms = np.linalg.norm(means, axis=1)
+                norms[norms == 0] = 1.0
+                # Rows are l2-normalized: cosine distance = 1 - row . unit centroid
+                distances = 1.0 - np.asarray(matrix[rows] @ (means / norms[:, None]).T)
+                nearest = distances.argmin(axis=1)
+                nearest_distance = distances[np.arange(len(rows)), nearest]
+                for row, i, k, distance in zip(rows, positions[module], nearest, nearest_distance):
+                    if distance <= max_distance and distance < best[i]:
+                        best[i] = distance
+                        matches[i] = (featurizer_id, group[k], row)
+
+        # Running mean of each centroid over the failures it got
+        members = defaultdict(list)
+        for i, match in enumerate(matches):
+            if match is not None:
+                featurizer_id, centroid, row = match
+                assigned[i] = centroid.cluster_id
+                if linked_cluster_ids is None or linked_cluster_ids[i] != centroid.cluster_id:
+                    members[(featurizer_id, centroid.cluster_id, centroid.module_name)].append(row)
+        centroid_of = {(c.cluster_id, c.module_name): c for c in centroids}
+        for (featurizer_id, cluster_id, module), rows in members.items():
+            centroid = centroid_of[(cluster_id, module)]
+            total = np.frombuffer(centroid.centroid, dtype=np.float32) * centroid.n_members
+            total = total + np.asarray(matrices[featurizer_id][rows].sum(axis=0)).ravel()
+            centroid.n_members += len(rows)
+            centroid.centroid = (total / centroid.n_members).astype(np.float32).tobytes()
+        return assigned
+
+    @staticmethod
+    def _corpus_featurizer(db: Session, version: int, vectorizer) -> models.ClusterFeaturizer:
+        """The featurizer row of a corpus featurizer version, created on first use."""
+        cf = models.ClusterFeaturizer
+        featurizer = db.query(cf).filter(cf.version == version).first()
+        if featurizer is None:
+            featurizer = cf(version=version, data=ClusterCentroidService.encode_featurizer(
+                vectorizer.get_feature_names_out().tolist(), vectorizer.idf_
+            ))
+            db.add(featurizer)
+            db.flush()
+        return featurizer
+
+    @staticmethod
+    def store(
+        db: Session, clusterer: ImprovedFailureClusterer, failures: List[Dict], cluster_ids: List[int],
+        featurizer_version: Optional[int] = None
+    ):
+        """
+        Store the centroid of each cluster id over its failures in each module, replacing
+        a previous one (caller commits). With a corpus featurizer (clusterer.featurizer, version
+        `featurizer_version`) centroids are in its space, otherwise a featurizer is
+        fitted per module on the failures.
+        """
+        texts = clusterer.create_enriched_features(failures)
+        corpus = None
+        if clusterer.featurizer is not None and featurizer_version is not None:
+            corpus = ClusterCentroidService._corpus_featurizer(db, featurizer_version, clusterer.featurizer)
+            corpus_matrix = clusterer.featurizer.transform(texts)
+        for module, idx in ClusterCentroidService._module_positions(failures).items():
+            if corpus is not None:
+                featurizer, matrix = corpus, corpus_matrix[idx]
+            else:
+                try:
+                    vocabulary, idf, matrix = clusterer.fit_featurizer([texts[i] for i in idx])
+                except ValueError as e:
+                    # Nothing but stop words
+                    print(f"No centroids for module {module}: {e}")
+                    continue
+                featurizer = models.ClusterFeaturizer(
+                    module_name=module, data=ClusterCentroidService.encode_featurizer(vocabulary, idf)
+                )
+                db.add(featurizer)
+                db.flush()
+            ids = np.asarray([cluster_ids[i] for i in idx])
+            for cluster_id in np.unique(ids):
+                rows = np.flatnonzero(ids == cluster_id)
+                db.merge(models.ClusterCentroid(
+                    cluster_id=int(cluster_id), featurizer_id=featurizer.id, module_name=module, n_members=len(rows),
+                    centroid=np.asarray(matrix[rows].mean(axis=0)).ravel().astype(np.float32).tobytes()
+                ))
+        db.flush()
+        ClusterCentroidService.prune_featurizers(db)
+
+    @staticmethod
+    def prune_featurizers(db: Session) -> int:
+        """Delete featurizers no centroid refers to anymore (caller commits)."""
+        cf = models.ClusterFeaturizer
+        return db.query(cf).filter(
+            ~exists().where(models.ClusterCentroid.featurizer_id == cf.id)
+        ).delete(synchronize_session=False)
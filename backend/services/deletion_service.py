@@ -0,0 +1,207 @@
+"""
+Set-based deletion of test runs and submissions.
+
+The API only marks the run / submission as being deleted (hidden from the
+lists, detached from its submission's merge) and enqueues a "delete" job; the
+worker (backend/worker.py) then removes the dependent rows with chunked
+DELETE ... WHERE id IN (...) statements, oldest dependants first:
+
+    failure_analysis -> test_cases -> test_run_modules, run_pass_sets -> test_runs
+    merge_states, merge_suite_states, suite_summaries -> submissions
+
+Each chunk is its own short transaction, so writers (ingestion, analysis) wait
+for one chunk at most rather than for the whole deletion. Failure clusters and
+text blobs referenced by the deleted rows are recorded as orphan candidates in
+the chunk's transaction and garbage-collected at the end of the job when nothing
+references them anymore (with their stored centroids); candidates left by a job
+that died are collected by its retry, or by the next delete job.
+"""
+import os
+from typing import Iterable, List, Optional
+from sqlalchemy import exists, insert, or_
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.database.database import retry_on_locked
+from backend.services.cluster_centroid_service import ClusterCentroidService
+from backend.services.job_queue import JobQueue
+from backend.services.progress_service import ProgressThrottle
+from backend.services.suite_summary_service import SuiteSummaryService
+
+# Rows per DELETE statement (and transaction): bounds how long a writer waits on a deletion
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "2000"))
+
+# TestRun.status / Submission.status while its delete job is pending
+DELETING = "deleting"
+
+
+class DeletionService:
+    @staticmethod
+    def request_run_deletion(db: Session, run: models.TestRun) -> models.Job:
+        """Hide the run, take it out of its submission's merge and enqueue its delete job."""
+        submission_id = run.submission_id
+        run.status = DELETING
+        run.submission_id = None
+        db.commit()
+        if submission_id is not None:
+            SuiteSummaryService.refresh_submissions(db, [submission_id])
+        return JobQueue.enqueue(db, "delete", {"run_ids": [run.id]}, test_run_id=run.id)
+
+    @staticmethod
+    def request_submission_deletion(db: Session, sub: models.Submission) -> models.Job:
+        """Hide the submission and its runs and enqueue the delete job."""
+        sub.status = DELETING
+        db.query(models.TestRun).filter(models.TestRun.submission_id == sub.id).update(
+            {"status": DELETING}, synchronize_session=False
+        )
+        db.commit()
+        return JobQueue.enqueue(db, "delete", {"submission_id": sub.id})
+
+    @staticmethod
+    def _chunks(ids: List[int], size: int) -> Iterable[List[int]]:
+        for i in range(0, len(ids), size):
+            yield ids[i:i + size]
+
+    @staticmethod
+    def _delete_case_chunk(db: Session, case_ids: List[int]):
+        fa, tc = models.FailureAnalysis, models.TestCase
+        clusters = {
+            cluster_id for (cluster_id,) in
+            db.query(fa.cluster_id).filter(fa.test_case_id.in_(case_ids), fa.cluster_id.isnot(None)).distinct()
+        }
+        blobs = set()
+        for stack_trace_id, error_message_id in db.query(tc.stack_trace_id, tc.error_message_id).filter(tc.id.in_(case_ids)):
+            blobs.update(blob_id for blob_id in (stack_trace_id, error_message_id) if blob_id is not None)
+        candidates = [{"kind": "cluster", "ref_id": i} for i in sorted(clusters)] + \
+            [{"kind": "blob", "ref_id": i} for i in sorted(blobs)]
+        if candidates:
+            db.execute(insert(models.OrphanCandidate), candidates)
+        db.query(fa).filter(fa.test_case_id.in_(case_ids)).delete(synchronize_session=False)
+        db.query(tc).filter(tc.id.in_(case_ids)).delete(synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def _delete_run(db: Session, run_id: int, chunk_size: int):
+        tc = models.TestCase
+        progress = ProgressThrottle(run_id, "delete")
+        total = db.query(tc.id).filter(tc.test_run_id == run_id).count()
+        deleted = 0
+        while True:
+            case_ids = [
+                case_id for (case_id,) in
+                db.query(tc.id).filter(tc.test_run_id == run_id).order_by(tc.id).limit(chunk_size)
+            ]
+            if not case_ids:
+                break
+            retry_on_locked(db, lambda: DeletionService._delete_case_chunk(db, case_ids))
+            deleted += len(case_ids)
+            progress.publish("deleting", deleted=deleted, total=total)
+
+        def delete_run():
+            db.query(models.TestRunModule).filter(models.TestRunModule.test_run_id == run_id).delete(synchronize_session=False)
+            db.query(models.RunPassSet).filter(models.RunPassSet.test_run_id == run_id).delete(synchronize_session=False)
+            db.query(models.TestRun).filter(models.TestRun.id == run_id).delete(synchronize_session=False)
+            db.commit()
+        retry_on_locked(db, delete_run)
+        progress.publish("completed", force=True, deleted=deleted, total=total)
+
+    @staticmethod
+    def collect_garbage(db: Session, chunk_size: int = DELETE_CHUNK_SIZE):
+        """Delete the recorded orphan candidates (failure clusters / text blobs) that nothing references anymore."""
+        fc, fa, tc, blob = models.FailureCluster, models.FailureAnalysis, models.TestCase, models.TextBlob
+        cc, oc = models.ClusterCentroid, models.OrphanCandidate
+        deleted_clusters = deleted_blobs = 0
+        while True:
+            candidates = db.query(oc.id, oc.kind, oc.ref_id).order_by(oc.id).limit(chunk_size).all()
+            if not candidates:
+                break
+            clusters = sorted({ref_id for _, kind, ref_id in candidates if kind == "cluster"})
+            blobs = sorted({ref_id for _, kind, ref_id in candidates if kind == "blob"})
+
+            def delete_chunk():
+                db.query(cc).filter(
+                    cc.cluster_id.in_(clusters), ~exists().where(fa.cluster_id == cc.cluster_id)
+                ).delete(synchronize_session=False)
+                cluster_count = db.query(fc).filter(
+                    fc.id.in_(clusters), ~exists().where(fa.cluster_id == fc.id)
+                ).delete(synchronize_session=False)
+                blob_count = db.query(blob).filter(
+                    blob.id.in_(blobs),
+                    ~exists().where(or_(tc.stack_trace_id == blob.id, tc.error_message_id == blob.id))
+                ).delete(synchronize_session=False)
+                db.query(oc).filter(oc.id.in_([c.id for c in candidates])).delete(synchronize_session=False)
+                db.commit()
+                return cluster_count, blob_count
+            cluster_count, blob_count = retry_on_locked(db, delete_chunk)
+            deleted_clusters += cluster_count
+            deleted_blobs += blob_count
+        if deleted_clusters:
+            def prune_featurizers():
+                ClusterCentroidService.prune_featurizers(db)
+                db.commit()
+            retry_on_locked(db, prune_featurizers)
+        if deleted_clusters or deleted_blobs:
+            print(f"Cleaned up {deleted_clusters} orphan failure clusters and {deleted_blobs} orphan text blobs.")
+
+    @staticmethod
+    def delete_runs(db: Session, run_ids: List[int], chunk_size: int = DELETE_CHUNK_SIZE):
+        """Delete runs and everything that hangs off them (idempotent: a retried job resumes)."""
+        submission_ids = {
+            submission_id for (submission_id,) in
+            db.query(models.TestRun.submission_id).filter(models.TestRun.id.in_(run_ids), models.TestRun.submission_id.isnot(None))
+        }
+        for run_id in run_ids:
+            print(f"Deleting run {run_id}...")
+            DeletionService._delete_run(db, run_id, chunk_size)
+        DeletionService.collect_garbage(db, chunk_size)
+        if submission_ids:
+            SuiteSummaryService.refresh_submissions(db, sorted(submission_ids))
+
+    @staticmethod
+    def delete_submission(db: Session, submission_id: int, chunk_size: int = DELETE_CHUNK_SIZE):
+        """Delete a submission, its runs and its derived merge state / summaries."""
+        ms = models.MergeState
+        while True:
+            identity_ids = [
+                identity_id for (identity_id,) in
+                db.query(ms.test_identity_id).filter(ms.submission_id == submission_id).limit(chunk_size)
+            ]
+            if not identity_ids:
+                break
+            def delete_states():
+                db.query(ms).filter(ms.submission_id == submission_id, ms.test_identity_id.in_(identity_ids)).delete(
+                    synchronize_session=False
+                )
+                db.commit()
+            retry_on_locked(db, delete_states)
+
+        def delete_summaries():
+            db.query(models.MergeSuiteState).filter(models.MergeSuiteState.submission_id == submission_id).delete(
+                synchronize_session=False
+            )
+            db.query(models.SuiteSummary).filter(models.SuiteSummary.submission_id == submission_id).delete(
+                synchronize_session=False
+            )
+            db.commit()
+        retry_on_locked(db, delete_summaries)
+
+        run_ids = [
+            run_id for (run_id,) in
+            db.query(models.TestRun.id).filter(models.TestRun.submission_id == submission_id).order_by(models.TestRun.id)
+        ]
+        for run_id in run_ids:
+            print(f"Deleting run {run_id} of submission {submission_id}...")
+            DeletionService._delete_run(db, run_id, chunk_size)
+
+        def delete_sub():
+            db.query(models.Submission).filter(models.Submission.id == submission_id).delete(synchronize_session=False)
+            db.commit()
+        retry_on_locked(db, delete_sub)
+        DeletionService.collect_garbage(db, chunk_size)
+
+    @staticmethod
+    def run_job(db: Session, run_ids: Optional[List[int]] = None, submission_id: Optional[int] = None):
+        """Handler body of a "delete" job (payload: run_ids or submission_id)."""
+        if submission_id is not None:
+            DeletionService.delete_submission(db, submission_id)
+        if run_ids:
+            DeletionService.delete_runs(db, run_ids)
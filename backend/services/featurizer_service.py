@@ -0,0 +1,203 @@
+"""
+Corpus-level TF-IDF featurizer, versioned in the database.
+
+A background "featurizer" job (backend/worker.py) fits the clustering's TF-IDF
+vectorizer on the most recent FEATURIZER_MAX_DOCS failures of the whole corpus
+and stores it as a new featurizer_versions row (vocabulary, idf and fit
+metadata); the newest version is the one analyses use. Workers on any host see
+the same versions through the database; FEATURIZER_DIR only caches each one on
+disk, named after its checksum so a cache never stands in for another version:
+
+    FEATURIZER_DIR/v<version>-<checksum>.zlib
+
+Analyses only transform their module groups with the current version instead
+of fitting a vectorizer per group, so idf weights come from the corpus and the
+failures of different runs and submissions are vectors in one space. Until a
+first version exists the clusterer keeps fitting per group. An analysis
+enqueues a refit once FEATURIZER_REFIT_FAILURES failures were added since the
+current version was fitted.
+"""
+import hashlib
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.analysis.clustering import ImprovedFailureClusterer
+from backend.database import models
+from backend.database.database import BASE_DIR
+from backend.services.cluster_centroid_service import ClusterCentroidService
+from backend.services.job_queue import JobQueue, QUEUED, RUNNING
+
+FEATURIZER_DIR = os.getenv("FEATURIZER_DIR", os.path.join(BASE_DIR, "featurizers"))
+# Most recent failures a version is fitted on
+FEATURIZER_MAX_DOCS = int(os.getenv("FEATURIZER_MAX_DOCS", "100000"))
+# Vocabulary of the corpus featurizer (a per-group vectorizer keeps 2000 terms)
+FEATURIZER_MAX_FEATURES = int(os.getenv("FEATURIZER_MAX_FEATURES", "20000"))
+# New failures since the current version that trigger a refit
+FEATURIZER_REFIT_FAILURES = int(os.getenv("FEATURIZER_REFIT_FAILURES", "20000"))
+# Older versions kept (stored centroids keep their own copy in cluster_featurizers)
+FEATURIZER_KEEP_VERSIONS = int(os.getenv("FEATURIZER_KEEP_VERSIONS", "2"))
+
+_CACHE_FILE = re.compile(r"^v(\d+)-[0-9a-f]+\.zlib$")
+
+# Loaded versions of this process: (version, checksum) -> (metadata, fitted vectorizer)
+_loaded: Dict[Tuple[int, str], Tuple[Dict[str, Any], TfidfVectorizer]] = {}
+_lock = threading.Lock()
+
+
+class FeaturizerService:
+
+    @staticmethod
+    def _cache_path(version: int, checksum: str) -> str:
+        return os.path.join(FEATURIZER_DIR, f"v{version}-{checksum[:16]}.zlib")
+
+    @staticmethod
+    def versions(db: Session) -> List[int]:
+        """Stored versions, oldest first."""
+        fv = models.FeaturizerVersion
+        return [version for (version,) in db.query(fv.version).order_by(fv.version)]
+
+    @staticmethod
+    def current_version(db: Session) -> Optional[int]:
+        return db.query(func.max(models.FeaturizerVersion.version)).scalar()
+
+    @staticmethod
+    def _read_data(db: Session, version: int, checksum: str) -> bytes:
+        """Stored state of a version, from the disk cache when it has it."""
+        path = FeaturizerService._cache_path(version, checksum)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() == checksum:
+                return data
+        except OSError:
+            pass
+        fv = models.FeaturizerVersion
+        data = db.query(fv.data).filter(fv.version == version).scalar()
+        try:
+            os.makedirs(FEATURIZER_DIR, exist_ok=True)
+            FeaturizerService._write(path, data)
+        except OSError as e:
+            print(f"Featurizer v{version} not cached in {FEATURIZER_DIR}: {e}")
+        return data
+
+    @staticmethod
+    def load(db: Session, version: int) -> Tuple[Dict[str, Any], TfidfVectorizer]:
+        """Metadata and fitted vectorizer of a version (cached per process); KeyError when it is not stored."""
+        fv = models.FeaturizerVersion
+        row = db.query(fv.version, fv.checksum, fv.n_docs, fv.max_case_id, fv.max_features, fv.created_at).filter(
+            fv.version == version
+        ).first()
+        if row is None:
+            raise KeyError(f"Featurizer v{version} not found")
+        key = (row.version, row.checksum)
+        with _lock:
+            if key not in _loaded:
+                vocabulary, idf = ClusterCentroidService.decode_featurizer(FeaturizerService._read_data(db, *key))
+                meta = {
+                    "version": row.version, "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "n_docs": row.n_docs, "max_case_id": row.max_case_id, "max_features": row.max_features
+                }
+                _loaded[key] = (meta, ImprovedFailureClusterer().load_featurizer(vocabulary, idf))
+            return _loaded[key]
+
+    @staticmethod
+    def current(db: Session) -> Optional[Tuple[int, TfidfVectorizer]]:
+        """(version, vectorizer) analyses should transform with, or None to fit per group."""
+        version = FeaturizerService.current_version(db)
+        if version is None:
+            return None
+        try:
+            return version, FeaturizerService.load(db, version)[1]
+        except (OSError, ValueError, KeyError, zlib.error) as e:
+            print(f"Featurizer v{version} unreadable, fitting per module group: {e}")
+            return None
+
+    @staticmethod
+    def _corpus_texts(db: Session, max_docs: int, batch_size: int = 5000) -> Tuple[List[str], int]:
+        """Enriched texts of the newest failures with text, and the newest failure's id."""
+        tc = models.TestCase
+        clusterer = ImprovedFailureClusterer()
+        texts: List[str] = []
+        batch: List[Dict[str, str]] = []
+        max_case_id = 0
+        query = db.query(tc.id, tc.module_name, tc.class_name, tc.method_name, tc.stack_trace, tc.error_message).filter(
+            tc.status == "fail"
+        ).order_by(tc.id.desc()).limit(max_docs)
+        for case_id, module, class_name, method, stack_trace, error_message in query.yield_per(batch_size):
+            max_case_id = max(max_case_id, case_id)
+            if not ((stack_trace or '').strip() or (error_message or '').strip()):
+                continue
+            batch.append({
+                'module_name': module or '', 'class_name': class_name or '', 'method_name': method or '',
+                'stack_trace': stack_trace or '', 'error_message': error_message or ''
+            })
+            if len(batch) == batch_size:
+                texts.extend(clusterer.create_enriched_features(batch))
+                batch = []
+        texts.extend(clusterer.create_enriched_features(batch))
+        return texts, max_case_id
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        # Readers (other processes) only ever see complete files
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def fit(db: Session, max_docs: int = FEATURIZER_MAX_DOCS, max_features: int = FEATURIZER_MAX_FEATURES) -> Optional[int]:
+        """Fit a new version on the corpus and make it current; returns it (None without failures to fit on)."""
+        texts, max_case_id = FeaturizerService._corpus_texts(db, max_docs)
+        if not texts:
+            print("No failures to fit a featurizer on.")
+            return None
+        print(f"Fitting featurizer on {len(texts)} failures...")
+        vocabulary, idf, _ = ImprovedFailureClusterer().fit_featurizer(texts, max_features=max_features)
+
+        fv = models.FeaturizerVersion
+        data = ClusterCentroidService.encode_featurizer(list(vocabulary), idf)
+        row = fv(
+            data=data, checksum=hashlib.sha256(data).hexdigest(), n_docs=len(texts),
+            max_case_id=max_case_id, max_features=max_features
+        )
+        db.add(row)
+        db.commit()
+        version = row.version
+
+        kept = FeaturizerService.versions(db)[-(FEATURIZER_KEEP_VERSIONS + 1):]
+        db.query(fv).filter(fv.version < kept[0]).delete(synchronize_session=False)
+        db.commit()
+        if os.path.isdir(FEATURIZER_DIR):
+            for name in os.listdir(FEATURIZER_DIR):
+                match = _CACHE_FILE.match(name)
+                if match and int(match.group(1)) < kept[0]:
+                    os.remove(os.path.join(FEATURIZER_DIR, name))
+        print(f"Featurizer v{version}: {len(vocabulary)} terms from {len(texts)} failures.")
+        return version
+
+    @staticmethod
+    def schedule_refit(db: Session, force: bool = False) -> Optional[models.Job]:
+        """
+        Enqueue a featurizer job when there is no version yet or FEATURIZER_REFIT_FAILURES
+        failures were added since the current one (always with force), unless one is pending.
+        """
+        pending = db.query(models.Job.id).filter(
+            models.Job.job_type == "featurizer", models.Job.status.in_([QUEUED, RUNNING])
+        ).first()
+        if pending:
+            return None
+        if not force:
+            fv = models.FeaturizerVersion
+            current = db.query(fv.max_case_id).order_by(fv.version.desc()).first()
+            fitted_up_to = (current.max_case_id or 0) if current else 0
+            tc = models.TestCase
+            new_failures = db.query(func.count(tc.id)).filter(tc.id > fitted_up_to, tc.status == "fail").scalar()
+            if new_failures < (FEATURIZER_REFIT_FAILURES if current else 1):
+                return None
+        return JobQueue.enqueue(db, "featurizer", {})
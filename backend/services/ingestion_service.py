@@ -0,0 +1,369 @@
+"""
+Pipelined ingestion of parsed test results.
+
+The parser stage (caller thread) pushes parsed items into a bounded queue,
+and a writer stage (background thread, own DB session) consumes them:
+counting stats (run-wide and per module), collecting executed modules,
+bulk-inserting failures in fixed-size batches and resolving passes to test
+identity ids. When the producer is done, the writer stores the TestRunModule
+rows with their per-module results, the run's pass set and the run
+statistics in the same pass, then refreshes the cached suite summaries of
+the run's submission. Progress (bytes parsed, modules
+done, failures inserted) is published to ProgressBroker as the writer goes.
+"""
+import os
+import queue
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from backend.database.database import SessionLocal
+from backend.database import models
+from backend.database.bulk import bulk_insert
+from backend.services.text_blob_service import TextBlobService
+from backend.services.test_identity_service import TestIdentityService
+from backend.services.pass_set_service import PassSetService
+from backend.services.progress_service import ProgressThrottle
+from backend.services.suite_summary_service import SuiteSummaryService
+from backend.services.job_queue import JobCancelled
+
+_SENTINEL = object()
+
+# Bulk ingestion (results of at least BULK_INGEST_BYTES) commits every BULK_COMMIT_ROWS
+# rows instead of every batch: fewer, larger write transactions
+BULK_INGEST_BYTES = int(os.getenv("BULK_INGEST_BYTES", str(64 * 1024 * 1024)))
+BULK_COMMIT_ROWS = int(os.getenv("BULK_COMMIT_ROWS", "100000"))
+
+
+class IngestionStats:
+    """Running counters for a single ingestion."""
+
+    def __init__(self):
+        self.total = 0
+        self.passed = 0
+        self.failed = 0
+        self.ignored = 0
+        self.failures_inserted = 0
+        self.all_modules = set()          # "module_name:abi" keys seen on tests
+        self.failed_modules = set()
+        self.module_counts: Dict[str, List[int]] = {}  # module key -> [passed, failed, ignored]
+        self.module_rows: List[Dict[str, Any]] = []
+        self._module_keys = set()
+
+    def add_module(self, test_run_id: int, item: Dict[str, Any]):
+        mod_name = item.get("module_name")
+        mod_abi = item.get("module_abi")
+        mod_key = f"{mod_name}:{mod_abi}"
+        if mod_key not in self._module_keys:
+            self._module_keys.add(mod_key)
+            self.module_rows.append({
+                "test_run_id": test_run_id,
+                "module_name": mod_name,
+                "module_abi": mod_abi,
+                "done": item.get("done"),
+                "runtime_ms": item.get("runtime_ms")
+            })
+
+    def add_test(self, item: Dict[str, Any]):
+        module_name = item.get("module_name")
+        module_key = f"{module_name}:{item.get('module_abi')}" if module_name else None
+        status = item.get("status")
+
+        self.total += 1
+        counts = None
+        if module_key:
+            self.all_modules.add(module_key)
+            counts = self.module_counts.get(module_key)
+            if counts is None:
+                counts = self.module_counts[module_key] = [0, 0, 0]
+
+        if status == "pass":
+            self.passed += 1
+            slot = 0
+        elif status == "fail":
+            self.failed += 1
+            slot = 1
+            if module_key:
+                self.failed_modules.add(module_key)
+        else:
+            self.ignored += 1
+            slot = 2
+        if counts is not None:
+            counts[slot] += 1
+
+    def module_stat_rows(self) -> List[Dict[str, Any]]:
+        """module_rows with their pass / fail / ignored counts filled in."""
+        for row in self.module_rows:
+            passed, failed, ignored = self.module_counts.get(f"{row['module_name']}:{row['module_abi']}", (0, 0, 0))
+            row["passed_tests"] = passed
+            row["failed_tests"] = failed
+            row["ignored_tests"] = ignored
+        return self.module_rows
+
+
+class IngestionPipeline:
+    """
+    Two-stage (parse -> write) ingestion joined by a bounded queue.
+
+    Usage:
+        pipeline = IngestionPipeline(test_run_id, bytes_read=lambda: parser.bytes_read)
+        stats = pipeline.run(parser.parse(file_path), total_bytes=size)
+
+    or, when the caller produces items itself (e.g. from a stream):
+        pipeline.start(); pipeline.put(item) ...; stats = pipeline.finish()
+    """
+
+    def __init__(
+        self,
+        test_run_id: int,
+        batch_size: int = 10000,
+        chunk_size: int = 1000,
+        queue_size: int = 16,
+        session_factory=SessionLocal,
+        bytes_read: Optional[Callable[[], int]] = None,
+        cancelled: Optional[threading.Event] = None
+    ):
+        self.test_run_id = test_run_id
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.session_factory = session_factory
+        self.stats = IngestionStats()
+        self.bytes_parsed = 0
+        self.total_bytes: Optional[int] = None
+        self._bytes_read = bytes_read
+        # Set when the ingest job's lease is lost: stop before writing more
+        self._cancelled = cancelled
+        self._progress = ProgressThrottle(test_run_id, "ingest")
+        self.commit_rows = batch_size
+        self._uncommitted = 0
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._chunk: List[Dict[str, Any]] = []
+        self._writer: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._started_at = 0.0
+        self._result: Dict[str, Any] = {}
+        # content hash -> text_blobs.id, shared across batches of this run
+        self._text_ids: Dict[str, int] = {}
+        # identity key -> test_identities.id, shared across batches of this run
+        self._identity_ids: Dict[tuple, int] = {}
+        # identity ids of passed tests (compact; keys are resolved per batch, not cached)
+        self._pass_ids = array("q")
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def start(self):
+        self._started_at = time.time()
+        if self.total_bytes is not None and self.total_bytes >= BULK_INGEST_BYTES:
+            self.commit_rows = max(self.batch_size, BULK_COMMIT_ROWS)
+        self._writer = threading.Thread(target=self._write_loop, name=f"ingest-writer-{self.test_run_id}", daemon=True)
+        self._writer.start()
+
+    def put(self, item: Dict[str, Any]):
+        self._chunk.append(item)
+        if len(self._chunk) >= self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self._cancelled is not None and self._cancelled.is_set():
+            raise JobCancelled(f"Ingestion of run {self.test_run_id} cancelled")
+        if not self._chunk:
+            return
+        chunk, self._chunk = self._chunk, []
+        if self._bytes_read is not None:
+            self.bytes_parsed = self._bytes_read()
+        self._put(chunk)
+        if self._error is not None:
+            raise RuntimeError(f"Ingestion writer failed: {self._error}")
+
+    def _put(self, obj):
+        # Blocks while the writer falls behind (backpressure), but never on a dead writer
+        while self._writer.is_alive():
+            try:
+                self._queue.put(obj, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def finish(self, total_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """Flush pending items, wait for the writer and return the run stats."""
+        if total_bytes is not None:
+            self.bytes_parsed = self.total_bytes = total_bytes
+        self._flush_chunk()
+        self._put(_SENTINEL)
+        self._writer.join()
+        if self._error is not None:
+            raise RuntimeError(f"Ingestion writer failed: {self._error}")
+        return self._result
+
+    def abort(self):
+        """Stop the writer without finalizing the run."""
+        self._chunk = []
+        if self._writer is not None:
+            self._put(None)
+            self._writer.join()
+
+    def run(self, items: Iterable[Dict[str, Any]], total_bytes: Optional[int] = None) -> Dict[str, Any]:
+        self.total_bytes = total_bytes
+        self.start()
+        try:
+            for item in items:
+                self.put(item)
+            return self.finish(total_bytes)
+        except BaseException:
+            self.abort()
+            raise
+
+    # ------------------------------------------------------------------
+    # Writer side
+    # ------------------------------------------------------------------
+    def _write_loop(self):
+        db = self.session_factory()
+        batch: List[Dict[str, Any]] = []
+        passes: List[tuple] = []
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    return  # aborted
+                if chunk is _SENTINEL:
+                    break
+
+                for item in chunk:
+                    if item.get("type") == "module_info":
+                        self.stats.add_module(self.test_run_id, item)
+                        continue
+
+                    self.stats.add_test(item)
+                    # ONLY store failures in DB; passes go into the run's pass set
+                    status = item.get("status")
+                    if status == "fail":
+                        item["test_run_id"] = self.test_run_id
+                        batch.append(item)
+                    elif status == "pass":
+                        passes.append(TestIdentityService.identity_key(
+                            item.get("module_name"), item.get("module_abi"), item.get("class_name"), item.get("method_name")
+                        ))
+
+                if len(batch) >= self.batch_size:
+                    self._insert_failures(db, batch)
+                    batch = []
+                if len(passes) >= self.batch_size:
+                    self._resolve_passes(db, passes)
+                    passes = []
+                self._publish("parsing")
+
+            self._publish("finalizing", force=True)
+            if batch:
+                self._insert_failures(db, batch)
+            if passes:
+                self._resolve_passes(db, passes)
+            self._finalize(db)
+        except BaseException as e:
+            self._error = e
+            db.rollback()
+            # Drain so a blocked producer can observe the error
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+        finally:
+            db.close()
+
+    def _publish(self, stage: str, force: bool = False):
+        stats = self.stats
+        self._progress.publish(
+            stage, force=force,
+            bytes_parsed=self.bytes_parsed,
+            total_bytes=self.total_bytes,
+            tests=stats.total,
+            modules_done=len(stats.module_rows),
+            failures_inserted=stats.failures_inserted
+        )
+
+    def _insert_failures(self, db, batch: List[Dict[str, Any]]):
+        TextBlobService.attach_text_ids(db, batch, self._text_ids)
+        TestIdentityService.attach_identity_ids(db, batch, self._identity_ids)
+        bulk_insert(db, models.TestCase.__table__, batch)
+        self._commit(db, len(batch))
+        self.stats.failures_inserted += len(batch)
+
+    def _resolve_passes(self, db, keys: List[tuple]):
+        ids = TestIdentityService.resolve_ids(db, keys)
+        self._commit(db, len(keys))
+        self._pass_ids.extend(ids[key] for key in keys)
+
+    def _commit(self, db, rows: int):
+        self._uncommitted += rows
+        if self._uncommitted >= self.commit_rows:
+            db.commit()
+            self._uncommitted = 0
+
+    def _finalize(self, db):
+        stats = self.stats
+        module_rows = stats.module_rows
+
+        # Fallback: If no explicit module_info (Module headers) were found, infer from test cases
+        if not module_rows and stats.all_modules:
+            print(f"Warning: No explicit module_info found. Inferring {len(stats.all_modules)} modules from test cases for Run {self.test_run_id}.")
+            for mod_key in stats.all_modules:
+                parts = mod_key.split(":")
+                if len(parts) == 2:
+                    module_rows.append({
+                        "test_run_id": self.test_run_id,
+                        "module_name": parts[0],
+                        "module_abi": parts[1],
+                        "done": None,
+                        "runtime_ms": None
+                    })
+
+        if module_rows:
+            bulk_insert(db, models.TestRunModule.__table__, stats.module_stat_rows())
+        PassSetService.store(db, self.test_run_id, self._pass_ids)
+
+        total_modules = len(stats.all_modules)
+        failed_modules = len(stats.failed_modules)
+
+        test_run = db.query(models.TestRun).filter(models.TestRun.id == self.test_run_id).first()
+        if test_run:
+            # total_tests is used as "Executed Tests" (Pass + Fail)
+            test_run.total_tests = stats.passed + stats.failed
+            test_run.passed_tests = stats.passed
+            test_run.failed_tests = stats.failed
+            test_run.ignored_tests = stats.ignored
+            test_run.total_modules = total_modules
+            test_run.passed_modules = total_modules - failed_modules
+            test_run.failed_modules = failed_modules
+            test_run.status = "completed"
+        db.commit()
+        try:
+            SuiteSummaryService.refresh_for_run(db, self.test_run_id)
+        except Exception as e:
+            # The cached summary is refreshed again on the submission's next change
+            print(f"Warning: Failed to refresh suite summaries for Run {self.test_run_id}: {e}")
+            db.rollback()
+        self._publish("completed", force=True)
+
+        elapsed = max(time.time() - self._started_at, 1e-6)
+        self._result = {
+            "test_run_id": self.test_run_id,
+            "total_tests": stats.total,
+            "passed_tests": stats.passed,
+            "failed_tests": stats.failed,
+            "ignored_tests": stats.ignored,
+            "total_modules": total_modules,
+            "failed_modules": failed_modules,
+            "module_rows": len(module_rows),
+            "failures_inserted": stats.failures_inserted,
+            "elapsed_sec": elapsed,
+            "tests_per_sec": stats.total / elapsed,
+            "mb_per_sec": (self.bytes_parsed / (1024 * 1024)) / elapsed,
+        }
+        print(
+            f"[Ingest] Run {self.test_run_id}: {stats.total} tests, {stats.failed} failures, "
+            f"{total_modules} modules in {elapsed:.2f}s "
+            f"({self._result['tests_per_sec']:.0f} tests/s, {self._result['mb_per_sec']:.2f} MB/s)"
+        )
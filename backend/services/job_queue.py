@@ -0,0 +1,136 @@
+"""
+Durable job queue on the application database.
+
+The API only enqueues jobs; worker processes (backend/worker.py) claim them
+with a lease, extend it with heartbeats while the handler runs and record the
+outcome. A job whose worker died is reclaimed once its lease expires, so work
+survives restarts. Claims are compare-and-set UPDATEs, which keeps several
+worker processes or nodes sharing one database from running a job twice.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from backend.database import models
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that stops because its worker lost the job's lease."""
+
+
+class JobQueue:
+    @staticmethod
+    def enqueue(
+        db: Session, job_type: str, payload: Dict[str, Any], max_attempts: int = 3, test_run_id: Optional[int] = None
+    ) -> models.Job:
+        job = models.Job(job_type=job_type, payload=json.dumps(payload), max_attempts=max_attempts, test_run_id=test_run_id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def _claimable(job_types: List[str], now: datetime):
+        return and_(
+            models.Job.job_type.in_(job_types),
+            or_(
+                and_(models.Job.status == QUEUED, models.Job.run_after <= now),
+                # Worker died or stalled: take the job over once its lease ran out
+                and_(models.Job.status == RUNNING, models.Job.lease_expires_at < now)
+            )
+        )
+
+    @staticmethod
+    def claim(db: Session, worker_id: str, job_types: List[str], lease_seconds: int) -> Optional[models.Job]:
+        """Claim the oldest runnable job of the given types, or return None."""
+        now = datetime.utcnow()
+        candidates = db.query(models.Job.id).filter(JobQueue._claimable(job_types, now)).order_by(models.Job.id).limit(5).all()
+        for (job_id,) in candidates:
+            # Compare-and-set: only one worker's UPDATE matches while the job is still claimable
+            claimed = db.query(models.Job).filter(
+                models.Job.id == job_id, JobQueue._claimable(job_types, now)
+            ).update({
+                "status": RUNNING,
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "heartbeat_at": now,
+                "started_at": now,
+                "attempts": models.Job.attempts + 1
+            }, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                continue
+            job = db.query(models.Job).filter(models.Job.id == job_id).first()
+            if job.attempts > job.max_attempts:
+                # Reclaimed after its last attempt's worker died
+                JobQueue.fail(db, job_id, worker_id, job.last_error or "Lease expired (worker lost)")
+                continue
+            return job
+        return None
+
+    @staticmethod
+    def heartbeat(
+        db: Session, job_id: int, worker_id: str, lease_seconds: int, progress: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Extend the lease (and record progress); False when the job is no longer ours (lease expired and was reclaimed)."""
+        now = datetime.utcnow()
+        values = {
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "heartbeat_at": now
+        }
+        if progress is not None:
+            values["progress"] = json.dumps(progress)
+        extended = db.query(models.Job).filter(
+            models.Job.id == job_id, models.Job.lease_owner == worker_id, models.Job.status == RUNNING
+        ).update(values, synchronize_session=False)
+        db.commit()
+        return bool(extended)
+
+    @staticmethod
+    def complete(db: Session, job_id: int, worker_id: str):
+        db.query(models.Job).filter(models.Job.id == job_id, models.Job.lease_owner == worker_id).update({
+            "status": SUCCEEDED,
+            "lease_expires_at": None,
+            "last_error": None,
+            "finished_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def fail(db: Session, job_id: int, worker_id: str, error: str, retry_delay: int = 30):
+        """Requeue with backoff (retry_delay * attempts) until max_attempts, then mark failed."""
+        job = db.query(models.Job).filter(models.Job.id == job_id, models.Job.lease_owner == worker_id).first()
+        if not job:
+            return
+        now = datetime.utcnow()
+        job.last_error = error
+        job.lease_expires_at = None
+        if job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.run_after = now + timedelta(seconds=retry_delay * job.attempts)
+        else:
+            job.status = FAILED
+            job.finished_at = now
+        db.commit()
+
+    @staticmethod
+    def to_dict(job: models.Job) -> Dict[str, Any]:
+        return {
+            "id": job.id,
+            "job_type": job.job_type,
+            "payload": json.loads(job.payload or "{}"),
+            "test_run_id": job.test_run_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "lease_owner": job.lease_owner,
+            "heartbeat_at": job.heartbeat_at,
+            "last_error": job.last_error,
+            "progress": json.loads(job.progress) if job.progress else None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at
+        }
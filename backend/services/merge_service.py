@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import asc
+from sqlalchemy import asc, select
 from backend.database import models
+from backend.services.test_identity_service import TestIdentityService
+from backend.services.pass_set_service import PassSetService
 from typing import List, Dict, Any
+import numpy as np
+
+NOT_EXECUTED = "not_executed"
 
 class MergeService:
     @staticmethod
@@ -24,43 +29,18 @@ class MergeService:
             }
 
         # Group runs by derived suite name
-        runs_by_suite = {}
-        for run in runs:
-            raw_name = (run.test_suite_name or "Unknown").upper()
-            
-            # Default to raw name
-            suite_group = raw_name
-            
-            # Detect CTSonGSI logic - PRIORITY ORDER:
-            # 1. Check suite_plan first (most reliable)
-            # 2. Check explicit suite name
-            # 3. Check fingerprint difference
-            if 'CTS' in raw_name:
-                suite_plan = (run.suite_plan or "").lower()
-                
-                # Priority 1: suite_plan contains 'gsi' or 'on-gsi'
-                if 'gsi' in suite_plan or 'on-gsi' in suite_plan:
-                    suite_group = 'CTSonGSI'
-                # Priority 2: Explicit CTSONGSI name
-                elif raw_name == 'CTSONGSI':
-                    suite_group = 'CTSonGSI'
-                # Priority 3: Fingerprint differs from target (legacy fallback)
-                elif run.device_fingerprint and sub.target_fingerprint and run.device_fingerprint != sub.target_fingerprint:
-                    suite_group = 'CTSonGSI'
-                else:
-                    suite_group = 'CTS'
-            
-            if suite_group not in runs_by_suite:
-                runs_by_suite[suite_group] = []
-            runs_by_suite[suite_group].append(run)
+        runs_by_suite = MergeService.group_runs(sub, runs)
             
         suites_data = []
         total_initial = 0
         total_recovered = 0
         total_remaining = 0
 
+        # Merged results come from the persisted merge state (see MergeStateService)
+        from backend.services.merge_state_service import MergeStateService
+
         for suite_name, suite_runs in runs_by_suite.items():
-            summary_data = MergeService.calculate_suite_summary(db, suite_runs)
+            summary_data = MergeStateService.suite_report(db, sub, suite_name, suite_runs)
             
             suites_data.append({
                 "suite_name": suite_name,
@@ -89,10 +69,70 @@ class MergeService:
         }
 
     @staticmethod
-    def calculate_suite_summary(db: Session, suite_runs: List[models.TestRun]):
+    def suite_group(run: models.TestRun, sub: models.Submission) -> str:
+        """Suite a run is merged under in the merge report (CTS and CTS-on-GSI are told apart)."""
+        raw_name = (run.test_suite_name or "Unknown").upper()
+        
+        # Default to raw name
+        suite_group = raw_name
+        
+        # Detect CTSonGSI logic - PRIORITY ORDER:
+        # 1. Check suite_plan first (most reliable)
+        # 2. Check explicit suite name
+        # 3. Check fingerprint difference
+        if 'CTS' in raw_name:
+            suite_plan = (run.suite_plan or "").lower()
+            
+            # Priority 1: suite_plan contains 'gsi' or 'on-gsi'
+            if 'gsi' in suite_plan or 'on-gsi' in suite_plan:
+                suite_group = 'CTSonGSI'
+            # Priority 2: Explicit CTSONGSI name
+            elif raw_name == 'CTSONGSI':
+                suite_group = 'CTSonGSI'
+            # Priority 3: Fingerprint differs from target (legacy fallback)
+            elif run.device_fingerprint and sub.target_fingerprint and run.device_fingerprint != sub.target_fingerprint:
+                suite_group = 'CTSonGSI'
+            else:
+                suite_group = 'CTS'
+        return suite_group
+
+    @staticmethod
+    def group_runs(sub: models.Submission, runs: List[models.TestRun]) -> Dict[str, List[models.TestRun]]:
+        """Suite group -> its runs (in the order given)."""
+        runs_by_suite = {}
+        for run in runs:
+            runs_by_suite.setdefault(MergeService.suite_group(run, sub), []).append(run)
+        return runs_by_suite
+
+    @staticmethod
+    def load_failure_details(db: Session, case_ids: List[int], chunk_size: int = 5000) -> Dict[int, Any]:
+        """
+        Representative failures of merge report items by case id, as rows of the columns
+        reports and exports read (root_cause of the failure's analysis included): loading
+        full TestCase entities cost more than the merge itself.
+        """
+        tc, fa = models.TestCase, models.FailureAnalysis
+        columns = (
+            tc.id, tc.test_run_id, tc.module_name, tc.module_abi, tc.class_name, tc.method_name, tc.status,
+            tc.error_message, tc.stack_trace, fa.root_cause
+        )
+        details = {}
+        for i in range(0, len(case_ids), chunk_size):
+            query = db.query(*columns).outerjoin(fa, fa.test_case_id == tc.id).filter(tc.id.in_(case_ids[i:i + chunk_size]))
+            for row in query:
+                details[row.id] = row
+        return details
+
+    @staticmethod
+    def calculate_suite_summary(db: Session, suite_runs: List[models.TestRun], include_items: bool = True):
         """
         Calculate merged statistics and items for a specific group of runs (suite).
         Uses the 'Explicit Pass' logic (Option A).
+
+        Columnar: only (case id, run id, identity id, status) are read, into a
+        test x run status matrix; the merge itself is a handful of array
+        operations. Failure details are loaded only for the returned items
+        (none when include_items is False).
         """
         if not suite_runs:
             return {
@@ -103,70 +143,88 @@ class MergeService:
         # Sort by time for historical analysis
         suite_runs.sort(key=lambda x: x.start_time)
         run_ids = [r.id for r in suite_runs]
+        n_runs = len(run_ids)
+        TestIdentityService.ensure_identities(db, run_ids)
 
-        case_history = {}
-        
-        # 1. Initialize case history entries for all failures and explicit passes found in the suite
-        all_result_records = db.query(models.TestCase).filter(
-            models.TestCase.test_run_id.in_(run_ids)
-        ).all()
+        # Total Tests for this suite (Executed only - aligned with UI)
+        suite_total_tests = max([(r.passed_tests or 0) + (r.failed_tests or 0) for r in suite_runs])
+
+        # 1. Stored results of the suite: failures (and legacy explicit passes), oldest row first
+        tc = models.TestCase
+        # Plain DBAPI rows (integers and a string): no per-row result processing needed
+        rows = db.connection().execute(
+            select(tc.id, tc.test_run_id, tc.test_identity_id, tc.status).where(tc.test_run_id.in_(run_ids)).order_by(tc.id)
+        ).cursor.fetchall()
+        if not rows:
+            return {"initial": 0, "recovered": 0, "remaining": 0, "items": [], "total_tests": suite_total_tests}
+
+        case_ids, row_run_ids, identity_ids, statuses = zip(*rows)
+        case_ids = np.array(case_ids, dtype=np.int64)
+        # row -> column (run position in time order)
+        run_order = np.argsort(run_ids)
+        run_col = run_order[np.searchsorted(np.array(run_ids)[run_order], np.array(row_run_ids))]
+
+        # Status codes; statuses other than fail / pass are kept for the history as is
+        statuses = np.array(statuses, dtype=object)
+        status_codes = np.select([statuses == "fail", statuses == "pass"], [1, 2], -1).astype(np.int16)
+        codes = {NOT_EXECUTED: 0, "fail": 1, "pass": 2}
+        other = np.flatnonzero(status_codes < 0)
+        status_codes[other] = [codes.setdefault(st, len(codes)) for st in statuses[other]]
+        labels = np.array(list(codes), dtype=object)
+
+        # Tests in order of their first stored row (as the item order of the report)
+        identities, first_row, test_row = np.unique(np.array(identity_ids, dtype=np.int64), return_index=True, return_inverse=True)
+        order = np.argsort(first_row, kind="stable")
+        test_pos = np.empty_like(order)
+        test_pos[order] = np.arange(len(order))
+        test_row = test_pos[test_row]
+        identities = identities[order]
+
+        # 2. Status matrix (test x run): the last row of a cell wins
+        cell = test_row * n_runs + run_col
+        last_in_cell = len(cell) - 1 - np.unique(cell[::-1], return_index=True)[1]
+        matrix = np.zeros((len(identities), n_runs), dtype=np.int16)
+        matrix.flat[cell[last_in_cell]] = status_codes[last_in_cell]
+        fail_case = np.zeros((len(identities), n_runs), dtype=np.int64)
+        fail_case.flat[cell[last_in_cell]] = case_ids[last_in_cell]
+
+        # Passes come from the runs' pass sets and fill cells without a stored result
+        lookup = np.argsort(identities)
+        sorted_identities = identities[lookup]
+        run_index = {run_id: i for i, run_id in enumerate(run_ids)}
+        for run_id, data in db.query(models.RunPassSet.test_run_id, models.RunPassSet.data).filter(
+            models.RunPassSet.test_run_id.in_(run_ids)
+        ):
+            passed = PassSetService.decode_array(data)
+            pos = np.minimum(np.searchsorted(sorted_identities, passed), len(sorted_identities) - 1)
+            tests = lookup[pos[sorted_identities[pos] == passed]]
+            column = matrix[:, run_index[run_id]]
+            column[tests[column[tests] == codes[NOT_EXECUTED]]] = codes["pass"]
+
+        # 3. Merge
+        is_fail = matrix == codes["fail"]
+        has_fail = is_fail.any(axis=1)
+        is_initial_fail = is_fail[:, 0]
+        # Recovered means: Was failing initially AND is now passing (or passed in history)
+        is_recovered = is_initial_fail & (matrix == codes["pass"]).any(axis=1)
+        # Remaining: started failing and never recovered, or failed later (Regression)
+        suite_initial = int(is_initial_fail.sum())
+        suite_recovered = int(is_recovered.sum())
+        suite_remaining = int((has_fail & ~is_recovered).sum())
 
-        for rec in all_result_records:
-            key = (rec.module_name, rec.module_abi, rec.class_name, rec.method_name)
-            
-            if key not in case_history:
-                case_history[key] = {
-                    "status_history": ["not_executed"] * len(suite_runs),
-                    "failures": [None] * len(suite_runs),
-                    "info": rec
-                }
-            
-            # Find the index of the run this record belongs to
-            try:
-                run_idx = run_ids.index(rec.test_run_id)
-                case_history[key]["status_history"][run_idx] = rec.status
-                if rec.status == 'fail':
-                    case_history[key]["failures"][run_idx] = rec
-            except ValueError:
-                continue
-                
-        # Analyze history
-        suite_initial = 0
-        suite_recovered = 0
-        suite_remaining = 0
         suite_items = []
-        
-        for key, data in case_history.items():
-            history = data["status_history"]
-            
-            is_initial_fail = history[0] == 'fail'
-            # Recovered means: Was failing initially AND is now passing (or passed in history)
-            is_recovered = is_initial_fail and ('pass' in history)
-            
-            if is_initial_fail:
-                suite_initial += 1
-            
-            if is_recovered:
-                suite_recovered += 1
-            elif is_initial_fail and not is_recovered:
-                # Started failing and never recovered
-                suite_remaining += 1
-            elif 'fail' in history:
-                # Not initial fail, but failed later (Regression)
-                suite_remaining += 1
-            
-            # Use the last available failure for details (if persistent)
-            # or the first failure (if recovered)
-            last_fail_idx = -1
-            for i in range(len(history)-1, -1, -1):
-                if history[i] == 'fail':
-                    last_fail_idx = i
-                    break
-            
-            representative_failure = data["failures"][last_fail_idx] if last_fail_idx != -1 else data["info"]
+        if include_items:
+            # Only items that have failed at least once; details from the last failure
+            failing = np.flatnonzero(has_fail)
+            last_fail = n_runs - 1 - np.argmax(is_fail[failing, ::-1], axis=1)
+            rep_ids = fail_case[failing, last_fail].tolist()
+            histories = labels[matrix[failing]].tolist()
+            recovered_flags = is_recovered[failing].tolist()
+
+            representatives = MergeService.load_failure_details(db, rep_ids)
 
-            # Only include items that have failed at least once (filter out purely passing items that might exist in DB)
-            if 'fail' in history:
+            for case_id, is_rec, history in zip(rep_ids, recovered_flags, histories):
+                representative_failure = representatives[case_id]
                 suite_items.append({
                     "module_name": representative_failure.module_name,
                     "module_abi": representative_failure.module_abi,
@@ -174,13 +232,10 @@ class MergeService:
                     "test_method": representative_failure.method_name,
                     "initial_run_id": suite_runs[0].id,
                     "final_run_id": suite_runs[-1].id,
-                    "is_recovered": is_recovered,
+                    "is_recovered": is_rec,
                     "status_history": history,
                     "failure_details": representative_failure
                 })
-            
-        # Total Tests for this suite (Executed only - aligned with UI)
-        suite_total_tests = max([(r.passed_tests or 0) + (r.failed_tests or 0) for r in suite_runs]) if suite_runs else 0
 
         return {
             "initial": suite_initial,
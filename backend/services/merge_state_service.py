@@ -0,0 +1,301 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.database.bulk import bulk_insert
+from backend.services.merge_service import MergeService
+from backend.services.pass_set_service import PassSetService
+from backend.services.test_identity_service import TestIdentityService
+
+# History bits per test: a suite group with more runs than this is merged on the fly (calculate_suite_summary)
+MAX_STATE_RUNS = 62
+CHUNK_SIZE = 5000
+
+
+class MergeStateService:
+    """
+    Persisted merge state (merge_states) of each test that failed at least once in a
+    submission's suite group: fail / pass history bitmasks over the group's runs
+    (oldest first, see MergeSuiteState.run_ids) with any other stored statuses,
+    latest status, first failing run, representative failure, first stored row
+    (the report's item order) and the recovered flag.
+
+    A run appended to a group (the usual retry) is applied incrementally: only its
+    own failures and pass set are read. Any other change to a group's runs (a run
+    removed, moved, re-imported or older than the newest run) rebuilds the group.
+    """
+
+    @staticmethod
+    def ordered_runs(runs: List[models.TestRun]) -> List[models.TestRun]:
+        return sorted(runs, key=lambda r: (r.start_time or datetime.min, r.id))
+
+    @staticmethod
+    def sync(db: Session, submission_id: int, changed_run_id: Optional[int] = None):
+        """
+        Bring the merge state of a submission in line with its runs (commits).
+        `changed_run_id`: a run that was just (re-)ingested into this submission.
+        """
+        sub = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
+        if not sub:
+            return
+        runs = db.query(models.TestRun).filter(models.TestRun.submission_id == submission_id).order_by(models.TestRun.id).all()
+        groups = MergeService.group_runs(sub, runs)
+        headers = {
+            h.suite_name: h
+            for h in db.query(models.MergeSuiteState).filter(models.MergeSuiteState.submission_id == submission_id)
+        }
+
+        for suite_name, suite_runs in groups.items():
+            run_ids = [r.id for r in MergeStateService.ordered_runs(suite_runs)]
+            header = headers.pop(suite_name, None)
+            current = json.loads(header.run_ids) if header is not None else None
+            if current == run_ids and changed_run_id not in run_ids:
+                continue
+            if current is not None and current + [changed_run_id] == run_ids and len(run_ids) <= MAX_STATE_RUNS:
+                MergeStateService.apply_run(db, header, changed_run_id)
+            else:
+                MergeStateService.rebuild(db, submission_id, suite_name, run_ids)
+
+        # Groups without runs left
+        for suite_name, header in headers.items():
+            MergeStateService._clear_states(db, submission_id, suite_name)
+            db.delete(header)
+        db.commit()
+
+    @staticmethod
+    def _clear_states(db: Session, submission_id: int, suite_name: str):
+        ms = models.MergeState
+        db.query(ms).filter(ms.submission_id == submission_id, ms.suite_name == suite_name).delete(synchronize_session=False)
+
+    @staticmethod
+    def _run_results(db: Session, run_ids: List[int], identity_ids: Optional[List[int]] = None):
+        """(case id, run id, identity id, status) of stored results, oldest row first."""
+        tc = models.TestCase
+        query = db.query(tc.id, tc.test_run_id, tc.test_identity_id, tc.status).filter(tc.test_run_id.in_(run_ids))
+        if identity_ids is None:
+            return query.order_by(tc.id).all()
+        rows = []
+        for i in range(0, len(identity_ids), CHUNK_SIZE):
+            rows.extend(query.filter(tc.test_identity_id.in_(identity_ids[i:i + CHUNK_SIZE])).all())
+        return sorted(rows)
+
+    @staticmethod
+    def _statuses(rows, run_index: Dict[int, int]) -> Tuple[Dict[Tuple[int, int], str], Dict[Tuple[int, int], int]]:
+        """(identity id, run bit) -> status of the last row, and -> failing case id."""
+        statuses, fail_cases = {}, {}
+        for case_id, run_id, identity_id, status in rows:
+            key = (identity_id, run_index[run_id])
+            statuses[key] = status
+            if status == "fail":
+                fail_cases[key] = case_id
+        return statuses, fail_cases
+
+    @staticmethod
+    def _first_cases(rows) -> Dict[int, int]:
+        """identity id -> case id of its first stored row."""
+        first = {}
+        for case_id, _, identity_id, _ in rows:
+            if case_id < first.get(identity_id, case_id + 1):
+                first[identity_id] = case_id
+        return first
+
+    @staticmethod
+    def _add_passes(db: Session, statuses: Dict[Tuple[int, int], str], run_ids: List[int], run_index: Dict[int, int], identity_ids: Set[int]):
+        # Passes come from the runs' pass sets (older imports stored explicit pass rows, already in statuses)
+        for run_id, passed_ids in PassSetService.passed_among(db, run_ids, identity_ids).items():
+            bit = run_index[run_id]
+            for identity_id in passed_ids:
+                statuses.setdefault((identity_id, bit), "pass")
+
+    @staticmethod
+    def _decode_others(data: Optional[str]) -> Dict[int, str]:
+        return {int(bit): status for bit, status in json.loads(data).items()} if data else {}
+
+    @staticmethod
+    def _finish(state: Dict[str, Any], run_ids: List[int], others: Dict[int, str]):
+        """Derive latest status, first failing run and recovered flag from the masks; store the other statuses."""
+        fail_mask, pass_mask = state["fail_mask"], state["pass_mask"]
+        last = len(run_ids) - 1
+        state["latest_status"] = (
+            "fail" if fail_mask >> last & 1 else "pass" if pass_mask >> last & 1 else others.get(last, "not_executed")
+        )
+        state["first_fail_run_id"] = run_ids[(fail_mask & -fail_mask).bit_length() - 1]
+        state["recovered"] = bool(fail_mask & 1) and pass_mask != 0
+        state["other_statuses"] = json.dumps({str(bit): others[bit] for bit in sorted(others)}) if others else None
+
+    @staticmethod
+    def _history(state, n_runs: int) -> List[str]:
+        others = MergeStateService._decode_others(state.other_statuses)
+        return [
+            "fail" if state.fail_mask >> i & 1 else "pass" if state.pass_mask >> i & 1 else others.get(i, "not_executed")
+            for i in range(n_runs)
+        ]
+
+    @staticmethod
+    def rebuild(db: Session, submission_id: int, suite_name: str, run_ids: List[int]):
+        MergeStateService._clear_states(db, submission_id, suite_name)
+        header = db.get(models.MergeSuiteState, (submission_id, suite_name))
+        if len(run_ids) > MAX_STATE_RUNS:
+            if header is not None:
+                db.delete(header)
+            return
+        TestIdentityService.ensure_identities(db, run_ids)
+        run_index = {run_id: i for i, run_id in enumerate(run_ids)}
+        rows = MergeStateService._run_results(db, run_ids)
+        statuses, fail_cases = MergeStateService._statuses(rows, run_index)
+        first_cases = MergeStateService._first_cases(rows)
+        failing = {identity_id for (identity_id, _), status in statuses.items() if status == "fail"}
+        MergeStateService._add_passes(db, statuses, run_ids, run_index, failing)
+
+        states: Dict[int, Dict[str, Any]] = {}
+        others: Dict[int, Dict[int, str]] = {}
+        for (identity_id, bit), status in statuses.items():
+            if identity_id not in failing:
+                continue
+            state = states.get(identity_id)
+            if state is None:
+                state = states[identity_id] = {
+                    "submission_id": submission_id, "suite_name": suite_name, "test_identity_id": identity_id,
+                    "fail_mask": 0, "pass_mask": 0, "last_fail_case_id": None, "first_case_id": first_cases[identity_id]
+                }
+                others[identity_id] = {}
+            if status in ("fail", "pass"):
+                state["fail_mask" if status == "fail" else "pass_mask"] |= 1 << bit
+            else:
+                others[identity_id][bit] = status
+        for identity_id, state in states.items():
+            state["last_fail_case_id"] = fail_cases[(identity_id, state["fail_mask"].bit_length() - 1)]
+            MergeStateService._finish(state, run_ids, others[identity_id])
+
+        bulk_insert(db, models.MergeState.__table__, list(states.values()))
+        if header is None:
+            header = models.MergeSuiteState(submission_id=submission_id, suite_name=suite_name)
+            db.add(header)
+        header.run_ids = json.dumps(run_ids)
+        header.updated_at = datetime.utcnow()
+        db.flush()
+
+    @staticmethod
+    def apply_run(db: Session, header: models.MergeSuiteState, run_id: int):
+        """Append a run (newest of its group) to the group's history."""
+        run_ids = json.loads(header.run_ids) + [run_id]
+        bit = len(run_ids) - 1
+        TestIdentityService.ensure_identities(db, [run_id])
+        rows = MergeStateService._run_results(db, [run_id])
+        statuses, fail_cases = MergeStateService._statuses(rows, {run_id: bit})
+
+        ms = models.MergeState
+        existing = {
+            row.test_identity_id: row
+            for row in db.query(ms).filter(ms.submission_id == header.submission_id, ms.suite_name == header.suite_name)
+        }
+        new_ids = sorted({identity_id for (identity_id, _), status in statuses.items() if status == "fail"} - existing.keys())
+        MergeStateService._add_passes(db, statuses, [run_id], {run_id: bit}, set(existing) | set(new_ids))
+
+        # First failure of these tests: their history in the earlier runs holds no failures
+        earlier = run_ids[:-1]
+        earlier_index = {r: i for i, r in enumerate(earlier)}
+        history_rows = MergeStateService._run_results(db, earlier, new_ids)
+        history, _ = MergeStateService._statuses(history_rows, earlier_index)
+        MergeStateService._add_passes(db, history, earlier, earlier_index, set(new_ids))
+        first_cases = MergeStateService._first_cases(history_rows + rows)
+
+        inserts = []
+        for identity_id in new_ids:
+            state = {
+                "submission_id": header.submission_id, "suite_name": header.suite_name, "test_identity_id": identity_id,
+                "fail_mask": 1 << bit, "pass_mask": 0, "last_fail_case_id": fail_cases[(identity_id, bit)],
+                "first_case_id": first_cases[identity_id]
+            }
+            others = {}
+            for i in range(len(earlier)):
+                status = history.get((identity_id, i))
+                if status == "pass":
+                    state["pass_mask"] |= 1 << i
+                elif status is not None:
+                    others[i] = status
+            MergeStateService._finish(state, run_ids, others)
+            inserts.append(state)
+
+        updates = []
+        for identity_id, row in existing.items():
+            state = {
+                "submission_id": row.submission_id, "suite_name": row.suite_name, "test_identity_id": identity_id,
+                "fail_mask": row.fail_mask, "pass_mask": row.pass_mask, "last_fail_case_id": row.last_fail_case_id,
+                "first_case_id": min(row.first_case_id, first_cases.get(identity_id, row.first_case_id))
+            }
+            others = MergeStateService._decode_others(row.other_statuses)
+            status = statuses.get((identity_id, bit))
+            if status == "fail":
+                state["fail_mask"] |= 1 << bit
+                state["last_fail_case_id"] = fail_cases[(identity_id, bit)]
+            elif status == "pass":
+                state["pass_mask"] |= 1 << bit
+            elif status is not None:
+                others[bit] = status
+            MergeStateService._finish(state, run_ids, others)
+            updates.append(state)
+
+        bulk_insert(db, ms.__table__, inserts)
+        db.bulk_update_mappings(ms, updates)
+        header.run_ids = json.dumps(run_ids)
+        header.updated_at = datetime.utcnow()
+        db.flush()
+
+    @staticmethod
+    def suite_report(db: Session, sub: models.Submission, suite_name: str, suite_runs: List[models.TestRun]) -> Dict[str, Any]:
+        """Same result as MergeService.calculate_suite_summary, read from the merge state."""
+        suite_runs = MergeStateService.ordered_runs(suite_runs)
+        run_ids = [r.id for r in suite_runs]
+        if len(run_ids) > MAX_STATE_RUNS:
+            return MergeService.calculate_suite_summary(db, suite_runs)
+
+        header = db.query(models.MergeSuiteState).filter(
+            models.MergeSuiteState.submission_id == sub.id, models.MergeSuiteState.suite_name == suite_name
+        ).first()
+        if header is None or json.loads(header.run_ids) != run_ids:
+            # Missed event (or state from before this table existed): rebuild this group
+            MergeStateService.rebuild(db, sub.id, suite_name, run_ids)
+            db.commit()
+
+        ms = models.MergeState
+        # Items in order of each test's first stored row, as calculate_suite_summary lists them
+        states = db.query(ms).filter(ms.submission_id == sub.id, ms.suite_name == suite_name).order_by(
+            ms.first_case_id, ms.test_identity_id
+        ).all()
+
+        representatives = MergeService.load_failure_details(db, [s.last_fail_case_id for s in states])
+
+        suite_initial = suite_recovered = suite_remaining = 0
+        suite_items = []
+        for state in states:
+            is_initial_fail = bool(state.fail_mask & 1)
+            suite_initial += is_initial_fail
+            if state.recovered:
+                suite_recovered += 1
+            else:
+                suite_remaining += 1
+
+            history = MergeStateService._history(state, len(run_ids))
+            representative_failure = representatives[state.last_fail_case_id]
+            suite_items.append({
+                "module_name": representative_failure.module_name,
+                "module_abi": representative_failure.module_abi,
+                "test_class": representative_failure.class_name,
+                "test_method": representative_failure.method_name,
+                "initial_run_id": run_ids[0],
+                "final_run_id": run_ids[-1],
+                "is_recovered": state.recovered,
+                "status_history": history,
+                "failure_details": representative_failure
+            })
+
+        return {
+            "initial": suite_initial,
+            "recovered": suite_recovered,
+            "remaining": suite_remaining,
+            "items": suite_items,
+            # Total Tests for this suite (Executed only - aligned with UI)
+            "total_tests": max((r.passed_tests or 0) + (r.failed_tests or 0) for r in suite_runs) if suite_runs else 0
+        }
@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.database import models
+
+
+class ModuleStatsService:
+    """
+    Per-module results of a run, read from the test_run_modules rows written at ingest.
+
+    Module views and run-to-run module diffs only touch one row per module,
+    never test_cases. Runs ingested before the counts existed have NULL counts
+    and report their modules with status "unknown".
+    """
+
+    @staticmethod
+    def module_status(module: models.TestRunModule) -> str:
+        if module.failed_tests is None:
+            return "unknown"
+        if module.failed_tests > 0:
+            return "fail"
+        if module.done is False:
+            return "incomplete"
+        return "pass"
+
+    @staticmethod
+    def to_dict(module: models.TestRunModule) -> Dict[str, Any]:
+        return {
+            "module_name": module.module_name,
+            "module_abi": module.module_abi,
+            "passed_tests": module.passed_tests,
+            "failed_tests": module.failed_tests,
+            "ignored_tests": module.ignored_tests,
+            "done": module.done,
+            "runtime_ms": module.runtime_ms,
+            "status": ModuleStatsService.module_status(module)
+        }
+
+    @staticmethod
+    def get_modules(db: Session, test_run_id: int, failed_only: bool = False) -> List[models.TestRunModule]:
+        query = db.query(models.TestRunModule).filter(models.TestRunModule.test_run_id == test_run_id)
+        if failed_only:
+            query = query.filter(models.TestRunModule.failed_tests > 0)
+        return query.order_by(models.TestRunModule.module_name, models.TestRunModule.module_abi).all()
+
+    @staticmethod
+    def diff(db: Session, base_run_id: int, test_run_id: int, changed_only: bool = True) -> Dict[str, Any]:
+        """
+        Compare the modules of two runs by (module_name, module_abi).
+
+        change is one of: added, removed, newly_failing, fixed, still_failing, unchanged
+        (unknown when either side has no counts).
+        """
+        base = {(m.module_name, m.module_abi): m for m in ModuleStatsService.get_modules(db, base_run_id)}
+        current = {(m.module_name, m.module_abi): m for m in ModuleStatsService.get_modules(db, test_run_id)}
+
+        modules = []
+        summary: Dict[str, int] = {}
+        for key in sorted(base.keys() | current.keys(), key=lambda k: (k[0] or "", k[1] or "")):
+            before: Optional[models.TestRunModule] = base.get(key)
+            after: Optional[models.TestRunModule] = current.get(key)
+            if before is None:
+                change = "added"
+            elif after is None:
+                change = "removed"
+            else:
+                was, now = ModuleStatsService.module_status(before), ModuleStatsService.module_status(after)
+                if "unknown" in (was, now):
+                    change = "unknown"
+                elif now == "fail":
+                    change = "still_failing" if was == "fail" else "newly_failing"
+                elif was == "fail":
+                    change = "fixed"
+                else:
+                    change = "unchanged"
+            summary[change] = summary.get(change, 0) + 1
+            if changed_only and change == "unchanged":
+                continue
+
+            modules.append({
+                "module_name": key[0],
+                "module_abi": key[1],
+                "change": change,
+                "base": ModuleStatsService.to_dict(before) if before is not None else None,
+                "current": ModuleStatsService.to_dict(after) if after is not None else None,
+                "failed_delta": (after.failed_tests or 0) - (before.failed_tests or 0) if before is not None and after is not None else None
+            })
+
+        return {"base_run_id": base_run_id, "test_run_id": test_run_id, "summary": summary, "modules": modules}
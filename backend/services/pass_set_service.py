@@ -0,0 +1,63 @@
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, List, Set
+import numpy as np
+from sqlalchemy.orm import Session
+from backend.database import models
+
+
+class PassSetService:
+    """
+    Per-run sets of passed tests, stored as test identity ids.
+
+    Identities of a suite are interned in parse order, so the sorted ids of a run
+    are mostly consecutive: deltas are small and repetitive, and zlib shrinks a
+    full CTS run (millions of passes) to a few KB.
+    """
+
+    @staticmethod
+    def encode(identity_ids: Iterable[int]) -> bytes:
+        ids = sorted(set(identity_ids))
+        deltas = array("I", (b - a for a, b in zip([0] + ids, ids)))
+        if sys.byteorder == "big":
+            deltas.byteswap()
+        return zlib.compress(deltas.tobytes(), 6)
+
+    @staticmethod
+    def decode(data: bytes) -> Iterable[int]:
+        """Sorted identity ids (lazy: iterate, or intersect with a small set)."""
+        deltas = array("I")
+        deltas.frombytes(zlib.decompress(data))
+        if sys.byteorder == "big":
+            deltas.byteswap()
+        return accumulate(deltas)
+
+    @staticmethod
+    def decode_array(data: bytes) -> np.ndarray:
+        """Sorted identity ids as an int64 array (for vectorized lookups)."""
+        deltas = np.frombuffer(zlib.decompress(data), dtype="<u4")
+        return np.cumsum(deltas, dtype=np.int64)
+
+    @staticmethod
+    def store(db: Session, test_run_id: int, identity_ids: Iterable[int]):
+        """Create or replace the pass set of a run (caller commits)."""
+        ids = sorted(set(identity_ids))
+        db.query(models.RunPassSet).filter(models.RunPassSet.test_run_id == test_run_id).delete(synchronize_session=False)
+        db.execute(models.RunPassSet.__table__.insert(), {
+            "test_run_id": test_run_id,
+            "test_count": len(ids),
+            "data": PassSetService.encode(ids)
+        })
+
+    @staticmethod
+    def passed_among(db: Session, run_ids: List[int], identity_ids: Set[int]) -> Dict[int, Set[int]]:
+        """
+        run id -> the subset of `identity_ids` that passed in that run.
+        Runs without a stored pass set (older imports) are left out.
+        """
+        rows = db.query(models.RunPassSet.test_run_id, models.RunPassSet.data).filter(
+            models.RunPassSet.test_run_id.in_(run_ids)
+        )
+        return {run_id: identity_ids.intersection(PassSetService.decode(data)) for run_id, data in rows}
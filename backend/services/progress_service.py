@@ -0,0 +1,75 @@
+"""
+In-process pub/sub for ingestion and analysis progress.
+
+Publishers (the ingestion writer, the analysis task) run in worker threads and
+call ProgressBroker.publish(run_id, phase, ...). Subscribers are SSE handlers
+on the API's event loop; each gets an asyncio.Queue fed thread-safely. The
+latest event per run is kept so a late subscriber starts from the current
+state, and so a worker can persist it on the job row (Job.progress) for API
+processes that do not run the job themselves.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_lock = threading.Lock()
+_subscribers: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+_latest: Dict[int, Dict[str, Any]] = {}
+
+
+class ProgressBroker:
+    @staticmethod
+    def publish(run_id: int, phase: str, stage: str, **fields):
+        """Publish a progress event for a run. `phase` is "ingest" or "analysis"."""
+        event = {"run_id": run_id, "phase": phase, "stage": stage, "ts": time.time(), **fields}
+        with _lock:
+            if stage in ("completed", "failed"):
+                _latest.pop(run_id, None)
+            else:
+                _latest[run_id] = event
+            subscribers = list(_subscribers.get(run_id, ()))
+        for loop, events in subscribers:
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, event)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    @staticmethod
+    def latest(run_id: int) -> Optional[Dict[str, Any]]:
+        with _lock:
+            return _latest.get(run_id)
+
+    @staticmethod
+    def subscribe(run_id: int) -> asyncio.Queue:
+        """Register a subscriber; must be called from the subscriber's event loop."""
+        events: asyncio.Queue = asyncio.Queue()
+        with _lock:
+            _subscribers.setdefault(run_id, []).append((asyncio.get_running_loop(), events))
+        return events
+
+    @staticmethod
+    def unsubscribe(run_id: int, events: asyncio.Queue):
+        with _lock:
+            remaining = [s for s in _subscribers.get(run_id, ()) if s[1] is not events]
+            if remaining:
+                _subscribers[run_id] = remaining
+            else:
+                _subscribers.pop(run_id, None)
+
+
+class ProgressThrottle:
+    """Rate-limit progress publishing from hot loops (forced events always go out)."""
+
+    def __init__(self, run_id: int, phase: str, interval: float = 0.5):
+        self.run_id = run_id
+        self.phase = phase
+        self.interval = interval
+        self._last = 0.0
+
+    def publish(self, stage: str, force: bool = False, **fields):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        ProgressBroker.publish(self.run_id, self.phase, stage, **fields)
@@ -27,6 +27,40 @@ class SubmissionService:
         if not fingerprint or fingerprint == "Pending..." or fingerprint == "Unknown":
             return None
 
+        submission = SubmissionService.find_submission(db, fingerprint, suite_name, suite_plan)
+
+        if not submission:
+            # Create new submission with Optimized Naming Convention
+            sub_name, brand, device_label = SubmissionService.build_submission_name(
+                fingerprint, build_brand, build_model, build_product, build_device
+            )
+
+            submission = models.Submission(
+                name=sub_name,
+                target_fingerprint=fingerprint,
+                status="analyzing",
+                gms_version=android_version,
+                product=build_product,
+                brand=brand,
+                device=device_label
+            )
+            db.add(submission)
+            db.flush()
+            print(f"Created new Submission ID: {submission.id} with name: {sub_name}")
+        else:
+            print(f"Matched Submission ID: {submission.id} for fingerprint: {fingerprint}")
+            
+        return submission
+
+    @staticmethod
+    def find_submission(db: Session, fingerprint: str, suite_name: str, suite_plan: str):
+        """
+        Find the existing submission a run would be grouped into (read-only).
+        Returns None when get_or_create_submission would create a new one.
+        """
+        if not fingerprint or fingerprint == "Pending..." or fingerprint == "Unknown":
+            return None
+
         # 1. Try Exact Fingerprint Match
         submission = db.query(models.Submission).filter(
             models.Submission.target_fingerprint == fingerprint
@@ -38,14 +72,12 @@ class SubmissionService:
             (suite_name == "VTS" and suite_plan and "vts" in suite_plan.lower())
         )
 
-        match_suffix = "" # For naming if needed
         if not submission and is_system_replace:
             fp_pattern = re.compile(r"^([^:]+):([^/]+)/([^/]+)(/.+)$")
             match = fp_pattern.match(fingerprint)
             if match:
                 prefix = match.group(1)
                 suffix = match.group(4)
-                match_suffix = suffix
                 
                 candidates = db.query(models.Submission).filter(
                      models.Submission.target_fingerprint.like(f"{prefix}:%")
@@ -62,59 +94,65 @@ class SubmissionService:
                             print(f"Grouped System-Replace Run ({suite_name}) to Submission {submission.id}")
                             break
 
-        if not submission:
-            # Create new submission with Optimized Naming Convention
-            # Formula: [Brand] [Model] ([Device]) · [Suffix]
-            
-            # --- Robust Metadata Extraction from Fingerprint ---
-            extracted_brand = build_brand
-            extracted_model = build_model or build_product
-            extracted_device = build_device
-            extracted_suffix = "Unknown"
+        return submission
 
-            fp_pattern = re.compile(r"^([^:]+):([^/]+)/([^/]+)(/.+)$")
-            m = fp_pattern.match(fingerprint)
-            if m:
-                # Part 1: Segment prefix (Brand/Product/Device)
-                prefix_parts = m.group(1).split('/')
-                if len(prefix_parts) >= 3:
-                    if not extracted_brand or extracted_brand == "Unknown":
-                        extracted_brand = prefix_parts[0]
-                    if not extracted_model or extracted_model == "Unknown":
-                        extracted_model = prefix_parts[1]
-                    if not extracted_device or extracted_device == "Unknown":
-                        extracted_device = prefix_parts[2]
-                elif len(prefix_parts) == 1:
-                    # Generic or GSI (e.g., "generic")
-                    if not extracted_device or extracted_device == "Unknown":
-                        extracted_device = prefix_parts[0]
+    @staticmethod
+    def build_submission_name(
+        fingerprint: str,
+        build_brand: str = None,
+        build_model: str = None,
+        build_product: str = None,
+        build_device: str = None
+    ):
+        """
+        Name for a new submission: [Brand] [Model] ([Device]) · [Suffix]
+        Returns (name, brand, device_label).
+        """
+        # --- Robust Metadata Extraction from Fingerprint ---
+        extracted_brand = build_brand
+        extracted_model = build_model or build_product
+        extracted_device = build_device
+        extracted_suffix = "Unknown"
 
-                # Part 2: Extract clean suffix indicator
-                raw_suffix = m.group(4).lstrip('/')
-                extracted_suffix = raw_suffix.split('_')[0].split(':')[0]
-            
-            # Final Fallbacks
-            brand_label = extracted_brand if extracted_brand and extracted_brand != "Unknown" else ""
-            model_label = extracted_model if extracted_model and extracted_model != "Unknown" else "Device"
-            device_label = extracted_device if extracted_device and extracted_device != "Unknown" else "Unknown"
-            
-            # Build name: [Brand] [Model] ([Device]) · [Suffix]
-            # Use strip() to handle missing brand space
-            sub_name = f"{brand_label} {model_label} ({device_label}) · {extracted_suffix}".strip()
-            
-            submission = models.Submission(
-                name=sub_name,
-                target_fingerprint=fingerprint,
-                status="analyzing",
-                gms_version=android_version,
-                product=build_product,
-                brand=extracted_brand,
-                device=device_label
-            )
-            db.add(submission)
-            db.flush()
-            print(f"Created new Submission ID: {submission.id} with name: {sub_name}")
-        else:
-            print(f"Matched Submission ID: {submission.id} for fingerprint: {fingerprint}")
-            
-        return submission
+        fp_pattern = re.compile(r"^([^:]+):([^/]+)/([^/]+)(/.+)$")
+        m = fp_pattern.match(fingerprint)
+        if m:
+            # Part 1: Segment prefix (Brand/Product/Device)
+            prefix_parts = m.group(1).split('/')
+            if len(prefix_parts) >= 3:
+                if not extracted_brand or extracted_brand == "Unknown":
+                    extracted_brand = prefix_parts[0]
+                if not extracted_model or extracted_model == "Unknown":
+                    extracted_model = prefix_parts[1]
+                if not extracted_device or extracted_device == "Unknown":
+                    extracted_device = prefix_parts[2]
+            elif len(prefix_parts) == 1:
+                # Generic or GSI (e.g., "generic")
+                if not extracted_device or extracted_device == "Unknown":
+                    extracted_device = prefix_parts[0]
+
+            # Part 2: Extract clean suffix indicator
+            raw_suffix = m.group(4).lstrip('/')
+            extracted_suffix = raw_suffix.split('_')[0].split(':')[0]
+        
+        # Final Fallbacks
+        brand_label = extracted_brand if extracted_brand and extracted_brand != "Unknown" else ""
+        model_label = extracted_model if extracted_model and extracted_model != "Unknown" else "Device"
+        device_label = extracted_device if extracted_device and extracted_device != "Unknown" else "Unknown"
+        
+        # Use strip() to handle missing brand space
+        sub_name = f"{brand_label} {model_label} ({device_label}) · {extracted_suffix}".strip()
+        return sub_name, extracted_brand, device_label
+
+    @staticmethod
+    def find_duplicate_run(db: Session, fingerprint: str, start_display: str):
+        """
+        Duplicate rule shared by JSON import and upload pre-flight:
+        same device fingerprint AND same start_display.
+        """
+        if not fingerprint or fingerprint == "Unknown" or not start_display:
+            return None
+        return db.query(models.TestRun).filter(
+            models.TestRun.device_fingerprint == fingerprint,
+            models.TestRun.start_display == start_display
+        ).first()
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import asc
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.services.suite_service import SuiteService
+from backend.services.merge_service import MergeService
+from backend.services.merge_state_service import MergeStateService
+
+
+class SuiteSummaryService:
+    """
+    Persisted per-(submission, suite) merge summaries (suite_summaries table).
+
+    Computing a summary reads every failure of the suite's runs, so it is done
+    only when a submission's runs change: a run finishes ingesting (or is
+    re-imported), is moved, or is deleted. Submission pages read the cached rows.
+    The same events keep the submission's merge state (MergeStateService) current.
+    A submission without rows for every configured suite (created before the
+    cache existed, or a suite added since) is computed once on first read.
+    """
+
+    @staticmethod
+    def to_dict(row: models.SuiteSummary) -> Dict[str, Any]:
+        run_ids = json.loads(row.run_ids or "[]")
+        if not run_ids:
+            return {"status": "missing", "failed": 0, "passed": 0}
+        return {
+            "status": "fail" if row.remaining > 0 else "pass",
+            "failed": row.remaining,
+            "passed": row.total_tests - row.remaining,
+            "initial_failed": row.initial_failed,
+            "recovered": row.recovered,
+            "run_count": len(run_ids),
+            "is_merged": len(run_ids) > 1,
+            "latest_run_id": run_ids[-1],
+            "run_ids": run_ids
+        }
+
+    @staticmethod
+    def refresh(db: Session, submission_id: int, suites_config: Optional[List[models.TestSuiteConfig]] = None):
+        """Recompute and store the summaries of every configured suite for one submission (commits)."""
+        sub = db.query(models.Submission).filter(models.Submission.id == submission_id).first()
+        if not sub:
+            return
+        if suites_config is None:
+            suites_config = db.query(models.TestSuiteConfig).order_by(asc(models.TestSuiteConfig.sort_order)).all()
+        runs = db.query(models.TestRun).filter(models.TestRun.submission_id == submission_id).order_by(models.TestRun.id).all()
+
+        existing = {
+            row.suite_name: row
+            for row in db.query(models.SuiteSummary).filter(models.SuiteSummary.submission_id == submission_id)
+        }
+        now = datetime.utcnow()
+        for suite_cfg in suites_config:
+            matching_runs = [r for r in runs if SuiteService.match_suite(r, suite_cfg, sub.target_fingerprint)]
+            row = existing.pop(suite_cfg.name, None)
+            if row is None:
+                row = models.SuiteSummary(submission_id=submission_id, suite_name=suite_cfg.name)
+                db.add(row)
+            row.computed_at = now
+            if matching_runs:
+                # Sorts matching_runs by start time (oldest first)
+                summary_data = MergeService.calculate_suite_summary(db, matching_runs, include_items=False)
+                row.run_ids = json.dumps([r.id for r in matching_runs])
+                row.total_tests = summary_data["total_tests"]
+                row.initial_failed = summary_data["initial"]
+                row.recovered = summary_data["recovered"]
+                row.remaining = summary_data["remaining"]
+            else:
+                row.run_ids = "[]"
+                row.total_tests = row.initial_failed = row.recovered = row.remaining = 0
+        for row in existing.values():
+            db.delete(row) # Suite no longer configured
+        db.commit()
+
+    @staticmethod
+    def refresh_submissions(db: Session, submission_ids: Iterable[Optional[int]]):
+        """Refresh after runs were added to, moved between or deleted from these submissions."""
+        for submission_id in sorted({s for s in submission_ids if s is not None}):
+            MergeStateService.sync(db, submission_id)
+            SuiteSummaryService.refresh(db, submission_id)
+
+    @staticmethod
+    def refresh_for_run(db: Session, test_run_id: int):
+        """Refresh the submission a (newly ingested or re-imported) run belongs to."""
+        submission_id = db.query(models.TestRun.submission_id).filter(models.TestRun.id == test_run_id).scalar()
+        if submission_id is None:
+            return
+        # Usually the newest run of its suite: applied to the merge state incrementally
+        MergeStateService.sync(db, submission_id, changed_run_id=test_run_id)
+        SuiteSummaryService.refresh(db, submission_id)
+
+    @staticmethod
+    def get_summaries(
+        db: Session, submission_ids: List[int], suites_config: List[models.TestSuiteConfig]
+    ) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """submission id -> suite name -> summary dict, for the configured suites (in config order)."""
+        def load():
+            cached: Dict[int, Dict[str, models.SuiteSummary]] = {}
+            if submission_ids:
+                for row in db.query(models.SuiteSummary).filter(models.SuiteSummary.submission_id.in_(submission_ids)):
+                    cached.setdefault(row.submission_id, {})[row.suite_name] = row
+            return cached
+
+        cached = load()
+        names = [cfg.name for cfg in suites_config]
+        stale = [s for s in submission_ids if any(name not in cached.get(s, {}) for name in names)]
+        if stale:
+            for submission_id in stale:
+                SuiteSummaryService.refresh(db, submission_id, suites_config)
+            cached = load()
+
+        return {
+            s: {name: SuiteSummaryService.to_dict(cached[s][name]) for name in names if name in cached.get(s, {})}
+            for s in submission_ids
+        }
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.database.interning import content_hash, intern_rows
+
+# (module_name, module_abi, class_name, method_name) with None normalized to ''
+IdentityKey = Tuple[str, str, str, str]
+
+IDENTITY_FIELDS = ("module_name", "module_abi", "class_name", "method_name")
+
+
+class TestIdentityService:
+    @staticmethod
+    def identity_key(module_name: Optional[str], module_abi: Optional[str],
+                     class_name: Optional[str], method_name: Optional[str]) -> IdentityKey:
+        return (module_name or "", module_abi or "", class_name or "", method_name or "")
+
+    @staticmethod
+    def identity_hash(key: IdentityKey) -> str:
+        return content_hash("\x1f".join(key))
+
+    @staticmethod
+    def resolve_ids(db: Session, keys: Iterable[IdentityKey], cache: Optional[Dict[IdentityKey, int]] = None) -> Dict[IdentityKey, int]:
+        """
+        Map identity keys -> test_identities.id, creating identities not seen before.
+        `cache` (key -> id) carries resolved ids across batches of the same ingestion.
+        """
+        cache = cache if cache is not None else {}
+        rows = {}
+        hash_to_key = {}
+        for key in set(keys):
+            if key not in cache:
+                h = TestIdentityService.identity_hash(key)
+                rows[h] = {"hash": h, "module_name": key[0], "module_abi": key[1], "class_name": key[2], "method_name": key[3]}
+                hash_to_key[h] = key
+        if rows:
+            ids = intern_rows(db, models.TestIdentity.__table__, rows, {})
+            for h, key in hash_to_key.items():
+                cache[key] = ids[h]
+        return cache
+
+    @staticmethod
+    def attach_identity_ids(db: Session, records: List[Dict[str, Any]], cache: Optional[Dict[IdentityKey, int]] = None) -> List[Dict[str, Any]]:
+        """Set test_identity_id on test case records (dicts for TestCase.__table__.insert()), in place."""
+        keys = [TestIdentityService.identity_key(*(r.get(f) for f in IDENTITY_FIELDS)) for r in records]
+        ids = TestIdentityService.resolve_ids(db, keys, cache)
+        for r, key in zip(records, keys):
+            r["test_identity_id"] = ids[key]
+        return records
+
+    @staticmethod
+    def ensure_identities(db: Session, run_ids: List[int]) -> int:
+        """
+        Fill test_identity_id for rows of the given runs that were written without one
+        (e.g. created through the ORM). Cheap no-op once every row has an identity.
+        """
+        tc = models.TestCase
+        rows = db.query(tc.id, tc.module_name, tc.module_abi, tc.class_name, tc.method_name).filter(
+            tc.test_run_id.in_(run_ids),
+            tc.test_identity_id.is_(None)
+        ).all()
+        if not rows:
+            return 0
+
+        keys = {row.id: TestIdentityService.identity_key(*row[1:]) for row in rows}
+        ids = TestIdentityService.resolve_ids(db, keys.values())
+        db.bulk_update_mappings(tc, [{"id": case_id, "test_identity_id": ids[key]} for case_id, key in keys.items()])
+        db.commit()
+        return len(rows)
@@ -0,0 +1,64 @@
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import or_, exists
+from sqlalchemy.orm import Session
+from backend.database import models
+from backend.database.interning import content_hash, intern_rows
+
+# Failure record keys -> TestCase foreign key columns
+TEXT_FIELDS = {"stack_trace": "stack_trace_id", "error_message": "error_message_id"}
+
+
+class TextBlobService:
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return content_hash(text)
+
+    @staticmethod
+    def resolve_ids(db: Session, texts: Iterable[Optional[str]], cache: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Map content hash -> text_blobs.id for the given texts, inserting the ones not stored yet.
+        `cache` (hash -> id) carries resolved ids across batches of the same ingestion.
+        """
+        rows = {}
+        for t in texts:
+            if t:
+                h = content_hash(t)
+                rows[h] = {"hash": h, "content": t}
+        return intern_rows(db, models.TextBlob.__table__, rows, cache if cache is not None else {})
+
+    @staticmethod
+    def attach_text_ids(db: Session, records: List[Dict[str, Any]], cache: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Replace the stack_trace / error_message text of failure records (dicts for
+        TestCase.__table__.insert()) with their text_blobs ids, in place.
+        """
+        rows = {}
+        record_hashes = []
+        for r in records:
+            hashes = {}
+            for field in TEXT_FIELDS:
+                text = r.pop(field, None)
+                if text:
+                    h = content_hash(text)
+                    rows[h] = {"hash": h, "content": text}
+                    hashes[field] = h
+            record_hashes.append(hashes)
+
+        ids = intern_rows(db, models.TextBlob.__table__, rows, cache if cache is not None else {})
+        for r, hashes in zip(records, record_hashes):
+            for field, id_column in TEXT_FIELDS.items():
+                r[id_column] = ids[hashes[field]] if field in hashes else None
+        return records
+
+    @staticmethod
+    def cleanup_orphan_blobs(db: Session) -> int:
+        """Remove text blobs no longer referenced by any test case (after run / submission deletes)."""
+        tc = models.TestCase
+        referenced = exists().where(
+            or_(tc.stack_trace_id == models.TextBlob.id, tc.error_message_id == models.TextBlob.id)
+        )
+        deleted_count = db.query(models.TextBlob).filter(~referenced).delete(synchronize_session=False)
+        db.commit()
+        if deleted_count:
+            print(f"Cleaned up {deleted_count} orphan text blobs.")
+        return deleted_count
@@ -914,6 +914,18 @@ const getSuiteColor = (name) => {
 // identifyRunSuite and renderSparkline are not provided in the diff, assuming they exist elsewhere or are not affected.
 
 // --- Upload Logic ---
+
+// Parsed worker result -> NDJSON body for POST /api/import/stream (one record per line).
+// Built as Blob parts so no single giant JSON string is needed.
+function toImportStream(result) {
+    const line = (type, record) => JSON.stringify({ type, ...record }) + '\n';
+    const parts = [line('metadata', result.metadata), line('stats', result.stats)];
+    result.modules.forEach(m => parts.push(line('module', m)));
+    result.failures.forEach(f => parts.push(line('failure', f)));
+    result.passes.forEach(p => parts.push(line('pass', p)));
+    return new Blob(parts, { type: 'application/x-ndjson' });
+}
+
 function setupUpload() {
     const input = document.getElementById('file-input');
     const statusDiv = document.getElementById('upload-status');
@@ -953,11 +965,11 @@ function setupUpload() {
                         message.textContent = `Uploading results (${data.result.failures.length} failures)...`;
                         
                         try {
-                            // Upload parsed JSON
-                            const response = await fetch(`${API_BASE}/import`, {
+                            // Upload parsed results as NDJSON records (streamed and batched server-side)
+                            const response = await fetch(`${API_BASE}/import/stream`, {
                                 method: 'POST',
-                                headers: { 'Content-Type': 'application/json' },
-                                body: JSON.stringify(data.result)
+                                headers: { 'Content-Type': 'application/x-ndjson' },
+                                body: toImportStream(data.result)
                             });
                             
                             if (response.ok) {
@@ -1326,9 +1338,11 @@ class="hidden fixed inset-0 bg-black bg-opacity-50 flex items-center justify-cen
             statusBadge.textContent = 'Processing...';
             document.getElementById('detail-suite-name').appendChild(statusBadge);
 
-            // Poll for updates
-            const timeoutId = setTimeout(() => loadRunDetails(runId), 2000);
-            router.cleanup = () => clearTimeout(timeoutId);
+            // Follow ingestion progress, then reload once the ingest job has finished
+            const source = watchRunProgress(runId, (event) => {
+                if (event.phase === 'ingest') statusBadge.textContent = formatRunProgress(event);
+            }, () => loadRunDetails(runId));
+            router.cleanup = () => source.close();
             return; // Don't load other details yet
         } else if (run.status === 'failed') {
             statusBadge.className += ' bg-red-100 text-red-800';
@@ -2672,20 +2686,57 @@ async function showClusterDetail(cluster) {
     }
 }
 
+// Subscribe to a run's ingestion / analysis progress (server-sent events).
+// onDone runs once no job for the run is queued or running; returns the EventSource.
+function watchRunProgress(runId, onProgress, onDone) {
+    const source = new EventSource(`${API_BASE}/jobs/runs/${runId}/events`);
+    source.onmessage = (e) => onProgress(JSON.parse(e.data));
+    source.addEventListener('done', () => {
+        source.close();
+        onDone();
+    });
+    return source;
+}
+
+function formatRunProgress(event) {
+    if (event.phase === 'ingest') {
+        const parts = [];
+        if (event.total_bytes) {
+            parts.push(`${Math.min(100, Math.round(event.bytes_parsed / event.total_bytes * 100))}%`);
+        } else if (event.bytes_parsed) {
+            parts.push(`${(event.bytes_parsed / 1024 / 1024).toFixed(1)} MB`);
+        }
+        parts.push(`${event.modules_done.toLocaleString()} modules`);
+        parts.push(`${event.failures_inserted.toLocaleString()} failures`);
+        return `${event.stage === 'finalizing' ? 'Finalizing' : 'Processing'}... ${parts.join(', ')}`;
+    }
+    if (event.stage === 'analyzing') {
+        return `Analyzing ${event.clusters} clusters (${event.llm_done}/${event.llm_total})...`;
+    }
+    if (event.stage === 'assigning') return `Matching ${event.failures} failures to known clusters...`;
+    if (event.stage === 'clustering') {
+        return event.assigned ? `Clustering ${event.failures} failures (${event.assigned} matched known clusters)...`
+            : `Clustering ${event.failures} failures...`;
+    }
+    if (event.stage === 'saving') return 'Saving results...';
+    return 'Analyzing...';
+}
+
 function pollForAnalysis(runId) {
-    let attempts = 0;
-    const maxAttempts = 150; // 5 minutes max
-    const interval = setInterval(async () => {
-        attempts++;
+    const source = watchRunProgress(runId, (event) => {
+        // The "Analyzing..." label is the text node after the spinner icon
+        const btn = document.getElementById('btn-analyze');
+        const label = btn && btn.lastElementChild ? btn.lastElementChild.nextSibling : null;
+        if (label && event.phase === 'analysis') label.textContent = ` ${formatRunProgress(event)} `;
+    }, async () => {
         try {
-            // Check analysis status first
+            // Check analysis status once the analysis job has finished
             const statusRes = await fetch(`${API_BASE}/analysis/run/${runId}/status`);
             const statusData = await statusRes.json();
             const analysisStatus = statusData.analysis_status || statusData.status;
             console.log(`[pollForAnalysis] status=${analysisStatus}`);
 
             if (analysisStatus === 'completed') {
-                clearInterval(interval);
                 // Fetch final clusters
                 const clustersRes = await fetch(`${API_BASE}/analysis/run/${runId}/clusters`);
                 const clusters = await clustersRes.json();
@@ -2705,7 +2756,6 @@ function pollForAnalysis(runId) {
                 }
                 showNotification(`Analysis complete! Created ${clusters.length} failure cluster${clusters.length !== 1 ? 's' : ''}.`, 'success');
             } else if (analysisStatus === 'failed') {
-                clearInterval(interval);
                 const btn = document.getElementById('btn-analyze');
                 if (btn) {
                     btn.innerHTML = `
@@ -2718,27 +2768,26 @@ function pollForAnalysis(runId) {
                     btn.classList.add('bg-red-600', 'text-white');
                 }
                 showNotification('Analysis failed. Please check logs.', 'error');
-            } else if (attempts >= maxAttempts) {
-                clearInterval(interval);
+            } else {
                 const btn = document.getElementById('btn-analyze');
                 if (btn) {
                     btn.innerHTML = `
                         <svg class="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                             <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 8v4l3 3m6-3a9 9 0 11-18 0 9 9 0 0118 0z"></path>
                         </svg>
-                        Analysis Timeout
+                        Analysis Stopped
                     `;
                     btn.disabled = false;
                     btn.classList.remove('bg-slate-400', 'cursor-not-allowed');
                     btn.classList.add('bg-orange-500', 'text-white');
                 }
-                showNotification('Analysis timed out.', 'error');
+                showNotification('Analysis stopped before completing.', 'error');
             }
         } catch (e) {
-            console.error("Polling error", e);
+            console.error("Analysis status error", e);
         }
-    }, 2000);
-    router.cleanup = () => clearInterval(interval);
+    });
+    router.cleanup = () => source.close();
 }
 
 // --- Settings Logic ---
@@ -166,6 +166,7 @@ async function parseXMLFile(file) {
         ignored_tests: 0,
         module_abi_pairs: new Set(),         // "module_name:abi" for unique counting
         failed_module_abi_pairs: new Set(),
+        module_results: new Map(),           // "module_name:abi" -> per-module counts, done, runtime
         xml_modules_done: 0,                  // From XML <Summary modules_done>
         xml_modules_total: 0                  // From XML <Summary modules_total>
     };
@@ -218,6 +219,17 @@ async function parseXMLFile(file) {
                 currentModuleAbi = tag.attributes.abi || 'Unknown';
                 // Use module:abi as unique key to properly count ABI variants
                 stats.module_abi_pairs.add(`${currentModule}:${currentModuleAbi}`);
+                if (!stats.module_results.has(`${currentModule}:${currentModuleAbi}`)) {
+                    stats.module_results.set(`${currentModule}:${currentModuleAbi}`, {
+                        module_name: currentModule,
+                        module_abi: currentModuleAbi,
+                        passed_tests: 0,
+                        failed_tests: 0,
+                        ignored_tests: 0,
+                        done: tag.attributes.done !== undefined ? tag.attributes.done === 'true' : null,
+                        runtime_ms: tag.attributes.runtime ? parseInt(tag.attributes.runtime, 10) : null
+                    });
+                }
                 break;
 
             case 'TestCase':
@@ -236,13 +248,17 @@ async function parseXMLFile(file) {
                 };
                 
                 stats.total_tests++;
+                const moduleResult = stats.module_results.get(`${currentModule}:${currentModuleAbi}`);
                 if (currentTest.status === 'pass') {
                     stats.passed_tests++;
+                    if (moduleResult) moduleResult.passed_tests++;
                 } else if (currentTest.status === 'fail') {
                     stats.failed_tests++;
                     stats.failed_module_abi_pairs.add(`${currentModule}:${currentModuleAbi}`);
+                    if (moduleResult) moduleResult.failed_tests++;
                 } else {
                     stats.ignored_tests++;
+                    if (moduleResult) moduleResult.ignored_tests++;
                 }
                 break;
 
@@ -360,15 +376,8 @@ async function parseXMLFile(file) {
 
     parser.end();
 
-    // Convert module Set to Array for backend
-    const modulesList = Array.from(stats.module_abi_pairs).map(pair => {
-        const parts = pair.split(':');
-        // Handle case where abi might be empty or missing
-        // pair format is "name:abi"
-        const name = parts[0];
-        const abi = parts.slice(1).join(':') || null; 
-        return { module_name: name, module_abi: abi };
-    });
+    // Convert module Map to Array for backend (with per-module results)
+    const modulesList = Array.from(stats.module_results.values());
 
     // Build final result
     const result = {
@@ -0,0 +1,216 @@
+"""
+Job worker: runs queued ingestion, analysis, deletion and featurizer jobs outside the API process.
+
+Usage:
+    python -m backend.worker
+    WORKER_CONCURRENCY="ingest=2,analysis=1,delete=1,featurizer=1" python -m backend.worker
+
+Each job type gets its own number of slots (threads polling the queue). Several
+worker processes, on one host or many sharing the database, can run side by
+side: JobQueue leases make sure a job runs in one place at a time, and a job
+whose worker dies is picked up again once its lease expires.
+
+With EMBEDDED_WORKER=1 (the default) the API process also runs a Worker, so a
+single `uvicorn backend.main:app` keeps working without a separate worker.
+"""
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from typing import Callable, Dict
+
+from backend.database.database import SessionLocal, retry_on_locked
+from backend.database import models
+from backend.services.job_queue import JobQueue
+from backend.services.progress_service import ProgressBroker
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1.0"))
+WORKER_CONCURRENCY = os.getenv("WORKER_CONCURRENCY", "ingest=1,analysis=1,delete=1,featurizer=1")
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "1") == "1"
+# How often a running job's latest progress event is written to its row (for API processes elsewhere)
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "2.0"))
+
+
+def _ingest(file_path: str, test_run_id: int, member: str = None, size: int = None, cancelled: threading.Event = None):
+    from backend.routers.upload import process_upload_background
+    process_upload_background(file_path, test_run_id, member, size, cancelled=cancelled)
+
+
+def _analysis(run_id: int, cancelled: threading.Event = None):
+    from backend.services.analysis_service import AnalysisService
+    db = SessionLocal()
+    try:
+        AnalysisService.run_analysis_task(run_id, db, cancelled=cancelled)
+        run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
+        if run and run.analysis_status == "failed":
+            # The service records the failure on the run; raise so the job is marked failed
+            # (analysis jobs get one attempt: a retry would repeat every LLM call)
+            raise RuntimeError(f"Analysis of run {run_id} failed")
+    finally:
+        db.close()
+
+
+def _delete(run_ids=None, submission_id: int = None, cancelled: threading.Event = None):
+    # Deletion goes in idempotent chunks: a worker taking the job over just carries on
+    from backend.services.deletion_service import DeletionService
+    db = SessionLocal()
+    try:
+        DeletionService.run_job(db, run_ids=run_ids, submission_id=submission_id)
+    finally:
+        db.close()
+
+
+def _featurizer(cancelled: threading.Event = None):
+    from backend.services.featurizer_service import FeaturizerService
+    db = SessionLocal()
+    try:
+        FeaturizerService.fit(db)
+    finally:
+        db.close()
+
+
+# job_type -> handler(cancelled=<Event>, **payload); handlers raise to have the job retried.
+# `cancelled` is set once the worker lost the job's lease: handlers stop early (JobCancelled)
+# where they can, and their outcome is never recorded.
+JOB_HANDLERS: Dict[str, Callable] = {
+    "ingest": _ingest,
+    "analysis": _analysis,
+    "delete": _delete,
+    "featurizer": _featurizer,
+}
+
+
+def parse_concurrency(spec: str) -> Dict[str, int]:
+    """Parse "ingest=2,analysis=1" into {"ingest": 2, "analysis": 1}."""
+    concurrency = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        job_type, _, count = part.partition("=")
+        job_type = job_type.strip()
+        if job_type not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job type in WORKER_CONCURRENCY: {job_type}")
+        concurrency[job_type] = int(count or 1)
+    return concurrency
+
+
+class Worker:
+    def __init__(
+        self,
+        concurrency: Dict[str, int],
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        poll_seconds: float = WORKER_POLL_SECONDS,
+        session_factory=SessionLocal
+    ):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for job_type, slots in self.concurrency.items():
+            for slot in range(slots):
+                worker_id = f"{prefix}:{job_type}-{slot}"
+                thread = threading.Thread(target=self._slot_loop, args=(job_type, worker_id), name=worker_id, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"Worker started: {self.concurrency} (lease {self.lease_seconds}s)")
+
+    def stop(self, timeout: float = None):
+        """Stop claiming new jobs and wait for running ones (unfinished jobs are reclaimed after their lease)."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _slot_loop(self, job_type: str, worker_id: str):
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                job = JobQueue.claim(db, worker_id, [job_type], self.lease_seconds)
+                if job is not None:
+                    self.run_job(db, job, worker_id)
+            except Exception as e:
+                print(f"[{worker_id}] Queue error: {e}")
+                job = None
+            finally:
+                db.close()
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+
+    def run_job(self, db, job: models.Job, worker_id: str):
+        job_id = job.id
+        print(f"[{worker_id}] Running job {job_id} ({job.job_type}, attempt {job.attempts}/{job.max_attempts})")
+        done = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop, args=(job_id, job.test_run_id, worker_id, done, lost), daemon=True
+        )
+        heartbeat.start()
+        error = None
+        try:
+            JOB_HANDLERS[job.job_type](cancelled=lost, **json.loads(job.payload or "{}"))
+        except Exception as e:
+            if not lost.is_set():
+                traceback.print_exc()
+            error = e
+        done.set()
+        heartbeat.join()
+        if lost.is_set():
+            # Another worker may have taken the job over: its outcome is not ours to record
+            print(f"[{worker_id}] Job {job_id} abandoned after losing its lease")
+            return
+        if error is not None:
+            message = f"{type(error).__name__}: {error}"
+            retry_on_locked(db, lambda: JobQueue.fail(db, job_id, worker_id, message))
+            print(f"[{worker_id}] Job {job_id} failed: {error}")
+            return
+        retry_on_locked(db, lambda: JobQueue.complete(db, job_id, worker_id))
+        print(f"[{worker_id}] Job {job_id} succeeded")
+
+    def _heartbeat_loop(
+        self, job_id: int, test_run_id: int, worker_id: str, done: threading.Event, lost: threading.Event
+    ):
+        db = self.session_factory()
+        beat_interval = self.lease_seconds / 3
+        last_beat = time.monotonic()
+        last_progress = None
+        try:
+            while not done.wait(min(beat_interval, PROGRESS_FLUSH_SECONDS)):
+                progress = ProgressBroker.latest(test_run_id) if test_run_id is not None else None
+                if progress is last_progress and time.monotonic() - last_beat < beat_interval:
+                    continue
+                try:
+                    if not JobQueue.heartbeat(db, job_id, worker_id, self.lease_seconds, progress):
+                        print(f"[{worker_id}] Lost the lease on job {job_id}; cancelling it here.")
+                        lost.set()
+                        return
+                    last_beat, last_progress = time.monotonic(), progress
+                except Exception as e:
+                    # e.g. "database is locked" while the job writes: try again on the next beat
+                    db.rollback()
+                    print(f"[{worker_id}] Heartbeat failed for job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def main():
+    # The schema is owned by the API process (migrate_db + create_all at startup)
+    worker = Worker(parse_concurrency(WORKER_CONCURRENCY))
+    stopped = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopped.set())
+    worker.start()
+    stopped.wait()
+    print("Worker stopping: finishing running jobs...")
+    worker.stop()
+
+
+if __name__ == "__main__":
+    main()
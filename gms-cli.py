@@ -7,14 +7,20 @@ Usage:
     ./gms-cli.py list                    # List all test runs
     ./gms-cli.py count                   # Count total test runs
     ./gms-cli.py details <run_id>        # Get run details
-    ./gms-cli.py upload <xml_file>       # Upload test result
+    ./gms-cli.py preflight <result_file> # Check for duplicates / grouping without uploading
+    ./gms-cli.py upload <result_file>    # Upload test result (.xml/.xml.gz/.zip/.tar.gz), resumable
     ./gms-cli.py analyze <run_id>        # Run AI analysis
     ./gms-cli.py status <run_id>         # Check analysis status
     ./gms-cli.py clusters <run_id>       # View failure clusters
     ./gms-cli.py delete <run_id>         # Delete a test run
 """
 
+import os
 import sys
+import hashlib
+import tarfile
+import time
+import zipfile
 import requests
 import json
 from datetime import datetime
@@ -23,6 +29,16 @@ from pathlib import Path
 # Configuration
 API_BASE = "http://localhost:8000/api"
 
+# Plain result XML, gzipped XML, or zip/tar archives of tradefed result folders
+RESULT_EXTENSIONS = ('.xml', '.xml.gz', '.gz', '.zip', '.tar', '.tar.gz', '.tgz')
+RESULT_XML_NAME = 'test_result.xml'
+
+# Pre-flight sends only the file head: the Result/Build/Summary header fits easily
+PREFLIGHT_HEAD_SIZE = 64 * 1024
+
+# Local record of in-flight chunked uploads, so interrupted uploads can resume
+UPLOAD_STATE_FILE = Path.home() / ".gms-cli" / "uploads.json"
+
 class Colors:
     """ANSI color codes for terminal output"""
     HEADER = '\033[95m'
@@ -155,39 +171,207 @@ def get_run_details(run_id):
         print_error(f"Failed to fetch run details: {e}")
         sys.exit(1)
 
+def _load_upload_state():
+    """Load the map of local files to server-side upload sessions"""
+    try:
+        with open(UPLOAD_STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_upload_state(state):
+    UPLOAD_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(UPLOAD_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _request_with_retry(method, url, retries=5, **kwargs):
+    """Retry transient network failures with exponential backoff"""
+    for attempt in range(retries):
+        try:
+            response = requests.request(method, url, timeout=300, **kwargs)
+            if response.status_code < 500:
+                return response
+        except requests.exceptions.RequestException as e:
+            if attempt == retries - 1:
+                raise
+            print_info(f"Network error ({e}), retrying...")
+        time.sleep(min(2 ** attempt, 30))
+    return response
+
 def upload_file(file_path):
-    """Upload a test result XML file"""
+    """Upload a test result file using the resumable chunked upload protocol"""
     path = Path(file_path)
     
     if not path.exists():
         print_error(f"File not found: {file_path}")
         sys.exit(1)
     
-    if not path.suffix.lower() == '.xml':
-        print_error("File must be an XML file")
+    if not path.name.lower().endswith(RESULT_EXTENSIONS):
+        print_error(f"File must be one of: {', '.join(RESULT_EXTENSIONS)}")
         sys.exit(1)
     
-    print_info(f"Uploading {path.name}...")
+    stat = path.stat()
+    state_key = f"{API_BASE}|{path.resolve()}|{stat.st_size}|{int(stat.st_mtime)}"
+    state = _load_upload_state()
     
     try:
+        # 1. Resume an interrupted session for this exact file, or start a new one
+        session = None
+        upload_id = state.get(state_key)
+        if upload_id:
+            response = _request_with_retry('GET', f"{API_BASE}/upload/sessions/{upload_id}")
+            if response.status_code == 200:
+                session = response.json()
+                print_info(f"Resuming {path.name} at {session['received_bytes']:,}/{session['total_size']:,} bytes")
+        
+        if session is None:
+            print_info(f"Computing checksum for {path.name}...")
+            response = _request_with_retry('POST', f"{API_BASE}/upload/sessions", json={
+                'filename': path.name,
+                'total_size': stat.st_size,
+                'sha256': _file_sha256(path)
+            })
+            response.raise_for_status()
+            session = response.json()
+            state[state_key] = session['upload_id']
+            _save_upload_state(state)
+            print_info(f"Uploading {path.name} ({stat.st_size / 1024 / 1024:.1f} MB)...")
+        
+        upload_id = session['upload_id']
+        offset = session['received_bytes']
+        chunk_size = session['chunk_size']
+        
+        # 2. Send the remaining chunks, each with its own checksum
         with open(path, 'rb') as f:
-            files = {'file': (path.name, f, 'application/xml')}
-            response = requests.post(f"{API_BASE}/upload/", files=files, timeout=300)
+            f.seek(offset)
+            while offset < stat.st_size:
+                chunk = f.read(chunk_size)
+                response = _request_with_retry(
+                    'PUT', f"{API_BASE}/upload/sessions/{upload_id}",
+                    params={'offset': offset},
+                    data=chunk,
+                    headers={'Content-Type': 'application/octet-stream',
+                             'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()}
+                )
+                if response.status_code == 409:
+                    # Server holds a different amount than we assumed; realign
+                    session = _request_with_retry('GET', f"{API_BASE}/upload/sessions/{upload_id}").json()
+                    offset = session['received_bytes']
+                    f.seek(offset)
+                    continue
+                response.raise_for_status()
+                offset = response.json()['received_bytes']
+                f.seek(offset)
+                percent = offset * 100 // stat.st_size
+                print(f"\r  {percent:3d}% ({offset / 1024 / 1024:.1f}/{stat.st_size / 1024 / 1024:.1f} MB)", end='', flush=True)
+        print()
         
+        # 3. Finalize: server verifies the whole-file checksum and starts ingestion
+        response = _request_with_retry('POST', f"{API_BASE}/upload/sessions/{upload_id}/finalize")
         response.raise_for_status()
         result = response.json()
         
+        state.pop(state_key, None)
+        _save_upload_state(state)
+        
         print_success(f"Upload successful!")
-        print(f"Test Run ID: {Colors.BOLD}{result['test_run_id']}{Colors.ENDC}")
+        for run_id in result.get('test_run_ids', [result['test_run_id']]):
+            print(f"Test Run ID: {Colors.BOLD}{run_id}{Colors.ENDC}")
         print(f"Status: {result['status']}")
         print_info(f"View at: http://localhost:8000/?page=run-details&id={result['test_run_id']}")
         
-    except requests.exceptions.Timeout:
-        print_error("Upload timeout - file may be too large")
-        sys.exit(1)
     except requests.exceptions.RequestException as e:
+        print()
         print_error(f"Upload failed: {e}")
+        print_info("Run the same command again to resume where it stopped")
+        sys.exit(1)
+
+def _result_heads(path):
+    """Yield (label, filename, head bytes) for each result XML in a file (archives are read locally)"""
+    name = path.name.lower()
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(path) as zf:
+            for member in _result_members(zf.namelist()):
+                with zf.open(member) as f:
+                    yield member, 'test_result.xml', f.read(PREFLIGHT_HEAD_SIZE)
+    elif name.endswith(('.tar', '.tar.gz', '.tgz')):
+        with tarfile.open(path, 'r:*') as tf:
+            for member in _result_members([m.name for m in tf.getmembers() if m.isfile()]):
+                with tf.extractfile(member) as f:
+                    yield member, 'test_result.xml', f.read(PREFLIGHT_HEAD_SIZE)
+    else:
+        with open(path, 'rb') as f:
+            yield path.name, path.name, f.read(PREFLIGHT_HEAD_SIZE)
+
+def _result_members(names):
+    """Result XMLs of an archive; must match backend.parser.archive._pick_result_members (what the server ingests)"""
+    candidates = [
+        n for n in names
+        if not n.endswith('/') and '__MACOSX/' not in n and not os.path.basename(n).startswith('._')
+    ]
+    results = [n for n in candidates if os.path.basename(n).lower() == RESULT_XML_NAME]
+    if not results:
+        results = [n for n in candidates if n.lower().endswith('.xml')]
+    return sorted(results)
+
+def preflight_file(file_path):
+    """Check a result file against the server using only its header"""
+    path = Path(file_path)
+    
+    if not path.exists():
+        print_error(f"File not found: {file_path}")
+        sys.exit(1)
+    
+    if not path.name.lower().endswith(RESULT_EXTENSIONS):
+        print_error(f"File must be one of: {', '.join(RESULT_EXTENSIONS)}")
+        sys.exit(1)
+    
+    duplicates = 0
+    try:
+        for label, filename, head in _result_heads(path):
+            response = requests.post(
+                f"{API_BASE}/upload/preflight",
+                params={'filename': filename},
+                data=head,
+                headers={'Content-Type': 'application/octet-stream'}
+            )
+            response.raise_for_status()
+            result = response.json()
+            meta = result['metadata']
+            
+            print_header(f"Pre-flight: {label}")
+            print(f"{Colors.BOLD}Suite:{Colors.ENDC} {meta.get('test_suite_name')} ({meta.get('suite_plan')})")
+            print(f"{Colors.BOLD}Fingerprint:{Colors.ENDC} {meta.get('device_fingerprint')}")
+            print(f"{Colors.BOLD}Started:{Colors.ENDC} {meta.get('start_display')}")
+            print(f"{Colors.BOLD}Modules:{Colors.ENDC} {meta.get('modules_done')}/{meta.get('modules_total')}")
+            
+            submission = result.get('submission')
+            if submission and submission['action'] == 'match':
+                print_info(f"Would be grouped into Submission #{submission['id']}: {submission['name']}")
+            elif submission:
+                print_info(f"Would create a new Submission: {submission['name']}")
+            
+            if result['duplicate']:
+                duplicates += 1
+                print_error(f"Duplicate: already uploaded as Run #{result['duplicate_run_id']}")
+            else:
+                print_success("Not uploaded yet")
+    except requests.exceptions.RequestException as e:
+        print_error(f"Pre-flight failed: {e}")
         sys.exit(1)
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        print_error(f"Cannot read {path.name}: {e}")
+        sys.exit(1)
+    
+    if duplicates:
+        sys.exit(2)
 
 def run_analysis(run_id):
     """Start AI analysis for a test run"""
@@ -306,9 +490,14 @@ def main():
             print_error("Usage: gms-cli.py details <run_id>")
             sys.exit(1)
         get_run_details(sys.argv[2])
+    elif command == 'preflight':
+        if len(sys.argv) < 3:
+            print_error("Usage: gms-cli.py preflight <result_file>")
+            sys.exit(1)
+        preflight_file(sys.argv[2])
     elif command == 'upload':
         if len(sys.argv) < 3:
-            print_error("Usage: gms-cli.py upload <xml_file>")
+            print_error("Usage: gms-cli.py upload <result_file>")
             sys.exit(1)
         upload_file(sys.argv[2])
     elif command == 'analyze':
@@ -1,28 +1,45 @@
-import sqlite3
-import os
+"""
+Schema migrations for databases created by older versions (SQLite or PostgreSQL).
 
-DB_FILE = "gms_analysis.db"
+Runs at API startup before Base.metadata.create_all: adds columns that
+create_all cannot add to existing tables and backfills derived data. A fresh
+database has no tables yet and is left to create_all.
+"""
+import hashlib
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from backend.database.database import engine as default_engine
+from backend.database import models
+from backend.database.interning import intern_rows
 
-def migrate():
-    if not os.path.exists(DB_FILE):
-        if os.path.exists(f"data/{DB_FILE}"):
-            db_path = f"data/{DB_FILE}"
+def _add_columns(engine, table, expected, current):
+    for col, dtype in expected.items():
+        if col not in current:
+            print(f"Adding '{col}' to {table}...")
+            try:
+                # One transaction per column: a failed ALTER must not abort the others (PostgreSQL)
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {dtype}"))
+                print(f"Added {col}.")
+            except Exception as e:
+                print(f"Failed to add {col}: {e}")
         else:
-            print(f"Database file {DB_FILE} not found!")
-            return
-    else:
-        db_path = DB_FILE
-
-    print(f"Migrating database at: {db_path}")
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+            print(f"Column '{col}' exists in {table}.")
+
+def migrate(engine=None):
+    engine = engine or default_engine
+    print(f"Migrating database at: {engine.url.render_as_string(hide_password=True)}")
+    tables = set(inspect(engine).get_table_names())
+    if "test_runs" not in tables:
+        print("Fresh database: tables are created by create_all.")
+        return
+
+    def columns(table):
+        return {c["name"] for c in inspect(engine).get_columns(table)} if table in tables else set()
+
     # 1. Check test_runs columns
     print("Checking 'test_runs' table...")
-    cursor.execute("PRAGMA table_info(test_runs)")
-    current_run_columns = {info[1] for info in cursor.fetchall()}
-
-    expected_run_columns = {
+    _add_columns(engine, "test_runs", {
         "build_id": "VARCHAR",
         "build_product": "VARCHAR",
         "build_brand": "VARCHAR",
@@ -41,49 +58,154 @@ def migrate():
         "start_display": "VARCHAR",
         "end_display": "VARCHAR",
         "submission_id": "INTEGER REFERENCES submissions(id)"
-    }
+    }, columns("test_runs"))
 
-    for col, dtype in expected_run_columns.items():
-        if col not in current_run_columns:
-            print(f"Adding '{col}' to test_runs...")
-            try:
-                cursor.execute(f"ALTER TABLE test_runs ADD COLUMN {col} {dtype}")
-                print(f"Added {col}.")
-            except Exception as e:
-                print(f"Failed to add {col}: {e}")
-        else:
-             print(f"Column '{col}' exists in test_runs.")
-    
     # 2. Sync Submissions Table
-    print("Checking 'submissions' table...")
-    cursor.execute("PRAGMA table_info(submissions)")
-    current_columns = {info[1] for info in cursor.fetchall()}
-    
-    expected_columns = {
-        "product": "VARCHAR",
-        "is_locked": "BOOLEAN DEFAULT 0",
-        "analysis_result": "TEXT",
-        "gms_version": "VARCHAR",
-        "lab_name": "VARCHAR",
-        "target_fingerprint": "VARCHAR",
-        "brand": "VARCHAR",
-        "device": "VARCHAR"
-    }
-    
-    for col, dtype in expected_columns.items():
-        if col not in current_columns:
-            print(f"Adding '{col}' to submissions...")
-            try:
-                cursor.execute(f"ALTER TABLE submissions ADD COLUMN {col} {dtype}")
-                print(f"Added {col}.")
-            except Exception as e:
-                print(f"Failed to add {col}: {e}")
-        else:
-            print(f"Column '{col}' exists.")
+    if "submissions" in tables:
+        print("Checking 'submissions' table...")
+        _add_columns(engine, "submissions", {
+            "product": "VARCHAR",
+            "is_locked": "BOOLEAN DEFAULT FALSE",
+            "analysis_result": "TEXT",
+            "gms_version": "VARCHAR",
+            "lab_name": "VARCHAR",
+            "target_fingerprint": "VARCHAR",
+            "brand": "VARCHAR",
+            "device": "VARCHAR"
+        }, columns("submissions"))
+
+    # 3. Deduplicated failure text (text_blobs) referenced from test_cases
+    print("Checking 'test_cases' table...")
+    current_case_columns = columns("test_cases")
+    if current_case_columns:
+        with engine.begin() as conn:
+            models.TextBlob.__table__.create(bind=conn, checkfirst=True)
+            for col in ("stack_trace_id", "error_message_id"):
+                if col not in current_case_columns:
+                    print(f"Adding '{col}' to test_cases...")
+                    conn.execute(text(f"ALTER TABLE test_cases ADD COLUMN {col} INTEGER REFERENCES text_blobs(id)"))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_test_cases_{col} ON test_cases ({col})"))
+
+        with Session(bind=engine) as db:
+            backfill_text_blobs(db)
+
+        # 4. Interned test identities (module, abi, class, method) referenced from test_cases
+        with engine.begin() as conn:
+            models.TestIdentity.__table__.create(bind=conn, checkfirst=True)
+            if "test_identity_id" not in current_case_columns:
+                print("Adding 'test_identity_id' to test_cases...")
+                conn.execute(text("ALTER TABLE test_cases ADD COLUMN test_identity_id INTEGER REFERENCES test_identities(id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_test_cases_test_identity_id ON test_cases (test_identity_id)"))
+
+        with Session(bind=engine) as db:
+            backfill_test_identities(db)
+
+    # 5. Job progress columns (jobs itself is created by create_all)
+    current_job_columns = columns("jobs")
+    if current_job_columns:
+        with engine.begin() as conn:
+            for col, dtype in (("test_run_id", "INTEGER"), ("progress", "TEXT")):
+                if col not in current_job_columns:
+                    print(f"Adding '{col}' to jobs...")
+                    conn.execute(text(f"ALTER TABLE jobs ADD COLUMN {col} {dtype}"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_test_run_id ON jobs (test_run_id)"))
+
+    # 6. Per-module results materialized at ingest (NULL for runs ingested before)
+    if "test_run_modules" in tables:
+        print("Checking 'test_run_modules' table...")
+        _add_columns(engine, "test_run_modules", {
+            "passed_tests": "INTEGER",
+            "failed_tests": "INTEGER",
+            "ignored_tests": "INTEGER",
+            "done": "BOOLEAN",
+            "runtime_ms": "INTEGER"
+        }, columns("test_run_modules"))
+
+    # 7. Indexes behind the set-based deletes (DeletionService) and run lookups
+    with engine.begin() as conn:
+        for table, col in (("test_cases", "test_run_id"), ("failure_analysis", "test_case_id"), ("failure_analysis", "cluster_id")):
+            if table in tables:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{col} ON {table} ({col})"))
 
-    conn.commit()
-    conn.close()
     print("Migration completed successfully.")
 
+def _text_hash(text):
+    # Must match TextBlobService.text_hash
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+def backfill_text_blobs(db, batch_size=5000):
+    """
+    Move inline test_cases.stack_trace / error_message text into text_blobs.
+    Idempotent and resumable: each batch commits on its own.
+    """
+    moved = 0
+    while True:
+        rows = db.execute(
+            text(
+                "SELECT id, stack_trace, error_message FROM test_cases "
+                "WHERE stack_trace IS NOT NULL OR error_message IS NOT NULL LIMIT :limit"
+            ),
+            {"limit": batch_size}
+        ).all()
+        if not rows:
+            break
+
+        blobs = {}
+        for _, stack, error in rows:
+            for value in (stack, error):
+                if value:
+                    h = _text_hash(value)
+                    blobs.setdefault(h, {"hash": h, "content": value})
+        ids = intern_rows(db, models.TextBlob.__table__, blobs, {})
+
+        def blob_id(value):
+            return ids[_text_hash(value)] if value else None
+
+        db.execute(
+            text(
+                "UPDATE test_cases SET stack_trace_id = :stack_id, error_message_id = :error_id, "
+                "stack_trace = NULL, error_message = NULL WHERE id = :case_id"
+            ),
+            [{"stack_id": blob_id(stack), "error_id": blob_id(error), "case_id": case_id} for case_id, stack, error in rows]
+        )
+        db.commit()
+        moved += len(rows)
+        print(f"Moved failure text of {moved} test cases into text_blobs...")
+
+    if moved:
+        print("Text backfill done. Run vacuum_db.py to reclaim the freed space.")
+
+def backfill_test_identities(db, batch_size=5000):
+    """Assign test_identity_id to existing test_cases rows. Idempotent and resumable."""
+    done = 0
+    while True:
+        rows = db.execute(
+            text(
+                "SELECT id, module_name, module_abi, class_name, method_name FROM test_cases "
+                "WHERE test_identity_id IS NULL LIMIT :limit"
+            ),
+            {"limit": batch_size}
+        ).all()
+        if not rows:
+            break
+
+        # Must match TestIdentityService.identity_key / identity_hash
+        keys = {case_id: tuple(v or "" for v in key) for case_id, *key in rows}
+        identities = {
+            _text_hash("\x1f".join(key)): dict(zip(("module_name", "module_abi", "class_name", "method_name"), key))
+            for key in set(keys.values())
+        }
+        for h, row in identities.items():
+            row["hash"] = h
+        ids = intern_rows(db, models.TestIdentity.__table__, identities, {})
+
+        db.execute(
+            text("UPDATE test_cases SET test_identity_id = :identity_id WHERE id = :case_id"),
+            [{"identity_id": ids[_text_hash("\x1f".join(key))], "case_id": case_id} for case_id, key in keys.items()]
+        )
+        db.commit()
+        done += len(rows)
+        print(f"Assigned test identities to {done} test cases...")
+
 if __name__ == "__main__":
     migrate()
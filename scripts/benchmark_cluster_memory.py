@@ -0,0 +1,73 @@
+"""
+Benchmark the memory-bounded clustering path (ImprovedFailureClusterer with
+max_memory_mb) against the dense path on single large module groups.
+
+    dense     TF-IDF densified for HDBSCAN (svd_components=0, no ceiling)
+    bounded   same, with the ceiling: groups whose dense TF-IDF would not fit
+              are reduced by a randomized SVD sized to the ceiling
+    svd       the default pipeline (100 SVD components, no ceiling)
+    svd+cap   the default pipeline with the ceiling
+
+Reported per path: seconds, peak traced memory (tracemalloc: numpy / Python
+allocations, not HDBSCAN's internal buffers) and adjusted Rand index against
+the dense labels. The synthetic failures (tests/test_clustering.synthetic_failures)
+have a small vocabulary, so a tight ceiling costs more agreement here than on
+real stack traces (up to 2000 TF-IDF features).
+
+Usage:
+    python scripts/benchmark_cluster_memory.py
+    python scripts/benchmark_cluster_memory.py --sizes 5000 20000 --memory-mb 16
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.metrics import adjusted_rand_score
+
+from backend.analysis.clustering import ImprovedFailureClusterer
+from tests.test_clustering import synthetic_failures
+
+
+def measured(clusterer, failures):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        labels, metrics = clusterer.cluster_failures(failures)
+        return labels, metrics, time.perf_counter() - start, tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[2000, 5000, 10000], help="Failures in the module group")
+    ap.add_argument("--memory-mb", type=float, default=8, help="max_memory_mb of the bounded paths")
+    args = ap.parse_args()
+
+    paths = [
+        ("dense", dict(svd_components=0)),
+        ("bounded", dict(svd_components=0, max_memory_mb=args.memory_mb)),
+        ("svd", dict()),
+        ("svd+cap", dict(max_memory_mb=args.memory_mb)),
+    ]
+    for size in args.sizes:
+        failures = synthetic_failures([size], seed=size)
+        print(f"{size:,} failures in one module, ceiling {args.memory_mb:g} MB")
+        expected = None
+        for name, kwargs in paths:
+            labels, metrics, seconds, peak_mb = measured(
+                ImprovedFailureClusterer(min_cluster_size=3, dedup=False, **kwargs), failures
+            )
+            expected = labels if expected is None else expected
+            (group,) = metrics["details"].values()
+            reduced = f"  -> {group['bounded_components']} components" if "bounded_components" in group else ""
+            print(f"  {name:<9} {seconds:7.2f}s  peak {peak_mb:8.1f} MB  "
+                  f"ARI {adjusted_rand_score(expected, labels):.3f}{reduced}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark per-module clustering (ImprovedFailureClusterer.cluster_failures)
+sequentially and with module groups in a process pool, across group-size
+distributions:
+
+    uniform   many modules of similar size
+    skewed    one module with most failures, a long tail of small ones
+    few       a handful of large modules
+    tiny      hundreds of modules with a few failures each
+    device    a device-level issue: thousands of copies of a few failure shapes
+
+The failures come from tests/test_clustering.synthetic_failures. Each parallel
+run is checked to give exactly the sequential labels. The sequential run
+without duplicate collapse (dedup=False) is compared by adjusted Rand index:
+1.0 unless HDBSCAN's spanning tree has tied edges (the synthetic texts share a
+small vocabulary), where even HDBSCAN's own tree algorithms disagree.
+
+Usage:
+    python scripts/benchmark_clustering.py
+    python scripts/benchmark_clustering.py --failures 20000 --jobs 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.metrics import adjusted_rand_score
+
+from backend.analysis.clustering import ImprovedFailureClusterer
+from tests.test_clustering import synthetic_failures
+
+
+def group_sizes(distribution: str, total: int, rng: random.Random):
+    if distribution == "uniform":
+        return [max(1, int(rng.gauss(total / 60, total / 240))) for _ in range(60)]
+    if distribution == "skewed":
+        return [total // 2] + [max(1, int(rng.paretovariate(1.5) * total / 400)) for _ in range(100)]
+    if distribution == "few":
+        return [total // 4] * 4
+    if distribution == "tiny":
+        return [rng.randint(1, 6) for _ in range(total // 3)]
+    if distribution == "device":
+        return [40, 30, 20, 10]
+    raise ValueError(distribution)
+
+
+def make_failures(distribution: str, total: int, rng: random.Random):
+    sizes = group_sizes(distribution, total, rng)
+    failures = synthetic_failures(sizes, seed=len(sizes))
+    if distribution == "device":
+        failures += [dict(f) for f in rng.choices(failures, k=total - len(failures))]
+    return sizes, failures
+
+
+def timed(clusterer, failures):
+    start = time.perf_counter()
+    labels, _ = clusterer.cluster_failures(failures)
+    return labels, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--failures", type=int, default=6000, help="Approximate failures per distribution")
+    ap.add_argument("--jobs", type=int, nargs="+", help="Process counts to try (default: 2, 4 ... cpu_count)")
+    ap.add_argument("--distributions", nargs="+", default=["uniform", "skewed", "few", "tiny", "device"])
+    args = ap.parse_args()
+
+    cpus = os.cpu_count() or 1
+    jobs = args.jobs or sorted({n for n in (2, 4, 8, 16) if n < cpus} | {cpus} - {1}) or [2]
+    rng = random.Random(0)
+
+    for distribution in args.distributions:
+        sizes, failures = make_failures(distribution, args.failures, rng)
+        print(f"{distribution}: {len(failures):,} failures in {len(sizes)} modules")
+
+        expected, sequential_s = timed(ImprovedFailureClusterer(min_cluster_size=3), failures)
+        print(f"  sequential    {sequential_s:7.2f}s")
+        labels, expanded_s = timed(ImprovedFailureClusterer(min_cluster_size=3, dedup=False), failures)
+        agreement = adjusted_rand_score(labels, expected)
+        print(f"  no collapse   {expanded_s:7.2f}s  (collapse {expanded_s / sequential_s:4.1f}x, ARI {agreement:.3f})")
+        for n_jobs in jobs:
+            labels, parallel_s = timed(ImprovedFailureClusterer(min_cluster_size=3, n_jobs=n_jobs), failures)
+            assert labels == expected, f"n_jobs={n_jobs} labels differ from the sequential run"
+            print(f"  n_jobs={n_jobs:<3}    {parallel_s:7.2f}s  ({sequential_s / parallel_s:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Dashboard read latency while a large upload is being ingested.
+
+For every SQLite profile (see SQLITE_PROFILE in backend/database/database.py)
+a fresh DB is seeded with one small completed run. A large result is then
+ingested with process_upload_background in a separate process, as a worker
+would run it. Meanwhile this process keeps issuing dashboard reads (run list,
+run stats, failure list of the seeded run) and records their latency.
+
+Reported per profile: ingest seconds, number of reads, p50 / p95 / p99 / max
+read latency and reads that failed (e.g. "database is locked").
+
+Usage:
+    python scripts/benchmark_concurrent_reads.py                      # cts-full, legacy vs tuned
+    python scripts/benchmark_concurrent_reads.py --scenario 1gb       # ~1 GB result XML
+    python scripts/benchmark_concurrent_reads.py --profile tuned --output reads.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from generate_synthetic_results import generate_result
+from benchmark_ingestion import SCENARIOS
+
+PROFILES = ("legacy", "tuned")
+READ_INTERVAL = 0.05
+
+
+def _create_run(SessionLocal, models) -> int:
+    db = SessionLocal()
+    run = models.TestRun(test_suite_name="Pending...", device_fingerprint="Pending...", status="pending")
+    db.add(run)
+    db.commit()
+    run_id = run.id
+    db.close()
+    return run_id
+
+
+def _ingest(xml_path: str, run_id: int):
+    from backend.database.database import engine
+    # Forked: drop the parent's pooled connections without closing them
+    engine.dispose(close=False)
+    from backend.routers.upload import process_upload_background
+    process_upload_background(xml_path, run_id)
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _run_profile(xml_path: str, seed_path: str) -> dict:
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from backend.database.database import Base, engine, SessionLocal
+    from backend.database import models
+    from backend.routers import reports
+    from backend.routers.upload import process_upload_background
+    Base.metadata.create_all(bind=engine)
+
+    seed_id = _create_run(SessionLocal, models)
+    process_upload_background(seed_path, seed_id)
+    run_id = _create_run(SessionLocal, models)
+
+    app = FastAPI()
+    app.include_router(reports.router, prefix="/api/reports")
+    client = TestClient(app)
+    paths = ("/api/reports/runs", f"/api/reports/runs/{seed_id}/stats", f"/api/reports/runs/{seed_id}/failures")
+
+    ingest = multiprocessing.get_context("fork").Process(target=_ingest, args=(xml_path, run_id))
+    start = time.perf_counter()
+    ingest.start()
+    latencies, errors = [], 0
+    while ingest.is_alive():
+        for path in paths:
+            t0 = time.perf_counter()
+            try:
+                ok = client.get(path).status_code == 200
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            errors += not ok
+        time.sleep(READ_INTERVAL)
+    ingest.join()
+    elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    status = db.query(models.TestRun.status).filter(models.TestRun.id == run_id).scalar()
+    db.close()
+    if status != "completed":
+        raise RuntimeError(f"ingest ended with status {status}")
+
+    ms = [latency * 1000 for latency in latencies] or [0.0]
+    return {
+        "ingest_seconds": round(elapsed, 2),
+        "reads": len(latencies),
+        "read_errors": errors,
+        "p50_ms": round(_percentile(ms, 0.50), 1),
+        "p95_ms": round(_percentile(ms, 0.95), 1),
+        "p99_ms": round(_percentile(ms, 0.99), 1),
+        "max_ms": round(max(ms), 1),
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(_run_profile(*sys.argv[2:4])))
+        return
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=sorted(SCENARIOS), default="cts-full")
+    ap.add_argument("--profile", nargs="+", choices=PROFILES, default=list(PROFILES))
+    ap.add_argument("--output", help="Also write the results JSON here")
+    args = ap.parse_args()
+
+    print(f"Host: {platform.node()} ({os.cpu_count()} CPUs, Python {platform.python_version()})")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="gms-reads-") as workdir:
+        xml_path = os.path.join(workdir, f"{args.scenario}.xml")
+        seed_path = os.path.join(workdir, "seed.xml")
+        info = generate_result(xml_path, **SCENARIOS[args.scenario])
+        generate_result(seed_path, **SCENARIOS["small"])
+        print(f"[{args.scenario}] {info['tests']:,} tests, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+        for profile in args.profile:
+            db_path = os.path.join(workdir, f"{profile}.db")
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", SQLITE_PROFILE=profile)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", xml_path, seed_path],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                print(f"  {profile:<7} FAILED\n{proc.stderr[-2000:]}")
+                continue
+            r = results[profile] = json.loads(lines[-1])
+            print(f"  {profile:<7} ingest {r['ingest_seconds']:7.1f}s  {r['reads']:6,} reads  "
+                  f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+                  f"max {r['max_ms']:8.1f} ms  errors {r['read_errors']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scenario": args.scenario, "recorded_at": time.strftime("%Y-%m-%d"), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
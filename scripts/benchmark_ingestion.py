@@ -0,0 +1,305 @@
+"""
+Ingestion benchmark suite on synthetic results.
+
+For every scenario a result XML is generated (scripts/generate_synthetic_results.py)
+and each target runs in a fresh subprocess against its own SQLite DB:
+
+    parser   XMLParser.parse over the whole file
+    upload   process_upload_background (parse + ingestion pipeline + DB writes)
+    import   POST /api/import with the payload the browser worker would send
+    ndjson   POST /api/import/stream with the same records as NDJSON lines
+
+Recorded per scenario/target: seconds, tests/s, MB/s, peak RSS and DB size.
+Results are compared against scripts/benchmark_baseline.json; a throughput
+drop or RSS / DB growth beyond --tolerance is reported as a regression
+(exit code 1).
+
+Usage:
+    python scripts/benchmark_ingestion.py                         # default scenarios, compare to baseline
+    python scripts/benchmark_ingestion.py --scenario cts-full --target upload
+    python scripts/benchmark_ingestion.py --update-baseline       # record this machine's numbers
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from generate_synthetic_results import generate_result
+
+BASELINE_PATH = os.path.join(ROOT, "scripts", "benchmark_baseline.json")
+
+TARGETS = ("parser", "upload", "import", "ndjson")
+
+SCENARIOS = {
+    # ~10k tests: quick smoke run
+    "small": dict(modules=50, tests_per_module=200, failure_ratio=0.02, stack_lines=15),
+    # Failure-heavy partial run: DB writes and stack trace storage dominate
+    "failure-heavy": dict(modules=100, tests_per_module=500, failure_ratio=0.2, stack_lines=60),
+    # Device-wide crash: most failures share one stack trace per module
+    "crash-storm": dict(modules=100, tests_per_module=500, failure_ratio=0.3, stack_lines=60, duplicate_ratio=0.9),
+    # Full CTS shape: ~1M tests over 2 ABIs
+    "cts-full": dict(modules=500, tests_per_module=1000, failure_ratio=0.005, stack_lines=25,
+                     abis=("arm64-v8a", "armeabi-v7a")),
+    # 5M tests: upper bound of what a lab uploads in one file
+    "huge": dict(modules=1250, tests_per_module=2000, failure_ratio=0.002, stack_lines=25,
+                 abis=("arm64-v8a", "armeabi-v7a")),
+    # ~1 GB result XML (~17M tests), used by benchmark_concurrent_reads.py
+    "1gb": dict(modules=2000, tests_per_module=4250, failure_ratio=0.002, stack_lines=25,
+                abis=("arm64-v8a", "armeabi-v7a")),
+}
+DEFAULT_SCENARIOS = ("small", "failure-heavy", "crash-storm")
+
+
+# --- Child process: runs exactly one target so peak RSS and DB size are its own ---
+
+def _db_size(db_path: str) -> int:
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def _run_target(target: str, xml_path: str, db_path: str) -> dict:
+    from backend.database.database import Base, engine, SessionLocal
+    from backend.database import models
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    if target == "parser":
+        from backend.parser.xml_parser import XMLParser
+        tests = sum(1 for item in XMLParser().parse(xml_path) if item.get("type") != "module_info")
+    elif target == "upload":
+        from backend.routers.upload import process_upload_background
+        db = SessionLocal()
+        run = models.TestRun(test_suite_name="Pending...", device_fingerprint="Pending...", status="pending")
+        db.add(run)
+        db.commit()
+        run_id = run.id
+        db.close()
+
+        start = time.perf_counter()
+        process_upload_background(xml_path, run_id)
+
+        db = SessionLocal()
+        run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
+        if run.status != "completed":
+            raise RuntimeError(f"upload ended with status {run.status}")
+        tests = run.total_tests + (run.ignored_tests or 0)
+        db.close()
+    elif target == "import":
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.routers import import_json
+        app = FastAPI()
+        app.include_router(import_json.router, prefix="/api/import")
+        payload = _import_payload(xml_path)
+        tests = len(payload["failures"]) + len(payload["passes"])
+        body = json.dumps(payload)
+
+        start = time.perf_counter()
+        response = TestClient(app).post("/api/import", content=body, headers={"Content-Type": "application/json"})
+        if response.status_code != 200:
+            raise RuntimeError(f"import failed: {response.status_code} {response.text[:200]}")
+    elif target == "ndjson":
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from backend.routers import import_json
+        app = FastAPI()
+        app.include_router(import_json.router, prefix="/api/import")
+        body_path = db_path + ".ndjson"
+        tests = 0
+        with open(body_path, "w") as f:
+            for kind, record in _import_records(xml_path):
+                tests += kind in ("failure", "pass")
+                f.write(json.dumps({"type": kind, **record}) + "\n")
+
+        def body():
+            with open(body_path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    yield chunk
+
+        start = time.perf_counter()
+        response = TestClient(app).post("/api/import/stream", content=body(), headers={"Content-Type": "application/x-ndjson"})
+        os.remove(body_path)
+        if response.status_code != 200:
+            raise RuntimeError(f"import failed: {response.status_code} {response.text[:200]}")
+    else:
+        raise ValueError(f"Unknown target {target}")
+
+    elapsed = time.perf_counter() - start
+    # Close pooled connections: the last close checkpoints the WAL into the DB file
+    engine.dispose()
+    size_mb = os.path.getsize(xml_path) / (1024 * 1024)
+    return {
+        "seconds": round(elapsed, 3),
+        "tests": tests,
+        "tests_per_sec": round(tests / elapsed, 1) if elapsed > 0 else 0.0,
+        "mb_per_sec": round(size_mb / elapsed, 2) if elapsed > 0 else 0.0,
+        # ru_maxrss is KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_mb": round(_db_size(db_path) / (1024 * 1024), 2),
+    }
+
+
+def _import_records(xml_path: str):
+    """
+    Yield (type, record) pairs as backend/static/xml-parser.worker.js produces them:
+    metadata first, then failures / passes, then modules and stats.
+    """
+    from backend.parser.xml_parser import XMLParser
+    parser = XMLParser()
+    meta = parser.get_metadata(xml_path)
+    yield "metadata", {k: (str(v) if v is not None else None) for k, v in meta.items() if k not in ("modules_done", "modules_total")}
+
+    modules = {}
+    stats = {"total_tests": 0, "passed_tests": 0, "failed_tests": 0, "ignored_tests": 0}
+    for item in parser.parse(xml_path):
+        if item.get("type") == "module_info":
+            continue
+        modules[(item["module_name"], item["module_abi"])] = True
+        status = (item["status"] or "").lower()
+        if status == "fail":
+            yield "failure", {k: item[k] for k in ("module_name", "module_abi", "class_name", "method_name",
+                                                   "status", "error_message", "stack_trace")}
+            stats["failed_tests"] += 1
+        elif status == "pass":
+            yield "pass", {k: item[k] for k in ("module_name", "module_abi", "class_name", "method_name", "status")}
+            stats["passed_tests"] += 1
+        else:
+            stats["ignored_tests"] += 1
+
+    for n, a in modules:
+        yield "module", {"module_name": n, "module_abi": a}
+    stats["total_tests"] = stats["passed_tests"] + stats["failed_tests"]
+    stats["total_modules"] = len(modules)
+    stats["xml_modules_done"] = meta.get("modules_done", 0)
+    stats["xml_modules_total"] = meta.get("modules_total", 0)
+    yield "stats", stats
+
+
+def _import_payload(xml_path: str) -> dict:
+    """Build the /api/import payload the same way backend/static/xml-parser.worker.js does."""
+    payload = {"failures": [], "passes": [], "modules": []}
+    for kind, record in _import_records(xml_path):
+        if kind in ("metadata", "stats"):
+            payload[kind] = record
+        else:
+            payload[kind + "s" if kind != "pass" else "passes"].append(record)
+    return payload
+
+
+# --- Parent process ---
+
+def run_scenario(name: str, targets, workdir: str) -> dict:
+    xml_path = os.path.join(workdir, f"{name}.xml")
+    info = generate_result(xml_path, **SCENARIOS[name])
+    print(f"\n[{name}] {info['tests']:,} tests, {info['failed']:,} failures, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+    results = {}
+    for target in targets:
+        db_path = os.path.join(workdir, f"{name}-{target}.db")
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", target, xml_path, db_path],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print(f"  {target:<8} FAILED\n{proc.stderr[-2000:]}")
+            continue
+        results[target] = json.loads(lines[-1])
+        r = results[target]
+        print(f"  {target:<8} {r['seconds']:8.2f}s {r['tests_per_sec']:12,.0f} tests/s {r['mb_per_sec']:7.1f} MB/s "
+              f"rss {r['peak_rss_mb']:7.1f} MB  db {r['db_mb']:7.1f} MB")
+        for p in (db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.exists(p):
+                os.remove(p)
+    os.remove(xml_path)
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    """Return a list of human-readable regressions against the baseline."""
+    regressions = []
+    for scenario, targets in current.items():
+        for target, r in targets.items():
+            base = baseline.get("results", {}).get(scenario, {}).get(target)
+            if not base:
+                continue
+            label = f"{scenario}/{target}"
+            if r["tests_per_sec"] < base["tests_per_sec"] * (1 - tolerance):
+                regressions.append(f"{label}: {r['tests_per_sec']:,.0f} tests/s vs baseline {base['tests_per_sec']:,.0f}")
+            if r["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{label}: peak RSS {r['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB")
+            if r["db_mb"] > base["db_mb"] * (1 + tolerance) + 0.5:
+                regressions.append(f"{label}: DB {r['db_mb']} MB vs baseline {base['db_mb']} MB")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        target, xml_path, db_path = sys.argv[2:5]
+        sys.path.insert(0, ROOT)
+        print(json.dumps(_run_target(target, xml_path, db_path)))
+        return
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=list(DEFAULT_SCENARIOS))
+    ap.add_argument("--target", nargs="+", choices=TARGETS, default=list(TARGETS))
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default 0.25)")
+    ap.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    ap.add_argument("--output", help="Also write the results JSON here")
+    args = ap.parse_args()
+
+    print(f"Host: {platform.node()} ({os.cpu_count()} CPUs, Python {platform.python_version()})")
+    current = {}
+    with tempfile.TemporaryDirectory(prefix="gms-bench-") as workdir:
+        for name in args.scenario:
+            current[name] = run_scenario(name, args.target, workdir)
+
+    report = {
+        "host": {"cpus": os.cpu_count(), "python": platform.python_version(), "platform": platform.platform()},
+        "recorded_at": time.strftime("%Y-%m-%d"),
+        "results": current,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for scenario, targets in current.items():
+            baseline.setdefault("results", {}).setdefault(scenario, {}).update(targets)
+        baseline["host"] = report["host"]
+        baseline["recorded_at"] = report["recorded_at"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline yet; run with --update-baseline to record one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions (tolerance {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against baseline ({baseline.get('recorded_at', 'unknown date')}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Suite merge (MergeService.calculate_suite_summary) against the per-record
+reference merge it replaced, on a synthetic suite of retry runs.
+
+The corpus comes from tests/test_suite_summary_engine.build_corpus: the first
+run has ~--failures failures, retries re-run half the tests. Reported: seconds
+for the reference, the columnar merge with items (failure details loaded) and
+the counts-only merge used for the submission summaries.
+
+Usage:
+    python scripts/benchmark_merge.py                       # ~100k failures, 6 runs
+    python scripts/benchmark_merge.py --failures 20000 --runs 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import models
+from backend.database.database import Base
+from backend.services.merge_service import MergeService
+from tests.test_suite_summary_engine import build_corpus, reference_suite_summary
+
+FAIL_RATE = 0.4
+
+
+def _reference_with_details(db, runs):
+    """The reference merge plus loading its items' failures and building the items, as the replaced code did."""
+    result = reference_suite_summary(db, runs)
+    case_ids = [case_id for case_id, _, _ in result["items"]]
+    representatives = {}
+    for i in range(0, len(case_ids), 500):
+        for case in db.query(models.TestCase).filter(models.TestCase.id.in_(case_ids[i:i + 500])):
+            representatives[case.id] = case
+    items = []
+    for case_id, is_recovered, history in result["items"]:
+        case = representatives[case_id]
+        items.append({
+            "module_name": case.module_name, "module_abi": case.module_abi, "test_class": case.class_name,
+            "test_method": case.method_name, "is_recovered": is_recovered, "status_history": history,
+            "failure_details": case
+        })
+    return dict(result, items=items)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--failures", type=int, default=100000, help="Failures in the first run")
+    ap.add_argument("--runs", type=int, default=6)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gms-merge-") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'merge.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = session()
+        runs = build_corpus(db, n_runs=args.runs, n_tests=int(args.failures / FAIL_RATE), fail_rate=FAIL_RATE)
+        run_ids = [r.id for r in runs]
+        db.close()
+
+        def measure(fn):
+            # Fresh session each time: no ORM objects cached from a previous pass
+            db = session()
+            try:
+                runs = db.query(models.TestRun).filter(models.TestRun.id.in_(run_ids)).all()
+                start = time.perf_counter()
+                result = fn(db, runs)
+                return time.perf_counter() - start, result
+            finally:
+                db.close()
+
+        ref_s, ref = measure(_reference_with_details)
+        items_s, full = measure(lambda db, r: MergeService.calculate_suite_summary(db, r))
+        counts_s, _ = measure(lambda db, r: MergeService.calculate_suite_summary(db, r, include_items=False))
+        engine.dispose()
+
+    assert (full["initial"], full["recovered"], full["remaining"]) == (ref["initial"], ref["recovered"], ref["remaining"])
+    print(f"{args.runs} runs, {ref['initial']:,} initial failures, {len(ref['items']):,} items")
+    print(f"  reference          {ref_s:7.2f}s")
+    print(f"  columnar (items)   {items_s:7.2f}s  ({ref_s / items_s:5.1f}x)")
+    print(f"  columnar (counts)  {counts_s:7.2f}s  ({ref_s / counts_s:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark module-sharded parallel parsing against the sequential XMLParser.
+
+Usage:
+    python scripts/benchmark_parallel_parser.py path/to/test_result.xml
+    python scripts/benchmark_parallel_parser.py --generate 1000 --tests-per-module 500
+    python scripts/benchmark_parallel_parser.py big.xml --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.parser.parallel_parser import ParallelXMLParser
+from backend.parser.xml_parser import XMLParser
+from generate_synthetic_results import generate_result
+
+
+def timed(parser, path):
+    start = time.perf_counter()
+    count = sum(1 for _ in parser.parse(path))
+    return count, time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("xml", nargs="?", help="Result XML to parse (omit with --generate)")
+    ap.add_argument("--generate", type=int, metavar="MODULES", help="Generate a synthetic result with this many modules")
+    ap.add_argument("--tests-per-module", type=int, default=500)
+    ap.add_argument("--workers", type=int, nargs="+", help="Worker counts to try (default: 1, 2, 4 ... cpu_count)")
+    args = ap.parse_args()
+
+    path = args.xml
+    tmp = None
+    if args.generate:
+        tmp = tempfile.NamedTemporaryFile(suffix=".xml", delete=False)
+        tmp.close()
+        path = tmp.name
+        generate_result(path, modules=args.generate, tests_per_module=args.tests_per_module, failure_ratio=0.02)
+    elif not path:
+        ap.error("give a result XML or --generate")
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= cpus], cpus})
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"File: {path} ({size_mb:.1f} MB), CPUs: {cpus}")
+
+    try:
+        items, base = timed(XMLParser(), path)
+        print(f"\n{'workers':>8} {'seconds':>9} {'items/s':>12} {'MB/s':>8} {'speedup':>8}")
+        print(f"{'seq':>8} {base:9.2f} {items / base:12,.0f} {size_mb / base:8.1f} {1.0:8.2f}")
+        for w in workers:
+            count, elapsed = timed(ParallelXMLParser(workers=w), path)
+            assert count == items, f"parallel parser produced {count} items, expected {items}"
+            print(f"{w:>8} {elapsed:9.2f} {count / elapsed:12,.0f} {size_mb / elapsed:8.1f} {base / elapsed:8.2f}")
+    finally:
+        if tmp:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
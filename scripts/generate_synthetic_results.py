@@ -0,0 +1,209 @@
+"""
+Generate realistic synthetic tradefed result XMLs (CTS / GTS / VTS shaped).
+
+Customer results cannot be shared, so parser and ingestion work is measured
+against generated files of the same shape: Result / Build / Summary header,
+one <Module> per module x ABI, tests grouped into <TestCase> classes, and
+failures with Java-style stack traces. Output is streamed to disk, so
+multi-million test files (e.g. 5M tests) need no more memory than one module.
+The same seed always produces the same file.
+
+Usage:
+    python scripts/generate_synthetic_results.py out.xml --modules 1000 --tests-per-module 1000
+    python scripts/generate_synthetic_results.py out.xml.gz --suite GTS --failure-ratio 0.05 --stack-lines 40
+    python scripts/generate_synthetic_results.py big.xml --modules 1250 --tests-per-module 2000 --abis arm64-v8a armeabi-v7a
+"""
+import argparse
+import gzip
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+SUITES = {
+    "CTS": {"plan": "cts", "version": "15_r3", "module": "Cts{}TestCases", "package": "android.{}.cts"},
+    "GTS": {"plan": "gts", "version": "12.1", "module": "Gts{}TestCases", "package": "com.google.android.gts.{}"},
+    "VTS": {"plan": "vts", "version": "15_r3", "module": "Vts{}TargetTest", "package": "android.hardware.{}.vts"},
+}
+
+_AREAS = [
+    "Media", "Camera", "Graphics", "Bluetooth", "Wifi", "Telephony", "Security", "Permission", "Location",
+    "Sensor", "Audio", "Display", "Input", "Keystore", "Net", "Os", "Provider", "Widget", "Webkit", "Accessibility",
+]
+
+# (exception, message template) pairs; a few shapes dominate real results, which matters for clustering
+_FAILURES = [
+    ("java.lang.AssertionError", "expected:<{a}> but was:<{b}>"),
+    ("junit.framework.AssertionFailedError", "{cls}#{method} timed out after {a} ms"),
+    ("java.lang.SecurityException", "Permission Denial: {method} requires android.permission.{perm}"),
+    ("java.lang.NullPointerException", "Attempt to invoke virtual method 'int {cls}.get{perm}()' on a null object reference"),
+    ("com.android.tradefed.device.DeviceNotAvailableException", "Device {b} is not available"),
+    ("java.lang.IllegalStateException", "Camera {a} failed to open: error {b}"),
+]
+
+_PERMS = ["CAMERA", "RECORD_AUDIO", "ACCESS_FINE_LOCATION", "BLUETOOTH_CONNECT", "READ_PHONE_STATE", "POST_NOTIFICATIONS"]
+
+TESTS_PER_CLASS = 25
+
+
+def _module_name(suite: Dict[str, str], index: int):
+    """Return (module name, java package) for the index-th module of a suite."""
+    area = f"{_AREAS[index % len(_AREAS)]}{index // len(_AREAS) or ''}"
+    return suite["module"].format(area), suite["package"].format(area.lower())
+
+
+def _statuses(seed: str, tests: int, failure_ratio: float):
+    """Per-module status sequence (own RNG, so counting and writing agree)."""
+    rng = random.Random(seed)
+    for _ in range(tests):
+        r = rng.random()
+        if r < failure_ratio:
+            yield "fail"
+        elif r < failure_ratio + 0.01:
+            yield "IGNORED"
+        elif r < failure_ratio + 0.015:
+            yield "ASSUMPTION_FAILURE"
+        else:
+            yield "pass"
+
+
+def _shared_failure_xml(package: str, stack_lines: int) -> str:
+    """Byte-identical failure repeated across a module (device-wide crash, missing feature)."""
+    exc = "java.lang.RuntimeException"
+    message = f"Process crashed while instrumenting {package}"
+    frames = [f"{exc}: {message}"]
+    for i in range(max(stack_lines - 1, 0)):
+        frames.append(f"\tat com.android.server.Native{i % 5}.call{i}(Native{i % 5}.java:{100 + i})")
+    stack = "\n".join(frames)
+    return f'<Failure message={quoteattr(f"{exc}: {message}")}><StackTrace>{escape(stack)}</StackTrace></Failure>'
+
+
+def _failure_xml(rng: random.Random, package: str, cls: str, method: str, stack_lines: int) -> str:
+    exc, template = rng.choice(_FAILURES)
+    message = template.format(
+        a=rng.randint(0, 5000), b=rng.randint(0, 5000), cls=cls, method=method, perm=rng.choice(_PERMS)
+    )
+    frames = [f"{exc}: {message}", f"\tat {package}.{cls}.{method}({cls}.java:{rng.randint(20, 900)})"]
+    for i in range(max(stack_lines - 2, 0)):
+        frames.append(f"\tat {package}.internal.Helper{i % 7}.step{i}(Helper{i % 7}.java:{rng.randint(10, 400)})")
+    stack = "\n".join(frames)
+    return f'<Failure message={quoteattr(f"{exc}: {message}")}><StackTrace>{escape(stack)}</StackTrace></Failure>'
+
+
+def generate_result(
+    path: str,
+    suite: str = "CTS",
+    modules: int = 100,
+    tests_per_module: int = 100,
+    failure_ratio: float = 0.01,
+    stack_lines: int = 20,
+    abis: Sequence[str] = ("arm64-v8a",),
+    seed: int = 0,
+    duplicate_ratio: float = 0.0,
+    fingerprint: str = "Brand/product/device:15/AP3A.240905.015/12345678:user/release-keys",
+) -> Dict[str, Any]:
+    """
+    Write a synthetic result XML (gzipped if `path` ends with .gz) and return its shape.
+    `duplicate_ratio` of the failures share one identical stack trace per module.
+    """
+    spec = SUITES[suite.upper()]
+    units = [(m, abi) for m in range(modules) for abi in abis]
+
+    # Pass 1: counts for the <Summary> header
+    counts = {"pass": 0, "fail": 0, "IGNORED": 0, "ASSUMPTION_FAILURE": 0}
+    for m, abi in units:
+        for status in _statuses(f"{seed}:{m}:{abi}", tests_per_module, failure_ratio):
+            counts[status] += 1
+
+    start = datetime(2025, 8, 8, 14, 18, 40) + timedelta(days=seed % 365)
+    end = start + timedelta(seconds=max(len(units) * tests_per_module // 50, 60))
+    start_ms = int(start.timestamp() * 1000)
+    end_ms = int(end.timestamp() * 1000)
+    product = fingerprint.split("/")[1] if fingerprint.count("/") >= 2 else "product"
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='UTF-8' standalone='no' ?>")
+        f.write("<?xml-stylesheet type=\"text/xsl\" href=\"compatibility_result.xsl\"?>\n")
+        f.write(
+            f'<Result start="{start_ms}" end="{end_ms}" start_display="{start:%a %b %d %H:%M:%S} CST {start:%Y}" '
+            f'end_display="{end:%a %b %d %H:%M:%S} CST {end:%Y}" suite_name="{suite.upper()}" '
+            f'suite_variant="{suite.upper()}" suite_version="{spec["version"]}" suite_plan="{spec["plan"]}" '
+            f'suite_build_number="{12000000 + seed}" report_version="5.0" command_line_args="{spec["plan"]}" '
+            f'devices="SYN{seed:08d}" host_name="bench-host" os_name="Linux" os_version="6.8.0" os_arch="amd64" java_version="17">\n'
+        )
+        f.write(
+            f'  <Build build_fingerprint="{fingerprint}" build_id="AP3A.240905.015" build_product="{product}" '
+            f'build_model="{product.upper()}" build_brand="Brand" build_device="device" build_type="user" '
+            f'build_version_release="15" build_version_sdk="35" build_version_incremental="12345678" '
+            f'build_version_security_patch="2025-08-05" build_abis="{",".join(abis)}" />\n'
+        )
+        f.write(
+            f'  <Summary pass="{counts["pass"]}" failed="{counts["fail"]}" modules_done="{len(units)}" '
+            f'modules_total="{len(units)}" />\n'
+        )
+
+        # Pass 2: module bodies
+        for m, abi in units:
+            rng = random.Random(f"{seed}:{m}:{abi}:detail")
+            name, package = _module_name(spec, m)
+            shared_failure = _shared_failure_xml(package, stack_lines)
+            statuses = list(_statuses(f"{seed}:{m}:{abi}", tests_per_module, failure_ratio))
+            passed = statuses.count("pass")
+            parts = [
+                f'  <Module name="{name}" abi="{abi}" runtime="{rng.randint(1000, 900000)}" done="true" pass="{passed}" '
+                f'total_tests="{tests_per_module}">\n'
+            ]
+            for c in range(0, tests_per_module, TESTS_PER_CLASS):
+                cls = f"{name[3:].replace('TestCases', '').replace('TargetTest', '')}Test{c // TESTS_PER_CLASS}"
+                parts.append(f'    <TestCase name="{package}.{cls}">\n')
+                for t, status in enumerate(statuses[c:c + TESTS_PER_CLASS], start=c):
+                    method = f"test{_AREAS[t % len(_AREAS)]}{t}"
+                    if status == "fail":
+                        failure = (
+                            shared_failure if duplicate_ratio and rng.random() < duplicate_ratio
+                            else _failure_xml(rng, package, cls, method, stack_lines)
+                        )
+                        parts.append(f'      <Test result="fail" name="{method}">{failure}</Test>\n')
+                    else:
+                        parts.append(f'      <Test result="{status}" name="{method}" />\n')
+                parts.append("    </TestCase>\n")
+            parts.append("  </Module>\n")
+            f.write("".join(parts))
+        f.write("</Result>\n")
+
+    return {
+        "path": path,
+        "modules": len(units),
+        "tests": len(units) * tests_per_module,
+        "failed": counts["fail"],
+        "bytes": os.path.getsize(path),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("output", help="Output path (.xml or .xml.gz)")
+    ap.add_argument("--suite", default="CTS", choices=sorted(SUITES))
+    ap.add_argument("--modules", type=int, default=100, help="Distinct modules (each is emitted once per ABI)")
+    ap.add_argument("--tests-per-module", type=int, default=100)
+    ap.add_argument("--failure-ratio", type=float, default=0.01)
+    ap.add_argument("--stack-lines", type=int, default=20, help="Lines per failure stack trace")
+    ap.add_argument("--abis", nargs="+", default=["arm64-v8a"])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--duplicate-ratio", type=float, default=0.0,
+                    help="Share of failures repeating one identical stack trace per module")
+    args = ap.parse_args()
+
+    info = generate_result(
+        args.output, suite=args.suite, modules=args.modules, tests_per_module=args.tests_per_module,
+        failure_ratio=args.failure_ratio, stack_lines=args.stack_lines, abis=args.abis, seed=args.seed,
+        duplicate_ratio=args.duplicate_ratio,
+    )
+    print(f"Wrote {info['path']}: {info['modules']} modules, {info['tests']:,} tests, "
+          f"{info['failed']:,} failures, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
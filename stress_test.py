@@ -1,7 +1,7 @@
 from backend.database.database import SessionLocal
 from backend.database import models
 from backend.routers.upload import process_upload_background
-from backend.routers.analysis import run_analysis_task
+from backend.services.analysis_service import AnalysisService
 import time
 import os
 import sys
@@ -34,7 +34,7 @@ def run_stress_test():
     print(f"\n[Phase 1] Processing XML... This may take a while.")
     start_time = time.time()
     try:
-        process_upload_background(file_path, run_id, db)
+        process_upload_background(file_path, run_id)
     except Exception as e:
         print(f"Upload failed: {e}")
         import traceback
@@ -53,7 +53,7 @@ def run_stress_test():
     print(f"\n[Phase 2] Starting AI Analysis on {test_run.failed_tests} failures...")
     start_time = time.time()
     try:
-        run_analysis_task(run_id, db)
+        AnalysisService.run_analysis_task(run_id, db)
     except Exception as e:
         print(f"Analysis failed: {e}")
         import traceback
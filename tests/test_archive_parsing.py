@@ -0,0 +1,144 @@
+"""
+Tests for parsing results straight out of gzip/zip/tar archives.
+
+Run with: pytest tests/test_archive_parsing.py -v
+"""
+
+import gzip
+import importlib.util
+import io
+import os
+import sys
+import tarfile
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.parser.archive import _pick_result_members, detect_format, list_result_members, result_members, result_size
+from backend.parser.xml_parser import XMLParser
+
+
+def _result_xml(suite: str) -> bytes:
+    return f"""<?xml version='1.0' encoding='UTF-8' standalone='no' ?>
+<Result suite_name="{suite}" suite_plan="{suite.lower()}" start_display="Fri Aug 08 14:18:40 CST 2025">
+  <Build build_fingerprint="Brand/Product/device:15/ID/1:user/release-keys" />
+  <Summary pass="1" failed="1" modules_done="1" modules_total="1" />
+  <Module name="Cts{suite}Module" abi="arm64-v8a">
+    <TestCase name="android.cts.SomeTest">
+      <Test result="pass" name="testPass" />
+      <Test result="fail" name="testFail"><Failure message="boom" /></Test>
+    </TestCase>
+  </Module>
+</Result>
+""".encode()
+
+
+@pytest.fixture
+def plain_xml(tmp_path):
+    path = tmp_path / "test_result.xml"
+    path.write_bytes(_result_xml("CTS"))
+    return str(path)
+
+
+class TestDetectFormat:
+
+    def test_formats(self):
+        assert detect_format("test_result.xml") == "xml"
+        assert detect_format("test_result.xml.gz") == "gzip"
+        assert detect_format("results.zip") == "zip"
+        assert detect_format("results.tar.gz") == "tar"
+        assert detect_format("results.tgz") == "tar"
+        assert detect_format("results.tar") == "tar"
+        assert detect_format("report.html") is None
+
+
+class TestArchiveParsing:
+
+    def test_gzip_matches_plain(self, tmp_path, plain_xml):
+        gz_path = tmp_path / "test_result.xml.gz"
+        with gzip.open(gz_path, "wb") as f:
+            f.write(_result_xml("CTS"))
+
+        parser = XMLParser()
+        assert list_result_members(str(gz_path)) == [None]
+        assert list(parser.parse(str(gz_path))) == list(parser.parse(plain_xml))
+        assert parser.get_metadata(str(gz_path))["test_suite_name"] == "CTS"
+        assert result_size(str(gz_path)) == len(_result_xml("CTS"))
+
+    def test_zip_with_several_results(self, tmp_path):
+        zip_path = tmp_path / "results.zip"
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("results/2025.08.08_14.18.40/test_result.xml", _result_xml("CTS"))
+            zf.writestr("results/2025.08.09_10.00.00/test_result.xml", _result_xml("GTS"))
+            zf.writestr("results/2025.08.08_14.18.40/compatibility_result.xsl", b"<xsl/>")
+            zf.writestr("__MACOSX/results/._test_result.xml", b"junk")
+
+        members = list_result_members(str(zip_path))
+        assert members == [
+            "results/2025.08.08_14.18.40/test_result.xml",
+            "results/2025.08.09_10.00.00/test_result.xml",
+        ]
+
+        parser = XMLParser()
+        suites = [parser.get_metadata(str(zip_path), m)["test_suite_name"] for m in members]
+        assert suites == ["CTS", "GTS"]
+
+        items = list(parser.parse(str(zip_path), members[1]))
+        assert {"type": "module_info", "module_name": "CtsGTSModule", "module_abi": "arm64-v8a", "done": None, "runtime_ms": None} in items
+
+    def test_tar_gz(self, tmp_path, plain_xml):
+        tar_path = tmp_path / "results.tar.gz"
+        data = _result_xml("CTS")
+        with tarfile.open(tar_path, "w:gz") as tf:
+            info = tarfile.TarInfo("results/2025.08.08_14.18.40/test_result.xml")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+        members = list_result_members(str(tar_path))
+        assert members == ["results/2025.08.08_14.18.40/test_result.xml"]
+        assert list(XMLParser().parse(str(tar_path), members[0])) == list(XMLParser().parse(plain_xml))
+        assert result_size(str(tar_path), members[0]) == len(data)
+
+    def test_tar_members_listed_once_with_sizes(self, tmp_path):
+        tar_path = tmp_path / "results.tgz"
+        results = {"results/a/test_result.xml": _result_xml("CTS"), "results/b/test_result.xml": _result_xml("GTS")}
+        with tarfile.open(tar_path, "w:gz") as tf:
+            for name, data in results.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+
+        members = result_members(str(tar_path))
+        assert members == [(name, len(data)) for name, data in results.items()]
+        # A named member is read by streaming up to it
+        parser = XMLParser()
+        assert [parser.get_metadata(str(tar_path), name)["test_suite_name"] for name, _ in members] == ["CTS", "GTS"]
+        assert {"type": "module_info", "module_name": "CtsGTSModule", "module_abi": "arm64-v8a", "done": None,
+                "runtime_ms": None} in list(parser.parse(str(tar_path), members[1][0]))
+        with pytest.raises(KeyError):
+            list(parser.parse(str(tar_path), "results/c/test_result.xml"))
+
+
+class TestCliResultMembers:
+    """gms-cli.py pre-flights exactly the members the server would ingest."""
+
+    def test_cli_matches_server_rule(self):
+        spec = importlib.util.spec_from_file_location(
+            "gms_cli", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gms-cli.py")
+        )
+        cli = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(cli)
+
+        for names in (
+            ["r/1/test_result.xml", "r/1/._test_result.xml", "__MACOSX/r/1/test_result.xml", "r/1/old_test_result.xml"],
+            ["r/1/", "r/1/result.xml", "r/1/._result.xml", "r/1/notes.txt"],
+            ["r/2/TEST_RESULT.XML", "r/1/test_result.xml"],
+            ["r/notes.txt"],
+        ):
+            assert cli._result_members(names) == _pick_result_members(names)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
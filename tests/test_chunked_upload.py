@@ -0,0 +1,125 @@
+"""
+Tests for the resumable chunked upload protocol (/api/upload/sessions).
+
+Run with: pytest tests/test_chunked_upload.py -v
+"""
+
+import hashlib
+import os
+import sys
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base, get_db
+from backend.routers import upload
+from tests.test_ingestion_pipeline import SAMPLE_XML
+
+DATA = SAMPLE_XML.encode()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(upload, "CHUNK_DIR", str(tmp_path / "chunked"))
+    os.makedirs(upload.CHUNK_DIR)
+    engine = create_engine(f"sqlite:///{tmp_path / 'upload.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(upload.router, prefix="/api/upload")
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.session_factory = SessionLocal
+    return client
+
+
+@pytest.fixture
+def host_tz(request, monkeypatch):
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _start(client, data=DATA, chunk_size=100):
+    response = client.post("/api/upload/sessions", json={
+        "filename": "test_result.xml", "total_size": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(), "chunk_size": chunk_size
+    })
+    assert response.status_code == 200
+    return response.json()["upload_id"]
+
+
+def _put(client, upload_id, offset, chunk, sha256=None):
+    return client.put(
+        f"/api/upload/sessions/{upload_id}", params={"offset": offset}, content=chunk,
+        headers={"X-Chunk-SHA256": sha256 or hashlib.sha256(chunk).hexdigest()}
+    )
+
+
+class TestChunkedUpload:
+
+    def test_rejects_bad_chunks(self, client):
+        upload_id = _start(client)
+        chunk = DATA[:100]
+
+        assert client.put(f"/api/upload/sessions/{upload_id}", params={"offset": 0}, content=chunk).status_code == 422
+        assert _put(client, upload_id, 0, chunk, sha256="0" * 64).status_code == 422
+        assert _put(client, upload_id, 100, DATA[100:200]).status_code == 409
+        assert client.get(f"/api/upload/sessions/{upload_id}").json()["received_bytes"] == 0
+
+    def test_resume_and_finalize(self, client):
+        upload_id = _start(client)
+        assert _put(client, upload_id, 0, DATA[:100]).json()["received_bytes"] == 100
+        # A retransmitted chunk is acknowledged without being appended twice
+        assert _put(client, upload_id, 0, DATA[:100]).json()["received_bytes"] == 100
+        assert client.post(f"/api/upload/sessions/{upload_id}/finalize").status_code == 409
+
+        # Resume from the server's offset
+        offset = client.get(f"/api/upload/sessions/{upload_id}").json()["received_bytes"]
+        while offset < len(DATA):
+            offset = _put(client, upload_id, offset, DATA[offset:offset + 100]).json()["received_bytes"]
+
+        response = client.post(f"/api/upload/sessions/{upload_id}/finalize")
+        assert response.status_code == 200
+        with open(os.path.join(upload.UPLOAD_DIR, f"{upload_id}_test_result.xml"), "rb") as f:
+            assert f.read() == DATA
+        db = client.session_factory()
+        assert db.query(models.Job).filter(models.Job.job_type == "ingest").count() == 1
+        db.close()
+        assert client.get(f"/api/upload/sessions/{upload_id}").status_code == 404
+
+    @pytest.mark.parametrize("host_tz", ["UTC", "America/New_York", "Asia/Taipei"], indirect=True)
+    def test_abandoned_sessions_expire(self, client, host_tz):
+        # The TTL must not shift with the host's UTC offset
+        abandoned = _start(client)
+        _put(client, abandoned, 0, DATA[:100])
+        stale = time.time() - 2 * 3600
+        for name in os.listdir(upload.CHUNK_DIR):
+            os.utime(os.path.join(upload.CHUNK_DIR, name), (stale, stale))
+
+        active = _start(client)
+        assert upload._expire_sessions(max_age_hours=1) == 1
+        assert client.get(f"/api/upload/sessions/{abandoned}").status_code == 404
+        assert client.get(f"/api/upload/sessions/{active}").status_code == 200
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,111 @@
+"""
+Tests for assigning new failures to analyzed clusters by their stored centroids.
+
+Run with: pytest tests/test_cluster_centroids.py -v
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.analysis.clustering import ImprovedFailureClusterer
+from backend.database import models
+from backend.database.database import Base
+from backend.services.cluster_centroid_service import ClusterCentroidService
+from tests.test_clustering import synthetic_failures
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'centroids.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def _store_clusters(db, clusterer, failures):
+    """Cluster failures and store a FailureCluster with a centroid per label; returns the cluster id of each."""
+    labels, _ = clusterer.cluster_failures(failures)
+    labels = clusterer.handle_outliers(failures, labels)
+    clusters = {}
+    for label in sorted(set(labels)):
+        cluster = models.FailureCluster(signature=f"cluster {label}")
+        db.add(cluster)
+        db.flush()
+        clusters[label] = cluster.id
+    cluster_ids = [clusters[label] for label in labels]
+    ClusterCentroidService.store(db, clusterer, failures, cluster_ids)
+    db.commit()
+    return cluster_ids
+
+
+class TestClusterCentroids:
+
+    def test_repeat_failures_join_their_cluster(self, db):
+        clusterer = ImprovedFailureClusterer(min_cluster_size=3)
+        failures = synthetic_failures([60, 40], seed=1)
+        cluster_ids = _store_clusters(db, clusterer, failures)
+        assert db.query(models.ClusterFeaturizer).count() == 2
+
+        # The same failures again (a retry) land in the clusters they were in
+        assigned = ClusterCentroidService.assign(db, clusterer, failures)
+        db.commit()
+        assert sum(a == c for a, c in zip(assigned, cluster_ids)) >= 0.9 * len(failures)
+        members = {c.cluster_id: c.n_members for c in db.query(models.ClusterCentroid)}
+        assert sum(members.values()) == len(failures) + sum(a is not None for a in assigned)
+
+        # Failures of an unrelated module (no centroids) or text are left for clustering
+        others = [dict(f, module_name="CtsOtherTestCases") for f in synthetic_failures([30], seed=2)]
+        unrelated = [dict(f, module_name="CtsSynthetic0TestCases", stack_trace="java.io.IOException: disk quota",
+                          error_message="disk quota", class_name="android.io.cts.QuotaTest") for f in failures[:5]]
+        assert ClusterCentroidService.assign(db, clusterer, others + unrelated) == [None] * (len(others) + 5)
+
+    def test_reanalysis_does_not_move_centroids(self, db):
+        clusterer = ImprovedFailureClusterer(min_cluster_size=3)
+        failures = synthetic_failures([60], seed=5)
+        cluster_ids = _store_clusters(db, clusterer, failures)
+        before = {c.cluster_id: (c.n_members, c.centroid) for c in db.query(models.ClusterCentroid)}
+
+        # The run's failures are already linked to their clusters
+        assigned = ClusterCentroidService.assign(db, clusterer, failures, linked_cluster_ids=cluster_ids)
+        db.commit()
+        assert sum(a == c for a, c in zip(assigned, cluster_ids)) >= 0.9 * len(failures)
+        assert {c.cluster_id: (c.n_members, c.centroid) for c in db.query(models.ClusterCentroid)} == before
+
+    def test_newer_centroids_replace_and_prune_featurizers(self, db):
+        clusterer = ImprovedFailureClusterer(min_cluster_size=3)
+        failures = synthetic_failures([50], seed=3)
+        cluster_ids = _store_clusters(db, clusterer, failures)
+
+        ClusterCentroidService.store(db, clusterer, failures, cluster_ids)
+        db.commit()
+
+        assert db.query(models.ClusterCentroid).count() == len(set(cluster_ids))
+        assert db.query(models.ClusterFeaturizer).count() == 1
+
+    def test_cluster_spanning_modules_keeps_a_centroid_per_module(self, db):
+        clusterer = ImprovedFailureClusterer(min_cluster_size=3)
+        failures = synthetic_failures([30, 30], seed=4)
+        cluster = models.FailureCluster(signature="shared signature")
+        db.add(cluster)
+        db.flush()
+        ClusterCentroidService.store(db, clusterer, failures, [cluster.id] * len(failures))
+        db.commit()
+
+        centroids = db.query(models.ClusterCentroid).all()
+        assert sorted(c.module_name for c in centroids) == ["CtsSynthetic0TestCases", "CtsSynthetic1TestCases"]
+        assert all(c.cluster_id == cluster.id and c.n_members == 30 for c in centroids)
+        # Failures of both modules can join the cluster
+        assigned = ClusterCentroidService.assign(db, clusterer, failures)
+        assert {f["module_name"] for f, a in zip(failures, assigned) if a == cluster.id} == \
+            {"CtsSynthetic0TestCases", "CtsSynthetic1TestCases"}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
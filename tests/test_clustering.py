@@ -5,15 +5,50 @@ Run with: pytest tests/test_clustering.py -v
 """
 
 import pytest
+import random
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from backend.analysis import clustering
 from backend.analysis.clustering import ImprovedFailureClusterer, FailureClusterer
 
 
+EXCEPTIONS = [
+    "java.lang.AssertionError", "java.lang.SecurityException", "android.os.DeadObjectException",
+    "java.util.concurrent.TimeoutException", "java.lang.IllegalStateException",
+]
+
+
+def synthetic_failures(group_sizes, seed=0):
+    """Failures of modules with the given sizes; each module has a few recurring failure patterns."""
+    rng = random.Random(seed)
+    failures = []
+    for m, size in enumerate(group_sizes):
+        module = f"CtsSynthetic{m}TestCases"
+        patterns = [
+            (rng.choice(EXCEPTIONS), f"android.synthetic{m}.cts.Feature{p}Test", f"condition {p} of module {m} not met")
+            for p in range(rng.randint(1, 4))
+        ]
+        for i in range(size):
+            exception, class_name, message = rng.choice(patterns)
+            simple_class = class_name.split(".")[-1]
+            failures.append({
+                "module_name": module,
+                "class_name": class_name,
+                "method_name": f"test{rng.choice(['Open', 'Close', 'Query', 'Update', 'Bind'])}{i % 7}",
+                "error_message": f"{message} (attempt {rng.randint(1, 3)})",
+                "stack_trace": f"{exception}: {message}\n"
+                               f"\tat {class_name}.helper{i % 3}({simple_class}.java:{100 + i % 5})\n"
+                               f"\tat {class_name}.run({simple_class}.java:42)\n"
+                               "\tat org.junit.runners.ParentRunner.run(ParentRunner.java:413)",
+            })
+    rng.shuffle(failures)
+    return failures
+
+
 class TestExceptionExtraction:
     """Test exception type extraction from stack traces."""
     
@@ -380,6 +415,80 @@ class TestMergeSmallClusters:
         assert merged == [0, 0, 1] or merged == [1, 1, 0]
 
 
+class TestParallelClustering:
+    """Module groups clustered in a process pool give the sequential labels."""
+    
+    def test_parallel_labels_match_sequential(self, monkeypatch):
+        failures = synthetic_failures([400, 120, 60, 30, 5, 2, 1] + [8] * 10, seed=1)
+        # Small enough to run quickly, so lower the threshold to go through the pool
+        monkeypatch.setattr(clustering, "PARALLEL_MIN_FAILURES", len(failures))
+        
+        sequential_labels, sequential_metrics = ImprovedFailureClusterer(min_cluster_size=3).cluster_failures(failures)
+        parallel_labels, parallel_metrics = ImprovedFailureClusterer(min_cluster_size=3, n_jobs=3).cluster_failures(failures)
+        
+        assert parallel_labels == sequential_labels
+        assert parallel_metrics == sequential_metrics
+        assert parallel_metrics['n_modules'] == 17
+
+
+
+def partition(labels):
+    """Labels renumbered by first appearance: equal for the same grouping."""
+    first = {}
+    return [first.setdefault(l, len(first)) for l in labels]
+
+
+class TestDuplicateCollapse:
+    """Identical failures are clustered once, weighted by their count."""
+    
+    def test_collapse_duplicates(self):
+        texts = ["NFC  failure\nAt x", "nfc failure at X", "view failure", "NFC failure at x"]
+        unique_texts, weights, inverse = ImprovedFailureClusterer.collapse_duplicates(texts)
+        
+        assert unique_texts == ["NFC  failure\nAt x", "view failure"]
+        assert weights.tolist() == [3, 1]
+        assert inverse.tolist() == [0, 0, 1, 0]
+    
+    @pytest.mark.parametrize("seed,copies", [(0, 300), (1, 1500), (2, 4000)])
+    def test_weighted_labels_match_expanded(self, seed, copies):
+        rng = random.Random(seed)
+        shapes = synthetic_failures([rng.randint(5, 80) for _ in range(5)], seed=seed)
+        failures = shapes + [dict(f) for f in rng.choices(shapes, k=copies)]
+        rng.shuffle(failures)
+        
+        expected, expected_metrics = ImprovedFailureClusterer(min_cluster_size=3, dedup=False).cluster_failures(failures)
+        labels, metrics = ImprovedFailureClusterer(min_cluster_size=3).cluster_failures(failures)
+        
+        assert partition(labels) == partition(expected)
+        assert (metrics['n_clusters'], metrics['n_outliers']) == (expected_metrics['n_clusters'], expected_metrics['n_outliers'])
+        collapsed = [m for m in metrics['details'].values() if 'n_unique' in m]
+        assert collapsed and all(m['n_unique'] < m['n_samples'] for m in collapsed)
+
+
+class TestMemoryBound:
+    """A group whose dense TF-IDF matrix exceeds max_memory_mb is clustered on an SVD reduction."""
+    
+    def test_reduces_to_components_within_ceiling(self):
+        failures = synthetic_failures([1500], seed=3)
+        
+        labels, metrics = ImprovedFailureClusterer(min_cluster_size=3, svd_components=0, max_memory_mb=2).cluster_failures(failures)
+        (group,) = metrics['details'].values()
+        n_components = group['bounded_components']
+        
+        # Randomized SVD working arrays (~4 x rows x components) fit 2 MB
+        assert 3 <= n_components and 4 * 1500 * (n_components + 10) * 8 <= 2 * 1024 * 1024
+        expected, _ = ImprovedFailureClusterer(min_cluster_size=3, svd_components=n_components).cluster_failures(failures)
+        assert partition(labels) == partition(expected)
+    
+    def test_small_groups_unaffected(self):
+        failures = synthetic_failures([40, 30], seed=4)
+        
+        expected, _ = ImprovedFailureClusterer(min_cluster_size=3).cluster_failures(failures)
+        labels, metrics = ImprovedFailureClusterer(min_cluster_size=3, max_memory_mb=64).cluster_failures(failures)
+        
+        assert labels == expected
+        assert not any('bounded_components' in m for m in metrics['details'].values())
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
 
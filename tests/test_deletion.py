@@ -10,7 +10,12 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.database import models
 from backend.database.database import Base
+from backend.services.text_blob_service import TextBlobService
+import json
+
 from backend.routers.reports import delete_test_run
+from backend.routers.submissions import delete_submission
+from backend.services.deletion_service import DeletionService, DELETING
 
 # Setup test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -31,14 +36,15 @@ def test_clean_deletion():
         db.refresh(run)
         print(f"Created Run ID: {run.id}")
 
-        # Create Test Case (Failure)
+        # Create Test Case (Failure); its text is interned in text_blobs
+        text_ids = TextBlobService.resolve_ids(db, ["Camera failed"])
         test_case = models.TestCase(
             test_run_id=run.id,
             module_name="CtsCameraTestCases",
             class_name="CameraTest",
             method_name="testCamera",
             status="fail",
-            error_message="Camera failed"
+            error_message_id=text_ids[TextBlobService.text_hash("Camera failed")]
         )
         db.add(test_case)
         db.commit()
@@ -70,29 +76,34 @@ def test_clean_deletion():
         assert test_case.failure_analysis == analysis
         assert analysis.cluster == cluster
         print("Links verified.")
+        run_id, test_case_id, analysis_id, cluster_id = run.id, test_case.id, analysis.id, cluster.id
 
-        # 2. Delete Run
+        # 2. Delete Run: hidden right away, rows removed by the queued job
         print("Deleting Run...")
-        delete_test_run(run.id, db)
+        result = delete_test_run(run_id, db)
+        assert db.query(models.TestRun).filter(models.TestRun.id == run_id).first().status == DELETING
+        job = db.query(models.Job).filter(models.Job.id == result["job_id"]).first()
+        assert job.job_type == "delete"
+        DeletionService.run_job(db, **json.loads(job.payload))
 
         # 3. Verify Deletion
         # Run should be gone
-        deleted_run = db.query(models.TestRun).filter(models.TestRun.id == run.id).first()
+        deleted_run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
         assert deleted_run is None
         print("Run deleted.")
 
         # Test Case should be gone (cascade)
-        deleted_case = db.query(models.TestCase).filter(models.TestCase.id == test_case.id).first()
+        deleted_case = db.query(models.TestCase).filter(models.TestCase.id == test_case_id).first()
         assert deleted_case is None
         print("Test Case deleted.")
 
         # Analysis should be gone (cascade from Test Case)
-        deleted_analysis = db.query(models.FailureAnalysis).filter(models.FailureAnalysis.id == analysis.id).first()
+        deleted_analysis = db.query(models.FailureAnalysis).filter(models.FailureAnalysis.id == analysis_id).first()
         assert deleted_analysis is None
         print("Analysis deleted.")
 
         # Cluster should be gone (orphan cleanup)
-        deleted_cluster = db.query(models.FailureCluster).filter(models.FailureCluster.id == cluster.id).first()
+        deleted_cluster = db.query(models.FailureCluster).filter(models.FailureCluster.id == cluster_id).first()
         assert deleted_cluster is None
         print("Cluster deleted.")
 
@@ -101,5 +112,98 @@ def test_clean_deletion():
     finally:
         db.close()
 
+def test_submission_deletion_in_chunks():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+
+    try:
+        sub = models.Submission(name="S", target_fingerprint="fp")
+        db.add(sub)
+        db.commit()
+        runs = [models.TestRun(test_suite_name="CTS", submission_id=sub.id) for _ in range(2)]
+        db.add_all(runs)
+        db.commit()
+        cluster = models.FailureCluster(signature="shared-sig", description="Shared cluster")
+        kept = models.FailureCluster(signature="other-sig", description="Cluster of another submission")
+        db.add_all([cluster, kept])
+        db.commit()
+        for run in runs:
+            for i in range(7):
+                case = models.TestCase(test_run_id=run.id, module_name="M", class_name="C", method_name=f"t{i}", status="fail")
+                db.add(case)
+                db.flush()
+                db.add(models.FailureAnalysis(test_case_id=case.id, cluster_id=cluster.id))
+        other_run = models.TestRun(test_suite_name="CTS")
+        db.add(other_run)
+        db.flush()
+        other_case = models.TestCase(test_run_id=other_run.id, module_name="M", class_name="C", method_name="t", status="fail")
+        db.add(other_case)
+        db.flush()
+        db.add(models.FailureAnalysis(test_case_id=other_case.id, cluster_id=kept.id))
+        db.commit()
+        sub_id, run_ids, cluster_id, kept_id = sub.id, [r.id for r in runs], cluster.id, kept.id
+
+        delete_submission(sub_id, db)
+        assert db.query(models.TestRun).filter(models.TestRun.id.in_(run_ids), models.TestRun.status == DELETING).count() == 2
+        DeletionService.delete_submission(db, sub_id, chunk_size=3)
+
+        assert db.query(models.Submission).filter(models.Submission.id == sub_id).first() is None
+        assert db.query(models.TestRun).filter(models.TestRun.id.in_(run_ids)).count() == 0
+        assert db.query(models.TestCase).filter(models.TestCase.test_run_id.in_(run_ids)).count() == 0
+        assert db.query(models.FailureAnalysis).count() == 1
+        assert db.query(models.FailureCluster).filter(models.FailureCluster.id == cluster_id).first() is None
+        assert db.query(models.FailureCluster).filter(models.FailureCluster.id == kept_id).first() is not None
+
+    finally:
+        db.close()
+
+def test_retried_deletion_collects_orphans(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+
+    try:
+        run = models.TestRun(test_suite_name="CTS")
+        cluster = models.FailureCluster(signature="retried-sig", description="Cluster of the deleted run")
+        db.add_all([run, cluster])
+        db.commit()
+        blob_ids = TextBlobService.resolve_ids(db, ["first chunk only", "shared"])
+        for i in range(6):
+            message = "first chunk only" if i < 3 else "shared"
+            case = models.TestCase(test_run_id=run.id, module_name="M", class_name="C", method_name=f"t{i}", status="fail",
+                                   error_message_id=blob_ids[TextBlobService.text_hash(message)])
+            db.add(case)
+            db.flush()
+            # Only the first chunk's failures reference the cluster
+            db.add(models.FailureAnalysis(test_case_id=case.id, cluster_id=cluster.id if i < 3 else None))
+        db.commit()
+        run_id, cluster_id = run.id, cluster.id
+
+        # The job dies after its first chunk: the rows referencing the cluster and blob are gone
+        delete_chunk = DeletionService._delete_case_chunk
+        calls = []
+        def dying_delete_chunk(db, case_ids):
+            if calls:
+                raise RuntimeError("worker lost")
+            calls.append(case_ids)
+            delete_chunk(db, case_ids)
+        monkeypatch.setattr(DeletionService, "_delete_case_chunk", staticmethod(dying_delete_chunk))
+        try:
+            DeletionService.delete_runs(db, [run_id], chunk_size=3)
+        except RuntimeError:
+            db.rollback()
+        assert db.query(models.TestCase).filter(models.TestCase.test_run_id == run_id).count() == 3
+        monkeypatch.undo()
+
+        # The retried job still collects them
+        DeletionService.delete_runs(db, [run_id], chunk_size=3)
+        assert db.query(models.TestRun).filter(models.TestRun.id == run_id).first() is None
+        assert db.query(models.FailureCluster).filter(models.FailureCluster.id == cluster_id).first() is None
+        assert db.query(models.TextBlob).filter(models.TextBlob.id.in_(blob_ids.values())).count() == 0
+        assert db.query(models.OrphanCandidate).count() == 0
+
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     test_clean_deletion()
+    test_submission_deletion_in_chunks()
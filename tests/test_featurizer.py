@@ -0,0 +1,116 @@
+"""
+Tests for the corpus-level, versioned TF-IDF featurizer (FeaturizerService).
+
+Run with: pytest tests/test_featurizer.py -v
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.analysis.clustering import ImprovedFailureClusterer
+from backend.database import models
+from backend.database.database import Base
+from backend.services import featurizer_service
+from backend.services.cluster_centroid_service import ClusterCentroidService
+from backend.services.featurizer_service import FeaturizerService
+from tests.test_clustering import partition, synthetic_failures
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(featurizer_service, "FEATURIZER_DIR", str(tmp_path / "featurizers"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'featurizer.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def _ingest(db, failures):
+    run = models.TestRun(test_suite_name="CTS", status="completed")
+    db.add(run)
+    db.flush()
+    db.add_all([
+        models.TestCase(test_run_id=run.id, module_name=f["module_name"], class_name=f["class_name"],
+                        method_name=f["method_name"], status="fail", stack_trace_inline=f["stack_trace"],
+                        error_message_inline=f["error_message"])
+        for f in failures
+    ])
+    db.commit()
+
+
+class TestFeaturizer:
+
+    def test_refits_create_versions(self, db, monkeypatch):
+        assert FeaturizerService.current(db) is None
+        assert FeaturizerService.schedule_refit(db) is None  # Empty corpus
+
+        _ingest(db, synthetic_failures([80, 40], seed=1))
+        job = FeaturizerService.schedule_refit(db)
+        assert job.job_type == "featurizer"
+        assert FeaturizerService.schedule_refit(db, force=True) is None  # Already queued
+
+        assert FeaturizerService.fit(db) == 1
+        assert FeaturizerService.fit(db) == 2
+        version, vectorizer = FeaturizerService.current(db)
+        meta, _ = FeaturizerService.load(db, version)
+        assert (version, meta["n_docs"]) == (2, 120)
+
+        monkeypatch.setattr(featurizer_service, "FEATURIZER_KEEP_VERSIONS", 0)
+        assert FeaturizerService.fit(db) == 3
+        assert FeaturizerService.versions(db) == [3]
+        assert FeaturizerService.current(db)[0] == 3
+        assert [name.split("-")[0] for name in os.listdir(featurizer_service.FEATURIZER_DIR)] == ["v3"]
+
+    def test_versions_are_shared_through_the_database(self, db, tmp_path, monkeypatch):
+        _ingest(db, synthetic_failures([80], seed=3))
+        version = FeaturizerService.fit(db)
+        _, vectorizer = FeaturizerService.current(db)
+
+        # Another host: its own (stale) cache directory and nothing loaded
+        other_dir = tmp_path / "other-host"
+        other_dir.mkdir()
+        (other_dir / f"v{version}-{'0' * 16}.zlib").write_bytes(b"another database's v1")
+        monkeypatch.setattr(featurizer_service, "FEATURIZER_DIR", str(other_dir))
+        monkeypatch.setattr(featurizer_service, "_loaded", {})
+        other_version, other_vectorizer = FeaturizerService.current(db)
+        assert other_version == version
+        assert other_vectorizer.vocabulary == vectorizer.vocabulary
+        assert len(os.listdir(other_dir)) == 2
+
+    def test_clustering_and_centroids_with_corpus_featurizer(self, db):
+        failures = synthetic_failures([120], seed=2)
+        _ingest(db, failures)
+        FeaturizerService.fit(db)
+        version, vectorizer = FeaturizerService.current(db)
+
+        clusterer = ImprovedFailureClusterer(min_cluster_size=3, featurizer=vectorizer)
+        labels, _ = clusterer.cluster_failures(failures)
+        expected, _ = ImprovedFailureClusterer(min_cluster_size=3).cluster_failures(failures)
+        # Fitted on exactly this group, the corpus featurizer gives the per-group vectors
+        assert partition(labels) == partition(expected)
+
+        clusters = {}
+        for label in sorted(set(labels)):
+            clusters[label] = models.FailureCluster(signature=f"cluster {label}")
+            db.add(clusters[label])
+        db.flush()
+        cluster_ids = [clusters[label].id for label in labels]
+        ClusterCentroidService.store(db, clusterer, failures, cluster_ids, featurizer_version=version)
+        db.commit()
+
+        # Centroids refer to the corpus version instead of a featurizer fitted per module
+        featurizers = db.query(models.ClusterFeaturizer).all()
+        assert [(f.version, f.module_name) for f in featurizers] == [(version, None)]
+        assigned = ClusterCentroidService.assign(db, clusterer, failures, featurizer_version=version)
+        assert sum(a == c for a, c in zip(assigned, cluster_ids)) >= 0.9 * len(failures)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,264 @@
+"""
+Tests for the single-pass ingestion pipeline.
+
+Run with: pytest tests/test_ingestion_pipeline.py -v
+"""
+
+import json
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.parser.xml_parser import XMLParser, XMLStreamParser
+from backend.routers.import_json import _StreamImport, StreamImportError
+from backend.services.ingestion_service import IngestionPipeline
+from backend.services.merge_service import MergeService
+from backend.services.module_stats_service import ModuleStatsService
+from backend.services.pass_set_service import PassSetService
+
+
+SAMPLE_XML = """<?xml version='1.0' encoding='UTF-8' standalone='no' ?>
+<Result start="1754633920975" end="1754634854235" suite_name="CTS" suite_plan="cts">
+  <Build build_fingerprint="Brand/Product/device:15/ID/1:user/release-keys" />
+  <Summary pass="3" failed="2" modules_done="2" modules_total="2" />
+  <Module name="CtsAlphaTestCases" abi="arm64-v8a" runtime="1200" done="true">
+    <TestCase name="android.alpha.cts.AlphaTest">
+      <Test result="pass" name="testOne" />
+      <Test result="fail" name="testTwo">
+        <Failure message="boom"><StackTrace>java.lang.AssertionError: boom</StackTrace></Failure>
+      </Test>
+      <Test result="IGNORED" name="testThree" />
+    </TestCase>
+  </Module>
+  <Module name="CtsBetaTestCases" abi="arm64-v8a" done="true">
+    <TestCase name="android.beta.cts.BetaTest">
+      <Test result="pass" name="testOne" />
+      <Test result="pass" name="testTwo" />
+      <Test result="fail" name="testThree">
+        <Failure message="crash" />
+      </Test>
+    </TestCase>
+  </Module>
+</Result>
+"""
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # File-backed DB: the writer stage uses its own connection
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def xml_file(tmp_path):
+    path = tmp_path / "test_result.xml"
+    path.write_text(SAMPLE_XML)
+    return str(path)
+
+
+def _create_run(session_factory):
+    db = session_factory()
+    run = models.TestRun(test_suite_name="CTS", status="processing")
+    db.add(run)
+    db.commit()
+    run_id = run.id
+    db.close()
+    return run_id
+
+
+class TestIngestionPipeline:
+
+    def test_single_pass_stats(self, session_factory, xml_file):
+        run_id = _create_run(session_factory)
+
+        result = IngestionPipeline(run_id, batch_size=1, chunk_size=2, queue_size=1, session_factory=session_factory).run(
+            XMLParser().parse(xml_file), total_bytes=os.path.getsize(xml_file)
+        )
+
+        assert result["total_tests"] == 6
+        assert result["failures_inserted"] == 2
+        assert result["tests_per_sec"] > 0
+        assert result["mb_per_sec"] > 0
+
+        db = session_factory()
+        run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
+        assert run.status == "completed"
+        assert run.passed_tests == 3
+        assert run.failed_tests == 2
+        assert run.ignored_tests == 1
+        assert run.total_tests == 5
+        assert run.total_modules == 2
+        assert run.failed_modules == 2
+
+        failures = db.query(models.TestCase).filter(models.TestCase.test_run_id == run_id).all()
+        assert sorted(f.method_name for f in failures) == ["testThree", "testTwo"]
+        assert any(f.stack_trace == "java.lang.AssertionError: boom" for f in failures)
+
+        modules = db.query(models.TestRunModule).filter(models.TestRunModule.test_run_id == run_id).all()
+        assert sorted(
+            (m.module_name, m.passed_tests, m.failed_tests, m.ignored_tests, m.done, m.runtime_ms) for m in modules
+        ) == [("CtsAlphaTestCases", 1, 1, 1, True, 1200), ("CtsBetaTestCases", 2, 1, 0, True, None)]
+        db.close()
+
+    def test_module_diff_between_runs(self, session_factory):
+        db = session_factory()
+        base, current = models.TestRun(), models.TestRun()
+        db.add_all([base, current])
+        db.flush()
+        for run, counts in ((base, {"A": 1, "B": 0, "C": 2}), (current, {"A": 0, "B": 3, "D": 0})):
+            db.add_all([
+                models.TestRunModule(test_run_id=run.id, module_name=name, module_abi="x86",
+                                     passed_tests=5, failed_tests=failed, ignored_tests=0, done=True)
+                for name, failed in counts.items()
+            ])
+        db.commit()
+
+        diff = ModuleStatsService.diff(db, base.id, current.id)
+        assert [(m["module_name"], m["change"], m["failed_delta"]) for m in diff["modules"]] == [
+            ("A", "fixed", -1), ("B", "newly_failing", 3), ("C", "removed", None), ("D", "added", None)
+        ]
+        assert [m.module_name for m in ModuleStatsService.get_modules(db, current.id, failed_only=True)] == ["B"]
+        db.close()
+
+    def test_identical_failure_text_is_stored_once(self, session_factory):
+        run_id = _create_run(session_factory)
+        crash = "java.lang.RuntimeException: device crashed\n\tat com.android.Foo.bar(Foo.java:1)"
+        items = [
+            {"module_name": "M", "module_abi": "x86", "class_name": "C", "method_name": f"t{i}",
+             "status": "fail", "stack_trace": crash, "error_message": "device crashed" if i % 2 else None}
+            for i in range(5)
+        ]
+
+        IngestionPipeline(run_id, batch_size=2, session_factory=session_factory).run(iter(items))
+
+        db = session_factory()
+        assert db.query(models.TextBlob).count() == 2
+        failures = db.query(models.TestCase).filter(models.TestCase.test_run_id == run_id).order_by(models.TestCase.id).all()
+        assert [f.stack_trace for f in failures] == [crash] * 5
+        assert [f.error_message for f in failures] == [None, "device crashed", None, "device crashed", None]
+        assert {f.stack_trace_id for f in failures} == {failures[0].stack_trace_id}
+
+        # The text attributes are read-only: writes must go to the blob ids
+        with pytest.raises(AttributeError):
+            failures[0].stack_trace = "changed"
+        with pytest.raises(AttributeError):
+            models.TestCase(test_run_id=run_id, status="fail", error_message="lost")
+        db.close()
+
+    def test_runs_share_test_identities_for_merge(self, session_factory):
+        first, retry = _create_run(session_factory), _create_run(session_factory)
+        failure = {"module_name": "M", "module_abi": None, "class_name": "C", "method_name": "t", "status": "fail"}
+        IngestionPipeline(first, session_factory=session_factory).run(iter([dict(failure), {**failure, "method_name": "u"}]))
+
+        # Retry: "t" passes (pass set), "u" is not executed
+        IngestionPipeline(retry, session_factory=session_factory).run(iter([{**failure, "status": "pass"}]))
+
+        db = session_factory()
+        runs = db.query(models.TestRun).filter(models.TestRun.id.in_([first, retry])).all()
+        summary = MergeService.calculate_suite_summary(db, runs)
+
+        assert db.query(models.TestIdentity).count() == 2
+        assert db.query(models.TestCase).count() == 2  # passes are not stored as rows
+        assert (summary["initial"], summary["recovered"], summary["remaining"]) == (2, 1, 1)
+        assert [(i["test_method"], i["status_history"]) for i in summary["items"]] == [
+            ("t", ["fail", "pass"]), ("u", ["fail", "not_executed"])
+        ]
+        db.close()
+
+    def test_pass_set_round_trip(self):
+        ids = [5, 3, 3, 1000000, 4, 6]
+        data = PassSetService.encode(ids)
+        assert list(PassSetService.decode(data)) == [3, 4, 5, 6, 1000000]
+        assert len(PassSetService.encode(range(1, 1000001))) < 8192
+
+    def test_parser_error_aborts_without_completing(self, session_factory):
+        run_id = _create_run(session_factory)
+
+        def broken_items():
+            yield {"module_name": "M", "module_abi": "x86", "class_name": "C", "method_name": "t", "status": "pass"}
+            raise ValueError("truncated XML")
+
+        with pytest.raises(ValueError):
+            IngestionPipeline(run_id, session_factory=session_factory).run(broken_items())
+
+        db = session_factory()
+        run = db.query(models.TestRun).filter(models.TestRun.id == run_id).first()
+        assert run.status == "processing"
+        db.close()
+
+
+class TestXMLStreamParser:
+
+    @pytest.mark.parametrize("xml", [
+        SAMPLE_XML,
+        # Newer results list earlier sessions between Build and Summary
+        SAMPLE_XML.replace("  <Summary ", """  <RunHistory>
+    <Run start="1754630000000" end="1754631000000" pass="1" failed="4" />
+  </RunHistory>
+  <Summary """)
+    ])
+    def test_matches_file_parser_when_fed_in_small_chunks(self, tmp_path, xml):
+        xml_file = str(tmp_path / "test_result.xml")
+        with open(xml_file, "w") as f:
+            f.write(xml)
+        data = xml.encode()
+        stream = XMLStreamParser()
+        items = []
+        metadata_seen_before_items = True
+        for i in range(0, len(data), 7):
+            chunk_items = stream.feed(data[i:i + 7])
+            if chunk_items and not stream.metadata_ready:
+                metadata_seen_before_items = False
+            items += chunk_items
+        items += stream.close()
+
+        assert metadata_seen_before_items
+        assert items == list(XMLParser().parse(xml_file))
+        assert stream.metadata == XMLParser().get_metadata(xml_file)
+
+
+class TestImportStream:
+
+    def test_ndjson_records_split_across_feeds(self, session_factory):
+        records = [
+            {"type": "metadata", "device_fingerprint": "Brand/Product/device:15/ID/1:user/release-keys",
+             "test_suite_name": "CTS", "start_display": "Mon Jan 01 00:00:00 UTC 2024"},
+            {"type": "module", "module_name": "M", "module_abi": "x86"},
+            {"type": "failure", "module_name": "M", "module_abi": "x86", "class_name": "C", "method_name": "a",
+             "stack_trace": "java.lang.AssertionError"},
+        ] + [{"type": "pass", "module_name": "M", "module_abi": "x86", "class_name": "C", "method_name": f"p{i}"} for i in range(3)]
+        body = "\n".join(json.dumps(r) for r in records).encode()
+
+        db = session_factory()
+        importer = _StreamImport(db)
+        for i in range(0, len(body), 7):
+            importer.feed(body[i:i + 7])
+        importer.feed(b"", final=True)
+        run = importer.finish()
+
+        assert importer.counts == {"modules": 1, "failures": 1, "passes": 3}
+        assert (run.status, run.total_tests, run.passed_tests, run.failed_tests) == ("completed", 4, 3, 1)
+        assert db.query(models.TestCase).one().stack_trace == "java.lang.AssertionError"
+        assert db.query(models.RunPassSet).one().test_count == 3
+        # Module sent without counts: pass / fail counts derived from the records
+        module = db.query(models.TestRunModule).one()
+        assert (module.passed_tests, module.failed_tests, module.ignored_tests) == (3, 1, None)
+        db.close()
+
+    def test_metadata_must_come_first(self, session_factory):
+        importer = _StreamImport(session_factory())
+        with pytest.raises(StreamImportError, match="line 1"):
+            importer.feed(b'{"type": "pass", "module_name": "M", "class_name": "C", "method_name": "t"}\n')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,143 @@
+"""
+Tests for the DB-backed job queue and worker.
+
+Run with: pytest tests/test_job_queue.py -v
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.services.job_queue import JobQueue, JobCancelled
+from backend.services.progress_service import ProgressBroker
+from backend.routers.jobs import progress_stream, _active_job_progress
+from backend import worker
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class TestJobQueue:
+
+    def test_job_is_claimed_once_until_its_lease_expires(self, session_factory):
+        db = session_factory()
+        job_id = JobQueue.enqueue(db, "ingest", {"test_run_id": 1}).id
+
+        assert JobQueue.claim(db, "a", ["ingest"], lease_seconds=60).id == job_id
+        assert JobQueue.claim(db, "b", ["ingest"], lease_seconds=60) is None
+        assert JobQueue.claim(db, "b", ["analysis"], lease_seconds=60) is None
+
+        # Worker "a" died: its lease runs out and "b" takes over; "a" can no longer heartbeat
+        db.query(models.Job).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        job = JobQueue.claim(db, "b", ["ingest"], lease_seconds=60)
+        assert (job.id, job.lease_owner, job.attempts) == (job_id, "b", 2)
+        assert not JobQueue.heartbeat(db, job_id, "a", 60)
+        assert JobQueue.heartbeat(db, job_id, "b", 60)
+        db.close()
+
+    def test_failed_job_is_retried_then_marked_failed(self, session_factory):
+        db = session_factory()
+        job_id = JobQueue.enqueue(db, "ingest", {}, max_attempts=2).id
+
+        JobQueue.claim(db, "a", ["ingest"], 60)
+        JobQueue.fail(db, job_id, "a", "boom", retry_delay=0)
+        job = db.query(models.Job).filter(models.Job.id == job_id).one()
+        assert (job.status, job.last_error) == ("queued", "boom")
+
+        JobQueue.claim(db, "a", ["ingest"], 60)
+        JobQueue.fail(db, job_id, "a", "boom again", retry_delay=0)
+        db.refresh(job)
+        assert (job.status, job.attempts) == ("failed", 2)
+        assert JobQueue.claim(db, "a", ["ingest"], 60) is None
+        db.close()
+
+    def test_worker_runs_handler_and_records_result(self, session_factory, monkeypatch):
+        calls = []
+        monkeypatch.setitem(worker.JOB_HANDLERS, "ingest", lambda cancelled, **kwargs: calls.append(kwargs))
+        db = session_factory()
+        job_id = JobQueue.enqueue(db, "ingest", {"test_run_id": 7}).id
+
+        w = worker.Worker({"ingest": 1}, lease_seconds=60, session_factory=session_factory)
+        w.run_job(db, JobQueue.claim(db, "w", ["ingest"], 60), "w")
+
+        assert calls == [{"test_run_id": 7}]
+        assert db.query(models.Job).filter(models.Job.id == job_id).one().status == "succeeded"
+        db.close()
+
+    def test_worker_cancels_job_after_losing_its_lease(self, session_factory, monkeypatch):
+        db = session_factory()
+        job_id = JobQueue.enqueue(db, "ingest", {}).id
+
+        def handler(cancelled):
+            # Meanwhile the lease ran out and worker "b" took the job over
+            other = session_factory()
+            other.query(models.Job).update({"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+            other.commit()
+            assert JobQueue.claim(other, "b", ["ingest"], 60).id == job_id
+            other.close()
+            assert cancelled.wait(5)
+            raise JobCancelled("lease lost")
+
+        monkeypatch.setitem(worker.JOB_HANDLERS, "ingest", handler)
+        w = worker.Worker({"ingest": 1}, lease_seconds=0.3, session_factory=session_factory)
+        w.run_job(db, JobQueue.claim(db, "a", ["ingest"], 60), "a")
+
+        # Neither failed nor completed by "a": the job stays with "b"
+        job = db.query(models.Job).filter(models.Job.id == job_id).one()
+        db.refresh(job)
+        assert (job.status, job.lease_owner, job.last_error) == ("running", "b", None)
+        db.close()
+
+    def test_parse_concurrency(self):
+        assert worker.parse_concurrency("ingest=2, analysis=1") == {"ingest": 2, "analysis": 1}
+        with pytest.raises(ValueError):
+            worker.parse_concurrency("unknown=1")
+
+    def test_progress_stream_until_run_has_no_active_job(self, session_factory):
+        db = session_factory()
+        job_id = JobQueue.enqueue(db, "ingest", {}, test_run_id=42).id
+        JobQueue.claim(db, "w", ["ingest"], 60)
+        ProgressBroker.publish(42, "ingest", "parsing", failures_inserted=1)
+
+        # A worker in another process: progress arrives through the job row
+        JobQueue.heartbeat(db, job_id, "w", 60, ProgressBroker.latest(42))
+        assert _active_job_progress(42, session_factory) == (True, ProgressBroker.latest(42))
+
+        def finish_job():
+            # Published from a worker thread, as the ingestion writer does
+            ProgressBroker.publish(42, "ingest", "completed", failures_inserted=3)
+            JobQueue.complete(session_factory(), job_id, "w")
+
+        async def consume():
+            messages = []
+            async for message in progress_stream(42, session_factory, poll_seconds=0.05):
+                messages.append(message)
+                if len(messages) == 1:
+                    threading.Thread(target=finish_job).start()
+            return [m for m in messages if not m.startswith(":")]
+
+        messages = asyncio.run(consume())
+        assert '"stage": "parsing"' in messages[0]
+        assert '"stage": "completed"' in messages[1]
+        assert messages[2].startswith("event: done")
+        assert len(messages) == 3
+        db.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,142 @@
+"""
+Tests for the persisted, incrementally updated merge state behind the merge report.
+
+Run with: pytest tests/test_merge_state.py -v
+"""
+
+import os
+import sys
+from datetime import datetime
+from unittest import mock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.services.merge_service import MergeService
+from backend.services.merge_state_service import MergeStateService
+from backend.services.pass_set_service import PassSetService
+from backend.services.suite_summary_service import SuiteSummaryService
+from backend.services.test_identity_service import TestIdentityService
+from tests.test_suite_summary_engine import build_corpus
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'merge.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def _ingest(db, sub, hour, failed, passed):
+    """A completed CTS run with failures stored as rows and passes as its pass set."""
+    run = models.TestRun(
+        test_suite_name="CTS", submission_id=sub.id, device_fingerprint=sub.target_fingerprint,
+        start_time=datetime(2024, 1, 1, hour), passed_tests=len(passed), failed_tests=len(failed), status="completed"
+    )
+    db.add(run)
+    db.flush()
+    db.add_all([
+        models.TestCase(test_run_id=run.id, module_name="M", module_abi="x86", class_name="C", method_name=m, status="fail")
+        for m in failed
+    ])
+    keys = [TestIdentityService.identity_key("M", "x86", "C", m) for m in passed]
+    ids = TestIdentityService.resolve_ids(db, keys)
+    PassSetService.store(db, run.id, [ids[k] for k in keys])
+    db.commit()
+    SuiteSummaryService.refresh_for_run(db, run.id)
+    return run
+
+
+def _items(items):
+    # In report order: the merge state must list items as calculate_suite_summary does
+    return [
+        (i["test_method"], i["is_recovered"], tuple(i["status_history"]), i["failure_details"].test_run_id)
+        for i in items
+    ]
+
+
+def _report(db, sub_id):
+    suite = MergeService.get_merge_report(db, sub_id)["suites"][0]
+    return suite["summary"], _items(suite["items"])
+
+
+def _recomputed(db, sub_id):
+    runs = db.query(models.TestRun).filter(models.TestRun.submission_id == sub_id).all()
+    data = MergeService.calculate_suite_summary(db, runs)
+    return {k: data[k] for k in ("initial", "recovered", "remaining")}, _items(data["items"])
+
+
+class TestMergeState:
+
+    def test_retries_are_applied_incrementally_and_match_a_full_merge(self, db):
+        sub = models.Submission(name="S", target_fingerprint="fp")
+        db.add(sub)
+        db.commit()
+        sub_id = sub.id
+
+        _ingest(db, sub, 1, failed=["a", "b", "c"], passed=["d", "e"])
+        with mock.patch.object(MergeStateService, "rebuild", wraps=MergeStateService.rebuild) as rebuild:
+            _ingest(db, sub, 2, failed=["a", "d"], passed=["b"])
+            retry = _ingest(db, sub, 3, failed=["a"], passed=["c", "d"])
+        assert rebuild.call_count == 0
+
+        summary, items = _report(db, sub_id)
+        assert (summary, items) == _recomputed(db, sub_id)
+        assert summary == {"initial": 3, "recovered": 2, "remaining": 2}
+        assert ("d", False, ("pass", "fail", "pass"), 2) in items
+
+        states = {s.test_identity_id: s for s in db.query(models.MergeState)}
+        a_state = next(s for s in states.values() if s.fail_mask == 0b111)
+        assert (a_state.latest_status, a_state.recovered) == ("fail", False)
+
+        # Moving the newest retry away rebuilds the group from the remaining runs
+        other = models.Submission(name="Other", target_fingerprint="fp")
+        db.add(other)
+        db.commit()
+        retry.submission_id = other.id
+        db.commit()
+        SuiteSummaryService.refresh_submissions(db, [sub_id, other.id])
+        summary, items = _report(db, sub_id)
+        assert (summary, items) == _recomputed(db, sub_id)
+        assert summary == {"initial": 3, "recovered": 1, "remaining": 3}
+
+    def test_other_statuses_and_item_order_match_a_full_merge(self, db):
+        sub = models.Submission(name="S", target_fingerprint="fp")
+        db.add(sub)
+        db.commit()
+        runs = build_corpus(db, n_runs=4, seed=2)
+        for run in runs:
+            run.submission_id = sub.id
+        db.commit()
+        ordered = MergeStateService.ordered_runs(runs)
+
+        def same_as_full_merge(report):
+            expected = MergeService.calculate_suite_summary(db, list(ordered))
+            assert {k: report[k] for k in ("initial", "recovered", "remaining")} == \
+                {k: expected[k] for k in ("initial", "recovered", "remaining")}
+            assert [(i["failure_details"].id, i["is_recovered"], i["status_history"]) for i in report["items"]] == \
+                [(i["failure_details"].id, i["is_recovered"], i["status_history"]) for i in expected["items"]]
+            assert any("IGNORED" in i["status_history"] for i in report["items"])
+
+        # Full rebuild
+        same_as_full_merge(MergeStateService.suite_report(db, sub, "CTS", list(ordered)))
+
+        # Newest run appended incrementally to the state of the others
+        MergeStateService.rebuild(db, sub.id, "CTS", [r.id for r in ordered[:-1]])
+        db.commit()
+        MergeStateService.apply_run(db, db.get(models.MergeSuiteState, (sub.id, "CTS")), ordered[-1].id)
+        db.commit()
+        with mock.patch.object(MergeStateService, "rebuild") as rebuild:
+            same_as_full_merge(MergeStateService.suite_report(db, sub, "CTS", list(ordered)))
+        assert rebuild.call_count == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
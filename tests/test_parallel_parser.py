@@ -0,0 +1,69 @@
+"""
+Tests for module-sharded parallel XML parsing.
+
+Run with: pytest tests/test_parallel_parser.py -v
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.parser.parallel_parser import ParallelXMLParser, scan_module_ranges
+from backend.parser.xml_parser import XMLParser
+
+
+def _module(i: int) -> str:
+    tests = "".join(
+        f'<Test result="{"fail" if t % 3 == 0 else "pass"}" name="test{t}">'
+        + (f'<Failure message="expected &lt;{t}&gt;"><StackTrace>at Foo.bar(Foo.java:{t})</StackTrace></Failure>' if t % 3 == 0 else "")
+        + "</Test>"
+        for t in range(5)
+    )
+    # A raw ">" is legal inside attribute values and must not end the tag early
+    return (
+        f'<Module name="CtsModule{i}" abi="arm64-v8a" note="a>b" done="true">'
+        f'<TestCase name="android.cts.Case{i}">{tests}</TestCase></Module>\n'
+    )
+
+
+@pytest.fixture
+def result_xml(tmp_path):
+    body = "".join(_module(i) for i in range(40))
+    xml = (
+        "<?xml version='1.0' encoding='UTF-8' standalone='no' ?>\n"
+        '<Result suite_name="CTS"><Build build_fingerprint="B/P/d:15/I/1:user/k" />'
+        '<Summary modules_done="41" modules_total="41" />\n'
+        f'{body}<Module name="CtsEmpty" abi="x86" done="true" />\n</Result>\n'
+    )
+    path = tmp_path / "test_result.xml"
+    path.write_text(xml)
+    return str(path)
+
+
+class TestParallelXMLParser:
+
+    def test_scan_finds_every_module(self, result_xml):
+        with open(result_xml, "rb") as f:
+            data = f.read()
+        ranges = scan_module_ranges(data)
+        assert len(ranges) == 41
+        assert data[ranges[0][0]:ranges[0][1]].startswith(b'<Module name="CtsModule0"')
+        assert data[ranges[-1][0]:ranges[-1][1]] == b'<Module name="CtsEmpty" abi="x86" done="true" />'
+
+    def test_output_identical_to_sequential(self, result_xml):
+        expected = list(XMLParser().parse(result_xml))
+        # Tiny shards: many shards per worker, exercising the in-order merge
+        assert list(ParallelXMLParser(workers=2, shard_bytes=512).parse(result_xml)) == expected
+
+    def test_falls_back_when_tests_outside_modules(self, tmp_path):
+        path = tmp_path / "odd.xml"
+        path.write_text('<Result><Module name="M" /><TestCase name="C"><Test result="pass" name="t" /></TestCase></Result>')
+        assert scan_module_ranges(path.read_bytes()) is None
+        assert list(ParallelXMLParser(workers=2).parse(str(path))) == list(XMLParser().parse(str(path)))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
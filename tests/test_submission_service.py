@@ -0,0 +1,73 @@
+"""
+Tests for submission grouping, naming and duplicate detection (SubmissionService),
+shared by ingestion, JSON import and upload pre-flight.
+
+Run with: pytest tests/test_submission_service.py -v
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.services.submission_service import SubmissionService
+
+FINGERPRINT = "Brand/Product/device:15/AP3A.240905.015/12345:user/release-keys"
+# Same device and vendor build with a GSI system image: only the build id differs
+GSI_FINGERPRINT = "Brand/Product/device:15/GSI.250101.001/12345:user/release-keys"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'submissions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+class TestSubmissionService:
+
+    def test_build_submission_name(self):
+        assert SubmissionService.build_submission_name(FINGERPRINT) == ("Brand Product (device) · 12345", "Brand", "device")
+        # Build properties win over the fingerprint
+        assert SubmissionService.build_submission_name(FINGERPRINT, build_brand="Acme", build_model="Phone X") == \
+            ("Acme Phone X (device) · 12345", "Acme", "device")
+        assert SubmissionService.build_submission_name("generic:15/AP3A/1:user/release-keys") == \
+            ("Device (generic) · 1", None, "generic")
+        assert SubmissionService.build_submission_name("not a fingerprint") == ("Device (Unknown) · Unknown", None, "Unknown")
+
+    def test_find_submission(self, db):
+        sub = models.Submission(name="S", target_fingerprint=FINGERPRINT)
+        db.add(sub)
+        db.commit()
+
+        assert SubmissionService.find_submission(db, FINGERPRINT, "CTS", "cts").id == sub.id
+        # A GSI run joins the submission of its device, a regular run with another build does not
+        assert SubmissionService.find_submission(db, GSI_FINGERPRINT, "CTS", "cts-on-gsi").id == sub.id
+        assert SubmissionService.find_submission(db, GSI_FINGERPRINT, "VTS", "vts").id == sub.id
+        assert SubmissionService.find_submission(db, GSI_FINGERPRINT, "CTS", "cts") is None
+        assert SubmissionService.find_submission(db, "Other/Product/device:15/GSI/12345:user/release-keys", "CTS", "cts-on-gsi") is None
+        assert SubmissionService.find_submission(db, "Unknown", "CTS", "cts") is None
+
+    def test_find_duplicate_run(self, db):
+        start = "Fri Aug 08 14:18:40 CST 2025"
+        run = models.TestRun(test_suite_name="CTS", device_fingerprint=FINGERPRINT, start_display=start)
+        db.add(run)
+        db.commit()
+
+        assert SubmissionService.find_duplicate_run(db, FINGERPRINT, start).id == run.id
+        assert SubmissionService.find_duplicate_run(db, FINGERPRINT, "Sat Aug 09 10:00:00 CST 2025") is None
+        assert SubmissionService.find_duplicate_run(db, GSI_FINGERPRINT, start) is None
+        assert SubmissionService.find_duplicate_run(db, FINGERPRINT, None) is None
+        assert SubmissionService.find_duplicate_run(db, "Unknown", start) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
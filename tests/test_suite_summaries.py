@@ -0,0 +1,89 @@
+"""
+Tests for the cached per-(submission, suite) summaries behind the submission list.
+
+Run with: pytest tests/test_suite_summaries.py -v
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.routers.submissions import get_submissions, move_runs, MoveRunsRequest
+from backend.routers.reports import delete_test_run
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'summaries.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add_all([
+        models.TestSuiteConfig(name="CTS", match_rule="Standard", sort_order=1),
+        models.TestSuiteConfig(name="GTS", match_rule="Standard", sort_order=2),
+    ])
+    yield session
+    session.close()
+
+
+def _add_run(db, submission, start_hour, failed_methods, passed=10):
+    run = models.TestRun(
+        test_suite_name="CTS", submission_id=submission.id, start_time=datetime(2024, 1, 1, start_hour),
+        passed_tests=passed, failed_tests=len(failed_methods), status="completed"
+    )
+    db.add(run)
+    db.flush()
+    db.add_all([
+        models.TestCase(test_run_id=run.id, module_name="M", module_abi="x86", class_name="C", method_name=m, status="fail")
+        for m in failed_methods
+    ])
+    db.commit()
+    return run
+
+
+def _summaries(db):
+    return {item["id"]: item["suite_summary"] for item in get_submissions(db=db)["items"]}
+
+
+class TestSuiteSummaries:
+
+    def test_list_is_served_from_cache_and_refreshed_on_run_changes(self, db):
+        sub = models.Submission(name="S", target_fingerprint="fp")
+        db.add(sub)
+        db.commit()
+        first = _add_run(db, sub, 1, ["a", "b"])
+        retry = _add_run(db, sub, 2, ["a"])
+
+        cts = _summaries(db)[sub.id]["CTS"]
+        assert (cts["initial_failed"], cts["recovered"], cts["failed"], cts["run_ids"]) == (2, 0, 2, [first.id, retry.id])
+        assert _summaries(db)[sub.id]["GTS"] == {"status": "missing", "failed": 0, "passed": 0}
+        assert db.query(models.SuiteSummary).count() == 2
+
+        # Not an invalidating event: the cached summary is served as is
+        db.add(models.TestCase(test_run_id=first.id, module_name="M", module_abi="x86", class_name="C", method_name="c", status="fail"))
+        db.commit()
+        assert _summaries(db)[sub.id]["CTS"]["initial_failed"] == 2
+
+        # Moving the retry out refreshes both submissions
+        other = models.Submission(name="Other", target_fingerprint="fp")
+        db.add(other)
+        db.commit()
+        move_runs(MoveRunsRequest(run_ids=[retry.id], target_submission_id=other.id), db=db)
+        summaries = _summaries(db)
+        assert (summaries[sub.id]["CTS"]["initial_failed"], summaries[sub.id]["CTS"]["run_ids"]) == (3, [first.id])
+        assert summaries[other.id]["CTS"]["run_ids"] == [retry.id]
+
+        sub_id = sub.id  # Deleting a run expunges the session
+        delete_test_run(first.id, db=db)
+        assert _summaries(db)[sub_id]["CTS"]["status"] == "missing"
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
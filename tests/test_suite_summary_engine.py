@@ -0,0 +1,135 @@
+"""
+Regression tests for the columnar MergeService.calculate_suite_summary against
+the straightforward per-record merge it replaced (reference_suite_summary).
+
+Run with: pytest tests/test_suite_summary_engine.py -v
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import models
+from backend.database.database import Base
+from backend.services.merge_service import MergeService
+from backend.services.pass_set_service import PassSetService
+from backend.services.test_identity_service import TestIdentityService
+
+
+def reference_suite_summary(db, suite_runs):
+    """The per-record merge: status history dicts per test identity, walked in Python."""
+    suite_runs = sorted(suite_runs, key=lambda x: x.start_time)
+    run_ids = [r.id for r in suite_runs]
+    run_index = {run_id: i for i, run_id in enumerate(run_ids)}
+    TestIdentityService.ensure_identities(db, run_ids)
+
+    tc = models.TestCase
+    case_history = {}
+    for case_id, run_id, identity_id, status in db.query(tc.id, tc.test_run_id, tc.test_identity_id, tc.status).filter(
+        tc.test_run_id.in_(run_ids)
+    ).order_by(tc.id):
+        data = case_history.setdefault(identity_id, {
+            "status_history": ["not_executed"] * len(suite_runs), "failures": [None] * len(suite_runs)
+        })
+        data["status_history"][run_index[run_id]] = status
+        if status == "fail":
+            data["failures"][run_index[run_id]] = case_id
+
+    for run_id, passed_ids in PassSetService.passed_among(db, run_ids, set(case_history)).items():
+        for identity_id in passed_ids:
+            history = case_history[identity_id]["status_history"]
+            if history[run_index[run_id]] == "not_executed":
+                history[run_index[run_id]] = "pass"
+
+    initial = recovered = remaining = 0
+    items = []
+    for data in case_history.values():
+        history = data["status_history"]
+        is_initial_fail = history[0] == "fail"
+        is_recovered = is_initial_fail and "pass" in history
+        initial += is_initial_fail
+        if is_recovered:
+            recovered += 1
+        elif "fail" in history:
+            remaining += 1
+        if "fail" in history:
+            last_fail_idx = len(history) - 1 - history[::-1].index("fail")
+            items.append((data["failures"][last_fail_idx], is_recovered, history))
+    return {"initial": initial, "recovered": recovered, "remaining": remaining, "items": items}
+
+
+def build_corpus(db, n_runs=6, n_tests=400, fail_rate=0.3, seed=0):
+    """
+    A submission's suite of retry runs with random results: failures as rows, passes in
+    pass sets, plus legacy explicit pass rows, other statuses, duplicate rows and a
+    run without a pass set.
+    """
+    rng = random.Random(seed)
+    keys = [TestIdentityService.identity_key(f"Module{i % 17}", "arm64-v8a", f"Class{i % 41}", f"test{i}") for i in range(n_tests)]
+    identity_ids = TestIdentityService.resolve_ids(db, keys)
+    runs = []
+    for r in range(n_runs):
+        run = models.TestRun(test_suite_name="CTS", start_time=datetime(2024, 1, 1) + timedelta(hours=(r * 7) % n_runs),
+                             passed_tests=n_tests, failed_tests=0, status="completed")
+        db.add(run)
+        db.flush()
+        rows, passed = [], []
+        # Retries run fewer tests, with fewer failures
+        for key in rng.sample(keys, n_tests if r == 0 else n_tests // 2):
+            roll = rng.random()
+            if roll < fail_rate / (1 + r):
+                rows.append((key, "fail"))
+                if roll < 0.01:
+                    rows.append((key, "fail"))  # Duplicate result
+            elif roll < 0.35 and r == 1:
+                rows.append((key, "pass"))  # Legacy explicit pass row
+            elif roll < 0.37:
+                rows.append((key, "IGNORED"))
+            else:
+                passed.append(identity_ids[key])
+        db.execute(models.TestCase.__table__.insert(), [
+            {"test_run_id": run.id, "module_name": k[0], "module_abi": k[1], "class_name": k[2], "method_name": k[3],
+             "status": status, "test_identity_id": identity_ids[k]}
+            for k, status in rows
+        ])
+        if r != n_runs - 1:
+            PassSetService.store(db, run.id, passed)
+        runs.append(run)
+    db.commit()
+    return runs
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'engine.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+class TestSuiteSummaryEngine:
+
+    @pytest.mark.parametrize("seed,n_runs", [(0, 1), (1, 3), (2, 6), (3, 10)])
+    def test_matches_reference_merge(self, db, seed, n_runs):
+        runs = build_corpus(db, n_runs=n_runs, seed=seed)
+        expected = reference_suite_summary(db, runs)
+        result = MergeService.calculate_suite_summary(db, list(runs))
+
+        assert {k: result[k] for k in ("initial", "recovered", "remaining")} == \
+            {k: expected[k] for k in ("initial", "recovered", "remaining")}
+        assert [(i["failure_details"].id, i["is_recovered"], i["status_history"]) for i in result["items"]] == expected["items"]
+
+        counts_only = MergeService.calculate_suite_summary(db, list(runs), include_items=False)
+        assert counts_only["items"] == [] and counts_only["remaining"] == expected["remaining"]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])